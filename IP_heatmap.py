@@ -1,17 +1,54 @@
 import numpy as np
-import subprocess
-import socket
 import random
-import platform
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from matplotlib.colors import LinearSegmentedColormap
 import time # For adding slight delay
+from collections import Counter
+from probe_scheduler import ProbeScheduler
+from async_prober import AsyncProber
+import dns_cache
+import instrumentation
+from result_store import PingResultStore
+from basemap_cache import BasemapCache, load_plotting
+from tile_pyramid import TilePyramid
+from domain_trie import DomainSuffixTrie
+from ip_geo import IPGeoIndex
+from ping_stream import DEFAULT_INTERVAL_SEC, PingStream
+from result_cache import params_key
 
 class PingHeatmap:
-    def __init__(self, resolution=90): # Reduced resolution for faster testing maybe?
-        print(f"Initializing PingHeatmap with resolution {resolution}...")
+    def __init__(self, resolution=90, resolver=None, sample_log=None, basemap_cache=None, headless=False,
+                 location_file=None, ip_geo=None, pacer=None, instruments=None, result_cache=None,
+                 planner=None): # Reduced resolution for faster testing maybe?
+        # Stage timings and leveled logging (see instrumentation.Instrumentation for the levels)
+        self.instruments = instruments or instrumentation.shared
+        self.instruments.info(f"Initializing PingHeatmap with resolution {resolution}...")
+        # DNS lookups go through a TTL cache shared with the other tools
+        self.resolver = resolver or dns_cache.shared_cache
+        # Optional SampleLogWriter that keeps every probe session on disk for replay
+        self.sample_log = sample_log
+        # ProbeScheduler (or AsyncProber) of the most recent sweep, for its deadline counters
+        self.last_scheduler = None
+        # {website: echoes sent} for targets of the current sweep that were pinged but gave no
+        # result, as opposed to those never pinged (unresolved, or cut off by a deadline)
+        self.outages = {}
+        # Positions in the last probe_websites list that the planner left out
+        self.last_deferred = []
+        # Rendered map backgrounds are reused across generate_visualization calls
+        self.basemap_cache = basemap_cache or BasemapCache()
+        # Headless renders use the Agg backend and never call plt.show()
+        self.headless = headless
+        # Optional offline IP-range index (IPGeoIndex or a directory saved by IPGeoIndex.build);
+        # when set, results are placed by their resolved IP before falling back to geo_locations
+        self.ip_geo = IPGeoIndex.load(ip_geo) if isinstance(ip_geo, str) else ip_geo
+        # Optional rate_limit.ProbePacer (can be shared with the population estimator); probes
+        # wait for a send slot and that queueing delay is reported apart from the RTT
+        self.pacer = pacer
+        # Optional result_cache.ResultCache (can be shared with the population estimator and
+        # other processes); targets with a fresh cached result are not probed again
+        self.result_cache = result_cache
+        # Optional sweep_planner.SweepPlanner; probes the stalest, most volatile and lossiest
+        # targets first and leaves out what doesn't fit in run_analysis' budget_sec
+        self.planner = planner
+
         # Create world grid
         self.resolution = resolution
         # Linspace endpoints included: num=resolution means resolution points, resolution-1 intervals
@@ -21,8 +58,10 @@ class PingHeatmap:
         # Initialize ping grid with a high value (representing no data)
         self.ping_grid = np.ones((resolution, resolution * 2)) * 1000.0
 
-        # List to store detailed results for scatter plot: [lat, lon, ping, website]
-        self.ping_results_list = []
+        # Columnar store of detailed results for scatter plot: rows of [lat, lon, ping, website]
+        self.ping_results_list = PingResultStore()
+        # Sparse multi-resolution tiles for fine-grained and regional views (see build_tile_pyramid)
+        self.tile_pyramid = None
 
         # Expanded known geolocation data (APPROXIMATE - real locations vary!)
         # Added more diversity + Australian entry
@@ -105,142 +144,142 @@ class PingHeatmap:
         # == Default Fallback ==
         "fallback_default": [37.7749, -122.4194] # San Francisco, CA
     }
-        print("Geolocation dictionary initialized.")
-
-    def run_ping(self, website, count=4, timeout_sec=5):
-        """Run ping to measure latency to a website's IP address."""
-        print(f"  Attempting to resolve and ping {website}...")
+        # Suffix index over geo_locations (plus an optional domain,lat,lon file) for
+        # longest-match lookups in get_website_location
+        self.domain_index = DomainSuffixTrie.from_mapping(
+            {domain: loc for domain, loc in self.geo_locations.items() if domain != "fallback_default"})
+        if location_file:
+            loaded = self.domain_index.load(location_file)
+            self.instruments.info(f"Loaded {loaded} domain locations from {location_file}")
+        # Hostnames already warned about falling back to the default location
+        self._unmapped_warned = set()
+        self.instruments.info("Geolocation dictionary initialized.")
+
+    def run_ping(self, website, count=4, timeout_sec=5, session=None, deadline_sec=None):
+        """Run ping to measure latency to a website's IP address.
+
+        With an adaptive session (see adaptive.AdaptiveSampler) ping is started for up
+        to the session's max_echoes and stopped as soon as the session has converged.
+        deadline_sec bounds the whole run, pacing delay included (the scheduler passes the
+        time left under its deadlines, so an abandoned probe kills its ping instead of
+        outliving the sweep).
+        """
+        self.instruments.debug("  Attempting to resolve and ping %s...", website)
 
         try:
             # Resolve hostname to IP address first
             # This helps bypass some CDN routing issues for ping, but not all
-            # Use the first IPv4 address found
-            ip_address = socket.gethostbyname(website)
-            print(f"  Resolved {website} to {ip_address}")
-            target = ip_address # Ping the IP
-        except socket.gaierror:
-            print(f"  Error: Could not resolve hostname {website}. Skipping.")
-            return None
+            # Use the first IPv4 address found (cached, including failures)
+            with self.instruments.stage("dns"):
+                ip_address = self.resolver.resolve(website)
         except Exception as e:
-            print(f"  Error during DNS resolution for {website}: {e}. Skipping.")
+            self.instruments.warning(f"  Error during DNS resolution for {website}: {e}. Skipping.")
             return None
-
-        # Determine the correct ping command based on OS
-        system = platform.system()
-        if system == "Windows":
-            # -n count: number of pings
-            # -w timeout_ms: wait timeout in milliseconds for each reply
-            cmd = ["ping", "-n", str(count), "-w", str(timeout_sec * 1000), target]
-        elif system == "Linux":
-            # -c count: number of pings
-            # -W timeout_sec: wait timeout in seconds for each reply
-            # -q: quiet output (only summary) - makes parsing easier
-            cmd = ["ping", "-c", str(count), "-W", str(timeout_sec), "-q", target]
-        else: # macOS uses similar flags to Linux for this purpose
-             # -c count: number of pings
-             # -W timeout_ms: wait timeout in milliseconds for each reply (NOTE: macOS uses ms!)
-             # -q: quiet output
-             cmd = ["ping", "-c", str(count), "-W", str(timeout_sec * 1000), "-q", target]
-
-        print(f"  Executing command: {' '.join(cmd)}")
-        ping_times = []
-        try:
-            # Start the process
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            # Communicate and wait for completion or timeout
-            # Use a slightly longer timeout for communicate itself
-            output, error = process.communicate(timeout=timeout_sec * count + 5) # Give extra buffer time
-
-            if process.returncode != 0:
-                print(f"  Ping command failed for {target} (Return Code: {process.returncode}).")
-                if error:
-                    print(f"  Error output: {error.strip()}")
-                if output:
-                    print(f"  Standard output: {output.strip()}")
+        if ip_address is None:
+            self.instruments.warning(f"  Error: Could not resolve hostname {website}. Skipping.")
+            return None
+        self.instruments.debug("  Resolved %s to %s", website, ip_address)
+        target = ip_address # Ping the IP
+
+        # Charge every echo the run may send; ping spaces them itself, so the start only
+        # waits until the last one fits under the limits at that spacing
+        echoes = session.max_echoes if session else count
+        queue_delay = (self.pacer.acquire(target, packets=echoes, interval_sec=DEFAULT_INTERVAL_SEC)
+                       if self.pacer is not None else 0.0)
+        # The wait came out of this probe's deadline; the ping only gets what is left
+        if deadline_sec is not None:
+            deadline_sec -= queue_delay
+            if deadline_sec <= 0:
+                self.instruments.warning(f"  Deadline for {target} passed while queued for pacing. Skipping.")
+                if session is not None:
+                    session.close()
                 return None
-
-            # Parse the ping output (simplified for quiet output)
-            # Look for the summary line: rtt min/avg/max/mdev = 1.234/2.345/3.456/0.123 ms
-            for line in output.splitlines():
-                if 'rtt min/avg/max/mdev' in line or 'round-trip min/avg/max/stddev' in line: # Linux/macOS
-                    parts = line.split('=')[1].strip().split('/')
-                    if len(parts) >= 4:
-                        avg_ping_str = parts[1]
-                        avg_ping = float(avg_ping_str)
-                        print(f"  Successfully parsed avg ping (Linux/macOS): {avg_ping:.2f} ms from summary")
-                        # Return just the average from summary
-                        return {"website": website, "ip_address": target, "avg_ping": avg_ping}
-                elif 'Average =' in line : # Windows specific summary line
-                     parts = line.split('Average =')
-                     if len(parts) > 1:
-                         avg_ping_str = parts[1].strip().split('ms')[0].strip()
-                         avg_ping = float(avg_ping_str)
-                         print(f"  Successfully parsed avg ping (Windows): {avg_ping:.2f} ms from summary")
-                         # Return just the average from summary
-                         return {"website": website, "ip_address": target, "avg_ping": avg_ping}
-
-            # If summary parsing failed, try line-by-line (non-quiet mode fallback, might not trigger with -q)
-            if system == "Windows":
-                for line in output.split('\n'):
-                    if "time=" in line or "time<" in line:
-                        if "time=" in line: time_str = line.split("time=")[1].split("ms")[0].strip()
-                        else: time_str = '0.5' # time<1ms case
-                        try: ping_times.append(float(time_str))
-                        except ValueError: continue
-            else: # Linux/macOS non-quiet
-                for line in output.split('\n'):
-                    if "time=" in line and "icmp_seq" in line:
-                        time_str = line.split("time=")[1].split(" ms")[0].strip()
-                        try: ping_times.append(float(time_str))
-                        except ValueError: continue
-
-            if ping_times:
-                avg_ping = sum(ping_times) / len(ping_times)
-                print(f"  Successfully parsed avg ping (line-by-line fallback): {avg_ping:.2f} ms")
-                return {"website": website, "ip_address": target, "avg_ping": avg_ping, "ping_times": ping_times}
+        # Stream the per-echo reply lines instead of waiting for ping to exit, so a
+        # run cut short by the deadline still keeps the replies it got
+        # Lost echoes reach the session as None, so it counts every echo actually sent
+        stream = PingStream(target, count=echoes, timeout_sec=timeout_sec,
+                            deadline_sec=deadline_sec, instruments=self.instruments,
+                            report_losses=session is not None)
+        if self.instruments.enabled_for("debug"):
+            self.instruments.debug(f"  Executing command: {' '.join(stream.cmd)}")
+        try:
+            if session is None:
+                stream.run()
             else:
-                 print(f"  Could not parse ping times from output for {target}.")
-                 # print(f"--- Full Output ---\n{output}\n--- End Output ---") # Uncomment for deep debug
-                 return None
-
-        except subprocess.TimeoutExpired:
-            print(f"  Ping command timed out for {target} after {timeout_sec * count + 5} seconds.")
-            process.kill() # Ensure the process is terminated
-            output, error = process.communicate() # Clean up
-            return None
+                for rtt in stream:
+                    if not session.record(rtt):
+                        break
+            ping_times = stream.ping_times
         except FileNotFoundError:
-             print(f"  Error: 'ping' command not found. Is it installed and in your system's PATH?")
+             self.instruments.warning(f"  Error: 'ping' command not found. Is it installed and in your system's PATH?")
              return None
         except Exception as e:
-            print(f"  An unexpected error occurred during ping to {target}: {e}")
+            self.instruments.warning(f"  An unexpected error occurred during ping to {target}: {e}")
+            return None
+        finally:
+            if session is not None:
+                session.close()
+
+        if stream.stopped_early:
+            self.instruments.debug("  Stopped after %d replies (%s).", len(ping_times), session.stop_reason)
+
+        if stream.timed_out:
+            self.instruments.warning(f"  Ping command timed out for {target} after {stream.deadline_sec} seconds "
+                                     f"({len(ping_times)} replies kept).")
+
+        if ping_times:
+            avg_ping = sum(ping_times) / len(ping_times)
+            self.instruments.debug("  Successfully parsed %d replies: avg %.2f ms (first reply after %.3fs)",
+                                   len(ping_times), avg_ping, stream.first_sample_sec)
+            return {"website": website, "ip_address": target, "avg_ping": avg_ping, "ping_times": ping_times,
+                    "sent": stream.sent, "queue_delay_ms": queue_delay * 1000}
+
+        if stream.returncode != 0:
+            self.instruments.warning(f"  Ping command failed for {target} (Return Code: {stream.returncode}).")
+            if stream.other_lines:
+                self.instruments.warning(f"  Output: {' | '.join(stream.other_lines)}")
+            self.outages[website] = stream.sent
             return None
 
+        # No per-echo lines (e.g. a ping that only prints its summary): use the summary average
+        avg_ping = stream.parsed.summary.get("avg_ms")
+        if avg_ping is not None:
+            self.instruments.debug("  Successfully parsed avg ping: %.2f ms from summary", avg_ping)
+            return {"website": website, "ip_address": target, "avg_ping": avg_ping,
+                    "queue_delay_ms": queue_delay * 1000}
+
+        self.instruments.warning(f"  Could not parse ping times from output for {target}.")
+        self.outages[website] = stream.sent
+        return None
+
     def get_website_location(self, website):
-        """Get PREDEFINED approximate location for a website domain."""
-        # Extract base domain (e.g., www.google.com -> google.com)
-        parts = website.split('.')
-        if len(parts) >= 2:
-            base_domain = f"{parts[-2]}.{parts[-1]}"
-            # Handle country codes like .co.uk
-            if len(parts) >= 3 and len(parts[-2]) == 2 and len(parts[-1]) == 2:
-                 base_domain = f"{parts[-3]}.{parts[-2]}.{parts[-1]}"
-        else:
-            base_domain = website # Cannot simplify further
+        """Get PREDEFINED approximate location for a website domain.
 
-        # Look up known locations by full name first, then base domain
-        if website in self.geo_locations:
-            loc = self.geo_locations[website]
-            # print(f"  Found direct location for {website}: {loc}")
-            return loc
-        elif base_domain in self.geo_locations:
-            loc = self.geo_locations[base_domain]
-            # print(f"  Found base domain location for {website} ({base_domain}): {loc}")
+        The longest known suffix wins: www.google.co.uk -> google.co.uk, health.gov.au -> gov.au.
+        """
+        domain, loc = self.domain_index.lookup(website)
+        if loc is not None:
             return loc
-        else:
-            # Fallback to a default location
-            default_loc = self.geo_locations["fallback_default"]
-            print(f"  Warning: No predefined location found for {website} or {base_domain}. Using default: {default_loc}")
-            return default_loc
+
+        # Fallback to a default location (warn once per hostname)
+        default_loc = self.geo_locations["fallback_default"]
+        if website not in self._unmapped_warned:
+            self._unmapped_warned.add(website)
+            self.instruments.warning(f"  Warning: No predefined location found for {website}. "
+                                     f"Using default: {default_loc}")
+        return default_loc
+
+    def locate(self, website, ip_address=None):
+        """Location for a probed website: by resolved IP when the IP index covers it, else by domain.
+
+        Returns (lat, lon, source) with source 'ip' or 'domain'.
+        """
+        if self.ip_geo is not None and ip_address:
+            loc = self.ip_geo.lookup(ip_address)
+            if loc is not None:
+                return loc[0], loc[1], 'ip'
+        lat, lon = self.get_website_location(website)
+        return lat, lon, 'domain'
 
     def add_ping_point_to_grid(self, lat, lon, ping_time):
         """Add a ping measurement point to the grid (using minimum)."""
@@ -252,24 +291,182 @@ class PingHeatmap:
         self.ping_grid[lat_idx, lon_idx] = min(self.ping_grid[lat_idx, lon_idx], ping_time)
         # No print here, done in main loop
 
-    def generate_visualization(self, output_file="ping_visualization.png", plot_type='scatter'):
-        """Generate visualization from collected ping data."""
-        print("\nGenerating visualization...")
+    def grid_indices(self, lats, lons):
+        """Nearest lat_grid/lon_grid indices for arrays of coordinates.
+
+        The grids are uniform, so the index is computed arithmetically instead of
+        scanning the grid; exact ties round down, matching argmin in add_ping_point_to_grid.
+        """
+        lat_step = 180.0 / max(len(self.lat_grid) - 1, 1)
+        lon_step = 360.0 / max(len(self.lon_grid) - 1, 1)
+        lat_idx = np.ceil((np.asarray(lats, dtype=np.float64) + 90.0) / lat_step - 0.5).astype(np.intp)
+        lon_idx = np.ceil((np.asarray(lons, dtype=np.float64) + 180.0) / lon_step - 0.5).astype(np.intp)
+        np.clip(lat_idx, 0, len(self.lat_grid) - 1, out=lat_idx)
+        np.clip(lon_idx, 0, len(self.lon_grid) - 1, out=lon_idx)
+        return lat_idx, lon_idx
+
+    def add_ping_points_to_grid(self, lats, lons, ping_times):
+        """Batch version of add_ping_point_to_grid: keep the minimum ping per cell."""
+        lat_idx, lon_idx = self.grid_indices(lats, lons)
+        np.minimum.at(self.ping_grid, (lat_idx, lon_idx), np.asarray(ping_times, dtype=self.ping_grid.dtype))
+
+    def aggregate_ping_points(self, lats, lons, ping_times, reducer='min'):
+        """Reduce samples onto a fresh grid shaped like ping_grid. Empty cells are NaN.
+
+        reducer is one of 'min', 'mean', 'median' or 'count'.
+        """
+        lat_idx, lon_idx = self.grid_indices(lats, lons)
+        pings = np.asarray(ping_times, dtype=np.float64)
+        shape = self.ping_grid.shape
+        flat_idx = np.ravel_multi_index((lat_idx, lon_idx), shape)
+        size = shape[0] * shape[1]
+
+        counts = np.bincount(flat_idx, minlength=size)
+        if reducer == 'count':
+            return counts.reshape(shape).astype(np.float64)
+
+        if reducer == 'min':
+            grid = np.full(size, np.inf)
+            np.minimum.at(grid, flat_idx, pings)
+        elif reducer == 'mean':
+            grid = np.bincount(flat_idx, weights=pings, minlength=size) / np.maximum(counts, 1)
+        elif reducer == 'median':
+            # Sort by cell then ping; each cell's median sits in the middle of its run
+            order = np.lexsort((pings, flat_idx))
+            sorted_pings = pings[order]
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            occupied = counts > 0
+            lower = starts[occupied] + (counts[occupied] - 1) // 2
+            upper = starts[occupied] + counts[occupied] // 2
+            grid = np.zeros(size)
+            grid[occupied] = (sorted_pings[lower] + sorted_pings[upper]) / 2
+        else:
+            raise ValueError(f"Unknown reducer '{reducer}'. Choose 'min', 'mean', 'median' or 'count'.")
+
+        grid[counts == 0] = np.nan
+        return grid.reshape(shape)
 
+    def rebuild_grid_from_results(self):
+        """Recompute ping_grid from every stored result in one batch pass."""
+        self.ping_grid.fill(1000.0)
+        results = self.ping_results_list
+        self.add_ping_points_to_grid(results.lats, results.lons, results.pings)
+
+    def export_results(self, output_file="ping_results.npz"):
+        """Save the collected results as compressed columns (see PingResultStore.load)."""
+        with self.instruments.stage("save"):
+            self.ping_results_list.save(output_file)
+        self.instruments.info(f"Exported {len(self.ping_results_list)} results to {output_file}")
+
+    def interpolate_grid(self, method='idw', **kwargs):
+        """Fill every lat_grid/lon_grid cell from the collected results.
+
+        method is 'idw' (inverse-distance weighting), 'kernel' (Gaussian smoothing on
+        great-circle distance) or 'smooth' (FFT approximation of 'kernel', fastest on
+        fine grids); kwargs go to SphericalInterpolator. Cells out of range of every
+        sample are NaN.
+        """
+        results = self.ping_results_list
+        # Imported here so probe-only and export-only runs don't pay for scipy
+        from interpolation import SphericalInterpolator
+        interpolator = SphericalInterpolator(results.lats, results.lons, results.pings)
+        return interpolator.grid(self.lat_grid, self.lon_grid, method=method, **kwargs)
+
+    def build_tile_pyramid(self, max_zoom=4, tile_size=256, cache_tiles=256):
+        """Aggregate the collected results once into a sparse TilePyramid.
+
+        With the defaults the finest level has ~0.044 degree cells, but only the tiles
+        that contain samples are allocated (as float32).
+        """
+        self.tile_pyramid = TilePyramid(max_zoom=max_zoom, tile_size=tile_size, cache_tiles=cache_tiles)
+        results = self.ping_results_list
+        self.tile_pyramid.add_points(results.lats, results.lons, results.pings)
+        stats = self.tile_pyramid.stats()
+        self.instruments.info(f"Tile pyramid: {stats['base_tiles']}/{stats['base_tiles_possible']} tiles at zoom {max_zoom}, "
+                              f"{stats['base_bytes'] / 1e6:.1f} MB (dense: {stats['dense_bytes'] / 1e6:.1f} MB)")
+        return self.tile_pyramid
+
+    def generate_region_visualization(self, region='australia', zoom=None, output_file="ping_region.png"):
+        """Render one region from the tile pyramid at a zoom suited to its size.
+
+        region is a tile_pyramid.REGIONS name or (lat_min, lat_max, lon_min, lon_max).
+        Only the tiles overlapping the region are built, so zooming into a small area
+        doesn't pay for the whole world.
+        """
+        self.instruments.info(f"Generating region visualization for {region}...")
         if not self.ping_results_list:
-            print("Error: No successful ping data collected. Cannot generate visualization.")
+            self.instruments.error("Error: No successful ping data collected. Cannot generate visualization.")
             return
+        if self.tile_pyramid is None:
+            self.build_tile_pyramid()
 
-        # --- Setup Map ---
-        plt.figure(figsize=(16, 8))
-        ax = plt.axes(projection=ccrs.Miller()) # Miller projection is decent for world view
-        ax.set_global()
+        try:
+            grid, lat_edges, lon_edges = self.tile_pyramid.region(region, zoom)
+        except ValueError as e:
+            self.instruments.error(f"Error: {e}")
+            return
+        if np.all(np.isnan(grid)):
+            self.instruments.error(f"Error: No samples inside region {region}.")
+            return
+
+        plotting = load_plotting(headless=self.headless)
+        plt, ccrs, cfeature = plotting.plt, plotting.ccrs, plotting.cfeature
+        cmap = plotting.LinearSegmentedColormap.from_list(
+            'ping_cmap', [(0, 1, 0, 1), (1, 1, 0, 1), (1, 0, 0, 1)], N=256)
+
+        fig = plt.figure(figsize=(12, 9))
+        try:
+            ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
+            ax.set_extent([lon_edges[0], lon_edges[-1], lat_edges[-1], lat_edges[0]], crs=ccrs.PlateCarree())
+            ax.add_feature(cfeature.LAND, facecolor='lightgray', zorder=0)
+            ax.add_feature(cfeature.OCEAN, facecolor='lightblue', zorder=0)
+            ax.add_feature(cfeature.COASTLINE, linewidth=0.5, zorder=1)
+            ax.add_feature(cfeature.BORDERS, linestyle=':', linewidth=0.5, zorder=1)
+            ax.gridlines(draw_labels=True, dms=True, x_inline=False, y_inline=False, zorder=2)
+
+            # Shared colour scale so regions rendered separately stay comparable
+            mesh = ax.pcolormesh(lon_edges, lat_edges, grid, transform=ccrs.PlateCarree(), cmap=cmap,
+                                 vmin=self.tile_pyramid.vmin, vmax=max(self.tile_pyramid.vmax, self.tile_pyramid.vmin + 1e-6),
+                                 shading='flat', zorder=3)
+            fig.colorbar(mesh, ax=ax, shrink=0.7, label='Minimum Ping Latency (ms)')
+            cell_deg = lat_edges[0] - lat_edges[1]
+            ax.set_title(f'Ping Latency, {region if isinstance(region, str) else "region"} '
+                         f'({cell_deg:.3f} degree cells)', pad=20)
+
+            fig.savefig(output_file, dpi=150, bbox_inches='tight')
+            self.instruments.info(f"Region visualization saved to {output_file}")
+            if not self.headless:
+                plt.show()
+        except Exception as e:
+            self.instruments.error(f"Error rendering region visualization: {e}")
+        finally:
+            plt.close(fig)
 
-        ax.add_feature(cfeature.LAND, facecolor='lightgray', zorder=0)
-        ax.add_feature(cfeature.OCEAN, facecolor='lightblue', zorder=0)
-        ax.add_feature(cfeature.COASTLINE, linewidth=0.5, zorder=1)
-        ax.add_feature(cfeature.BORDERS, linestyle=':', linewidth=0.5, zorder=1)
-        ax.gridlines(draw_labels=True, dms=True, x_inline=False, y_inline=False, zorder=2)
+    def generate_visualization(self, output_file="ping_visualization.png", plot_type='scatter',
+                               interpolation=None, interpolation_options=None):
+        """Generate visualization from collected ping data.
+
+        For plot_type='pcolormesh', interpolation='idw', 'kernel' or 'smooth' fills the whole grid
+        from the samples instead of showing only the cells that were hit.
+        """
+        self.instruments.info("Generating visualization...")
+
+        if not self.ping_results_list:
+            self.instruments.error("Error: No successful ping data collected. Cannot generate visualization.")
+            return
+
+        # matplotlib/cartopy are only imported once something is actually rendered
+        plotting = load_plotting(headless=self.headless)
+        plt, ccrs = plotting.plt, plotting.ccrs
+
+        # --- Setup Map ---
+        # The Miller-projection background (land, ocean, coastlines, borders, gridlines)
+        # is rendered once and cached; only the data layer is drawn on each call
+        try:
+            fig, ax, cax = self.basemap_cache.new_figure()
+        except Exception as e:
+            self.instruments.error(f"Error preparing map background: {e}")
+            return
 
         # --- Create Colormap (Green -> Yellow -> Red) ---
         color_list = [
@@ -277,28 +474,28 @@ class PingHeatmap:
             (1, 1, 0, 1),    # Yellow - medium ping
             (1, 0, 0, 1)     # Deep red - high ping
         ]
-        cmap = LinearSegmentedColormap.from_list('ping_cmap', color_list, N=256)
+        cmap = plotting.LinearSegmentedColormap.from_list('ping_cmap', color_list, N=256)
 
-        # --- Extract data for plotting ---
-        lats = [p[0] for p in self.ping_results_list]
-        lons = [p[1] for p in self.ping_results_list]
-        pings = [p[2] for p in self.ping_results_list]
-        # websites = [p[3] for p in self.ping_results_list] # Could use for annotations
+        # --- Extract data for plotting (zero-copy column views) ---
+        lats = self.ping_results_list.lats
+        lons = self.ping_results_list.lons
+        pings = self.ping_results_list.pings
+        # websites = self.ping_results_list.websites # Could use for annotations
 
-        if not pings: # Double check after extraction
-             print("Error: No valid ping values found in results list.")
-             plt.close()
+        if not len(pings): # Double check after extraction
+             self.instruments.error("Error: No valid ping values found in results list.")
+             plt.close(fig)
              return
 
-        min_ping = min(pings) if pings else 0
-        max_ping = max(pings) if pings else 100 # Avoid division by zero if only one point
+        min_ping = float(pings.min())
+        max_ping = float(pings.max())
 
-        print(f"Plotting {len(pings)} data points.")
-        print(f"Ping range: {min_ping:.2f} ms to {max_ping:.2f} ms")
+        self.instruments.debug("Plotting %d data points.", len(pings))
+        self.instruments.debug("Ping range: %.2f ms to %.2f ms", min_ping, max_ping)
 
         # --- Choose Plot Type ---
         if plot_type == 'scatter':
-            print("Using scatter plot visualization.")
+            self.instruments.debug("Using scatter plot visualization.")
             sc = ax.scatter(
                 lons, lats,
                 c=pings,
@@ -311,18 +508,27 @@ class PingHeatmap:
                 linewidth=0.5,
                 zorder=3 # Make sure points are on top
             )
-            plt.colorbar(sc, ax=ax, label='Average Ping Latency (ms)', shrink=0.6)
-            plt.title(f'Ping Latency to {len(pings)} Websites (Scatter Plot)')
+            fig.colorbar(sc, cax=cax, label='Average Ping Latency (ms)')
+            ax.set_title(f'Ping Latency to {len(pings)} Websites (Scatter Plot)', pad=20)
 
         elif plot_type == 'pcolormesh':
-            print("Using pcolormesh plot visualization (may look sparse).")
-            # Prepare grid data - use the self.ping_grid updated earlier
-            viz_grid = np.copy(self.ping_grid)
-            viz_grid[viz_grid >= 1000] = np.nan # Replace placeholder with NaN
+            if interpolation:
+                self.instruments.debug("Using pcolormesh plot visualization (%s interpolation).", interpolation)
+                try:
+                    viz_grid = self.interpolate_grid(interpolation, **(interpolation_options or {}))
+                except ValueError as e:
+                    self.instruments.error(f"Error: {e}")
+                    plt.close(fig)
+                    return
+            else:
+                self.instruments.debug("Using pcolormesh plot visualization (may look sparse).")
+                # Prepare grid data - use the self.ping_grid updated earlier
+                viz_grid = np.copy(self.ping_grid)
+                viz_grid[viz_grid >= 1000] = np.nan # Replace placeholder with NaN
 
             if np.all(np.isnan(viz_grid)):
-                 print("Error: All grid data is NaN for pcolormesh.")
-                 plt.close()
+                 self.instruments.error("Error: All grid data is NaN for pcolormesh.")
+                 plt.close(fig)
                  return
 
             # Get meshgrid for plotting coordinates
@@ -331,7 +537,7 @@ class PingHeatmap:
             # Need valid min/max from the grid itself for color scaling
             grid_min_ping = np.nanmin(viz_grid)
             grid_max_ping = np.nanmax(viz_grid)
-            print(f"Grid ping range for pcolormesh: {grid_min_ping:.2f} to {grid_max_ping:.2f} ms")
+            self.instruments.debug("Grid ping range for pcolormesh: %.2f to %.2f ms", grid_min_ping, grid_max_ping)
 
             # Add a small epsilon if min and max are the same
             if grid_min_ping == grid_max_ping:
@@ -347,60 +553,336 @@ class PingHeatmap:
                 shading='auto', # or 'nearest'/'gouraud' if needed
                 zorder=3
             )
-            plt.colorbar(mesh, ax=ax, label='Average Ping Latency (ms)', shrink=0.6)
-            plt.title(f'Ping Latency Heatmap ({len(pings)} points, pcolormesh)')
+            fig.colorbar(mesh, cax=cax, label='Average Ping Latency (ms)')
+            ax.set_title(f'Ping Latency Heatmap ({len(pings)} points, pcolormesh)', pad=20)
 
         else:
-            print(f"Error: Unknown plot_type '{plot_type}'. Choose 'scatter' or 'pcolormesh'.")
-            plt.close()
+            self.instruments.error(f"Error: Unknown plot_type '{plot_type}'. Choose 'scatter' or 'pcolormesh'.")
+            plt.close(fig)
             return
 
         # --- Finalize and Save ---
         try:
-            plt.savefig(output_file, dpi=300, bbox_inches='tight')
-            print(f"Visualization saved to {output_file}")
-            plt.show()
+            self.basemap_cache.save(fig, output_file)
+            self.instruments.info(f"Visualization saved to {output_file} (basemap from {self.basemap_cache.last_source})")
+            if not self.headless:
+                plt.show()
         except Exception as e:
-            print(f"Error saving or showing plot: {e}")
+            self.instruments.error(f"Error saving or showing plot: {e}")
         finally:
-             plt.close() # Close the plot figure window
-
-
-    def run_analysis(self, websites, ping_count=4, timeout_sec=5, plot_type='scatter', output_file="ping_visualization.png"):
-        """Runs the full ping analysis and generates the visualization."""
-        print(f"\n--- Starting Ping Analysis ({time.strftime('%Y-%m-%d %H:%M:%S')}) ---")
-        print(f"Pinging {len(websites)} websites (Count={ping_count}, Timeout={timeout_sec}s each)...")
+             plt.close(fig) # Close the plot figure window
+
+
+    def run_analysis(self, websites, ping_count=4, timeout_sec=5, plot_type='scatter', output_file="ping_visualization.png",
+                     workers=1, target_deadline=None, sweep_deadline=None, backend='subprocess', dedupe=True,
+                     adaptive=None, bypass_cache=False, budget_sec=None):
+        """Runs the full ping analysis and generates the visualization.
+
+        backend='subprocess' runs the system ping per target through the scheduler;
+        backend='async' probes every target from one event loop (see async_prober), with
+        workers probes in flight at once and the same deadlines.
+        With dedupe, repeated websites share one probe session of ping_count x repeats
+        echoes, and its samples are split back across the repeated entries.
+        With an adaptive.AdaptiveSampler, each target gets between its min_echoes and
+        max_echoes echoes instead of a fixed ping_count.
+        With a result cache, targets probed recently with the same parameters reuse the
+        cached result unless bypass_cache is set (their fresh results are still stored).
+        With a planner, targets are probed in priority order and budget_sec (also the
+        default sweep_deadline) limits the sweep to the targets expected to fit in it.
+        """
+        self.instruments.info(f"\n--- Starting Ping Analysis ({time.strftime('%Y-%m-%d %H:%M:%S')}) ---")
+        self.instruments.info(f"Pinging {len(websites)} websites (Count={ping_count}, Timeout={timeout_sec}s each, "
+                              f"Workers={workers})...")
 
         # Reset results from any previous runs on this object
         self.ping_grid.fill(1000.0)
-        self.ping_results_list = []
+        self.ping_results_list.clear()
         successful_pings = 0
 
-        for i, website in enumerate(websites):
-            print(f"\n[{i+1}/{len(websites)}] Pinging {website}...")
-            ping_result = self.run_ping(website, count=ping_count, timeout_sec=timeout_sec)
+        # Collapse repeats into one session per unique website
+        if dedupe:
+            multiplicity = Counter(websites)
+            probe_targets = list(multiplicity)
+            self.instruments.info(f"Collapsed {len(websites)} entries into {len(probe_targets)} unique probe sessions.")
+        else:
+            multiplicity = None
+            probe_targets = list(websites)
+        probe_counts = [ping_count * (multiplicity[w] if multiplicity else 1) for w in probe_targets]
 
-            if ping_result and 'avg_ping' in ping_result:
-                successful_pings += 1
-                avg_ping = ping_result['avg_ping']
-                print(f"  Success! Avg Ping: {avg_ping:.2f} ms")
+        if backend not in ('subprocess', 'async'):
+            self.instruments.error(f"Error: Unknown backend '{backend}'. Choose 'subprocess' or 'async'.")
+            return
 
-                # Get location and add to grid and list
-                lat, lon = self.get_website_location(website)
-                print(f"  Mapped to location (Lat, Lon): ({lat:.4f}, {lon:.4f})")
-                self.add_ping_point_to_grid(lat, lon, avg_ping)
-                self.ping_results_list.append([lat, lon, avg_ping, website])
+        if budget_sec is not None and sweep_deadline is None:
+            sweep_deadline = budget_sec
+        probe_results = self.probe_websites(probe_targets, probe_counts, timeout_sec=timeout_sec, workers=workers,
+                                            target_deadline=target_deadline, sweep_deadline=sweep_deadline,
+                                            backend=backend, adaptive=adaptive, bypass_cache=bypass_cache,
+                                            budget_sec=budget_sec)
+        if self.last_deferred:
+            # Entries the planner left out are not waited for; deduplicated repeats share their target's fate
+            deferred = set(self.last_deferred)
+            if multiplicity:
+                deferred_sites = {probe_targets[i] for i in deferred}
+                websites = [w for w in websites if w not in deferred_sites]
             else:
-                print(f"  Ping failed or no result for {website}.")
+                websites = [w for i, w in enumerate(websites) if i not in deferred]
 
-            # Optional small delay between pings to avoid overwhelming network/servers
-            # time.sleep(0.2)
+        if multiplicity:
+            entry_results = self.expand_deduplicated_results(websites, probe_results, multiplicity)
+        else:
+            entry_results = probe_results
+
+        for i, (website, ping_result) in enumerate(entry_results):
+            self.instruments.debug("\n[%d/%d] Pinged %s...", i + 1, len(websites), website)
+            if self.record_ping_result(website, ping_result):
+                successful_pings += 1
 
-        print(f"\n--- Analysis Complete ---")
-        print(f"Successfully pinged {successful_pings} out of {len(websites)} websites.")
+        scheduler = self.last_scheduler
+        if scheduler is not None and (scheduler.timed_out or scheduler.abandoned):
+            self.instruments.warning(f"Deadlines hit: {scheduler.timed_out} pings timed out, "
+                                     f"{scheduler.abandoned} abandoned.")
+        if self.pacer is not None:
+            pacer_stats = self.pacer.stats()
+            self.instruments.info(f"Pacing: {pacer_stats['delayed']} of {pacer_stats['acquired']} probes queued, "
+                                  f"avg {pacer_stats['avg_queue_delay_ms']:.1f} ms / "
+                                  f"max {pacer_stats['max_queue_delay_ms']:.1f} ms queueing (not included in RTTs)")
+        if adaptive is not None:
+            adaptive_stats = adaptive.stats()
+            self.instruments.info(f"Adaptive probing: {adaptive_stats['echoes']} echoes for "
+                                  f"{adaptive_stats['targets']} targets "
+                                  f"({adaptive_stats['avg_echoes_per_target']:.1f} per target), stop reasons: "
+                                  f"{adaptive_stats['stop_reasons']}")
+
+        self.instruments.info(f"\n--- Analysis Complete ---")
+        self.instruments.info(f"Successfully pinged {successful_pings} out of {len(websites)} websites.")
+        with self.instruments.stage("save"):
+            if self.sample_log is not None:
+                self.sample_log.flush()
+            if self.result_cache is not None:
+                self.result_cache.flush()
+            if self.planner is not None:
+                self.planner.save()
+            self.resolver.save()
+        if self.result_cache is not None:
+            cache_stats = self.result_cache.stats()
+            self.instruments.info(f"Result cache: {cache_stats['hits']} fresh hits, {cache_stats['stale']} stale, "
+                                  f"{cache_stats['misses']} misses, {cache_stats['stored']} results stored")
+        dns_stats = self.resolver.stats()
+        self.instruments.info(f"DNS cache: {dns_stats['hits']} hits, {dns_stats['negative_hits']} negative hits, "
+                              f"{dns_stats['misses']} misses, "
+                              f"~{dns_stats['estimated_time_saved_sec']:.2f}s resolver time saved")
 
         # Generate the visualization
-        self.generate_visualization(output_file=output_file, plot_type=plot_type)
+        with self.instruments.stage("render"):
+            self.generate_visualization(output_file=output_file, plot_type=plot_type)
+        self.instruments.report()
+
+    def probe_websites(self, websites, counts, timeout_sec=5, workers=1, target_deadline=None, sweep_deadline=None,
+                       backend='subprocess', adaptive=None, bypass_cache=False, budget_sec=None):
+        """Probe each website once with its own echo count, yielding (website, result) pairs.
+
+        Resolution is done for the whole list up front, and every session is appended
+        to the sample log when one is configured. An adaptive sampler replaces the
+        fixed counts with early stopping under its global echo budget. Websites with a
+        fresh entry in the result cache are answered from it without probing. With a
+        planner the rest are probed in its priority order, and websites that don't fit
+        in budget_sec are left out (their positions in websites are in last_deferred).
+        Results come in list order whenever a result cache is configured, else in probe order.
+        """
+        # Resolve the whole list concurrently up front so probes hit a warm cache
+        self.resolver.reset_stats()
+        with self.instruments.stage("dns_batch"):
+            addresses = self.resolver.resolve_many(websites)
+
+        all_websites, all_counts = websites, counts
+        # Cache hits, cache keys and probed entries by position in the list, so repeats stay apart
+        cached, cache_keys = {}, {}
+        probe_indices = list(range(len(websites)))
+        if self.result_cache is not None:
+            self.result_cache.reset_stats()
+            with self.instruments.stage("cache_lookup"):
+                for i, (website, count) in enumerate(zip(websites, counts)):
+                    cache_keys[i] = params_key(tool="heatmap", count=count, timeout_sec=timeout_sec,
+                                               adaptive=adaptive is not None)
+                    result = None if bypass_cache else self.result_cache.get(website, addresses.get(website),
+                                                                             cache_keys[i])
+                    if result is not None:
+                        cached[i] = result
+            if cached:
+                self.instruments.info(f"Reusing {len(cached)} fresh cached results; "
+                                      f"probing {len(websites) - len(cached)} targets.")
+                self.instruments.count("results_cached", len(cached))
+                probe_indices = [i for i in probe_indices if i not in cached]
+                websites = [all_websites[i] for i in probe_indices]
+                counts = [all_counts[i] for i in probe_indices]
+
+        self.last_deferred = []
+        if self.planner is not None:
+            # Expected probe duration: ping sends one echo per second
+            cost_sec = sum(counts) / len(counts) if counts else 1.0
+            with self.instruments.stage("plan"):
+                planned = self.planner.plan_indices(websites, budget_sec=budget_sec, workers=workers,
+                                                    cost_sec=cost_sec)
+            self.last_deferred = sorted(probe_indices[k] for k in self.planner.deferred_indices)
+            probe_indices = [probe_indices[k] for k in planned]
+            websites = [all_websites[i] for i in probe_indices]
+            counts = [all_counts[i] for i in probe_indices]
+            if self.planner.deferred:
+                self.instruments.info(f"Planner: probing the {len(websites)} most valuable targets within "
+                                      f"{budget_sec}s; {len(self.planner.deferred)} deferred to a later sweep.")
+
+        probe_results = self._probe_uncached(websites, counts, timeout_sec, workers, target_deadline,
+                                             sweep_deadline, backend, adaptive)
+        if self.planner is not None:
+            probe_results = self.planner.track(probe_results, probed=self._was_probed)
+        if self.result_cache is None:
+            return probe_results
+        return self.merge_cached_results(all_websites, probe_results, cached, cache_keys, probe_indices)
+
+    def _was_probed(self, position, website, result):
+        """Whether the probe at this position of the sweep actually pinged its target."""
+        scheduler = self.last_scheduler
+        if scheduler is not None and position in scheduler.dropped:
+            return False
+        return result is not None or website in self.outages
+
+    def _probe_uncached(self, websites, counts, timeout_sec, workers, target_deadline, sweep_deadline, backend,
+                        adaptive):
+        """Probe with the chosen backend, yielding (website, result) in list order."""
+        self.outages = {}
+        if adaptive is not None:
+            adaptive.start_sweep(len(websites))
+        if self.pacer is not None:
+            self.pacer.reset_stats()
+
+        self.last_scheduler = None
+        if backend == 'async':
+            prober = AsyncProber(max_in_flight=workers, timeout_sec=timeout_sec, resolver=self.resolver,
+                                 adaptive=adaptive, pacer=self.pacer, instruments=self.instruments)
+            self.instruments.info(f"Probing from one event loop using {prober.method.upper()} echoes...")
+            probe_results = zip(websites, prober.run(websites, count=counts, target_deadline=target_deadline,
+                                                     sweep_deadline=sweep_deadline))
+            self.outages = prober.outages
+            # Same deadline counters as the scheduler, for the report and the planner
+            self.last_scheduler = prober
+        elif backend == 'subprocess':
+            # Fan pings out over a bounded pool; results come back in list order so the
+            # grid and results list match what a one-at-a-time sweep would produce
+            scheduler = ProbeScheduler(
+                lambda target, deadline_sec: self.run_ping(target[0], count=target[1], timeout_sec=timeout_sec,
+                                                           session=adaptive.session(target[0]) if adaptive else None,
+                                                           deadline_sec=deadline_sec),
+                workers=workers,
+                target_deadline=target_deadline,
+                sweep_deadline=sweep_deadline,
+                pass_deadline=True,
+                instruments=self.instruments
+            )
+            self.last_scheduler = scheduler
+            probe_results = ((target[0], result) for _, target, result
+                             in scheduler.run_ordered(list(zip(websites, counts))))
+        else:
+            raise ValueError(f"Unknown backend '{backend}'. Choose 'subprocess' or 'async'.")
+
+        if self.sample_log is not None:
+            probe_results = self.log_probe_results(probe_results, dict(zip(websites, counts)))
+        return probe_results
+
+    def merge_cached_results(self, websites, probe_results, cached, cache_keys, probe_indices):
+        """Yield (website, result) for every entry of websites in list order, storing fresh results in the cache.
+
+        cached and cache_keys are keyed by list position; probe_results hold the results of the
+        entries at probe_indices, in that order, and are held back until the entries before
+        them are out. Entries in neither (left out by the planner) are skipped.
+        """
+        probed = {}
+        pending = zip(probe_indices, probe_results)
+        expected = set(probe_indices)
+        for i, website in enumerate(websites):
+            if i in cached:
+                yield website, cached[i]
+                continue
+            if i not in expected:
+                continue
+            for index, (probed_website, result) in pending:
+                self.result_cache.put(probed_website, result.get('ip_address') if result else None,
+                                      cache_keys[index], result)
+                probed[index] = result
+                if index == i:
+                    break
+            if i in probed:
+                yield website, probed.pop(i)
+        self.result_cache.flush()
+
+    def log_probe_results(self, probe_results, probe_counts):
+        """Pass (website, result) pairs through, appending each session to the sample log.
+
+        Summary-only results (no per-echo times) are logged with the summary average
+        standing in as the only echo.
+        """
+        for website, result in probe_results:
+            if result and result.get('ping_times'):
+                # Streams cut short by their deadline report how many echoes actually went out
+                self.sample_log.append(website, result.get('ip_address'), result['ping_times'],
+                                       result.get('sent', probe_counts[website]), packet_loss=result.get('packet_loss'))
+            elif result:
+                self.sample_log.append(website, result.get('ip_address'), [result['avg_ping']],
+                                       probe_counts[website], packet_loss=result.get('packet_loss', 0.0))
+            else:
+                self.sample_log.append(website, None, [], probe_counts[website])
+            yield website, result
+
+    def expand_deduplicated_results(self, websites, probe_results, multiplicity):
+        """Yield (website, result) per original entry from one result per unique website.
+
+        When per-echo times are available the k-th repeat of a website gets the k-th
+        slice of its samples; summary-only results are shared by every repeat.
+        """
+        split_results = {}
+        next_entry = 0
+        for website, result in probe_results:
+            split_results[website] = self.split_ping_result(result, multiplicity[website])
+            # Release entries in the original order as soon as their website is done
+            while next_entry < len(websites) and websites[next_entry] in split_results:
+                yield websites[next_entry], split_results[websites[next_entry]].pop(0)
+                next_entry += 1
+
+    def split_ping_result(self, result, parts):
+        """Split one merged probe result into `parts` per-entry results."""
+        if not result or parts == 1:
+            return [result] * parts
+        ping_times = result.get('ping_times') or []
+        if len(ping_times) < parts:
+            return [result] * parts
+
+        chunk, extra = divmod(len(ping_times), parts)
+        split, start = [], 0
+        for k in range(parts):
+            end = start + chunk + (1 if k < extra else 0)
+            part_times = ping_times[start:end]
+            split.append(dict(result, ping_times=part_times, avg_ping=sum(part_times) / len(part_times)))
+            start = end
+        return split
+
+    def record_ping_result(self, website, ping_result):
+        """Add one ping result to the grid and results list. Returns True if it was usable."""
+        if ping_result and 'avg_ping' in ping_result:
+            avg_ping = ping_result['avg_ping']
+            self.instruments.debug("  Success! Avg Ping: %.2f ms", avg_ping)
+
+            # Get location (by resolved IP if possible) and add to grid and list
+            with self.instruments.stage("grid_update"):
+                lat, lon, source = self.locate(website, ping_result.get('ip_address'))
+                self.add_ping_point_to_grid(lat, lon, avg_ping)
+                self.ping_results_list.append([lat, lon, avg_ping, website])
+            self.instruments.debug("  Mapped to location (Lat, Lon): (%.4f, %.4f) by %s", lat, lon, source)
+            self.instruments.count("results_recorded")
+            return True
+
+        self.instruments.debug("  Ping failed or no result for %s.", website)
+        self.instruments.count("results_failed")
+        return False
 
 
 # --- Main Execution ---
@@ -495,7 +977,9 @@ if __name__ == "__main__":
         ping_count=4,       # Number of pings per site
         timeout_sec=5,      # Timeout per ping reply
         plot_type='scatter', # Use 'scatter' (recommended) or 'pcolormesh'
-        output_file="ping_latency_scatter.png"
+        output_file="ping_latency_scatter.png",
+        workers=16,         # Pings in flight at once
+        sweep_deadline=300  # Give up on anything still pending after 5 minutes
     )
 
     # # Example: To generate the pcolormesh heatmap instead (might look very sparse!)
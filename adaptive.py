@@ -0,0 +1,202 @@
+import math
+import threading
+from statistics import NormalDist
+
+
+def t_critical(confidence, dof):
+    """
+    Two-sided Student t critical value
+
+    Uses the Cornish-Fisher expansion around the normal quantile, which is within
+    about 1% of the exact value from 3 degrees of freedom up (and avoids scipy).
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    if dof <= 0:
+        return math.inf
+    return (z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3))
+
+
+class RunningStats:
+    def __init__(self):
+        """Welford's online mean and variance."""
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def ci_half_width(self, confidence):
+        """Half-width of the confidence interval for the mean (inf below two values)."""
+        if self.n < 2:
+            return math.inf
+        return t_critical(confidence, self.n - 1) * math.sqrt(self.variance / self.n)
+
+
+class AdaptiveSession:
+    def __init__(self, sampler, target):
+        """Echo-by-echo state for one target; created by AdaptiveSampler.session()."""
+        self.sampler = sampler
+        self.target = target
+        self.rtt = RunningStats()
+        self.jitter = RunningStats()   # absolute differences of consecutive RTTs
+        self.sent = 0
+        self.stop_reason = None
+        self._last_rtt = None
+        self._extra_granted = False
+
+    @property
+    def max_echoes(self):
+        return self.sampler.max_echoes
+
+    def converged(self):
+        sampler = self.sampler
+        if self.rtt.n < max(sampler.min_echoes, 2):
+            return False
+        tolerance = max(sampler.abs_tolerance_ms, sampler.rel_tolerance * self.rtt.mean)
+        if self.rtt.ci_half_width(sampler.confidence) > tolerance:
+            return False
+        if sampler.jitter_tolerance_ms is None:
+            return True
+        return self.jitter.ci_half_width(sampler.confidence) <= sampler.jitter_tolerance_ms
+
+    def record(self, rtt):
+        """
+        Fold in one echo and decide whether to send another
+
+        :param rtt: Round-trip time in ms, or None for a lost echo
+        :return: True to keep probing, False to stop (reason in stop_reason)
+        """
+        self.sent += 1
+        if rtt is not None:
+            self.rtt.add(rtt)
+            if self._last_rtt is not None:
+                self.jitter.add(abs(rtt - self._last_rtt))
+            self._last_rtt = rtt
+
+        if self.sent >= self.sampler.max_echoes:
+            reason = 'max_echoes'
+        elif self.converged():
+            reason = 'converged'
+        elif self.sent >= self.sampler.min_echoes and self.rtt.n == 0:
+            reason = 'no_reply'
+        else:
+            reason = None
+        if self.sampler._account(self, reason):
+            return True
+        self.stop_reason = reason or 'budget'
+        return False
+
+    def close(self):
+        """Mark the end of probing when the probe stopped on its own (deadline, error)."""
+        if self.stop_reason is None:
+            self.stop_reason = 'ended'
+            self.sampler._release(self)
+
+
+class AdaptiveSampler:
+    def __init__(self, min_echoes=3, max_echoes=30, rel_tolerance=0.05, abs_tolerance_ms=1.0,
+                 jitter_tolerance_ms=2.0, confidence=0.95, budget=None):
+        """
+        Decide per target when enough echoes have been sent
+
+        A target stops once the confidence interval of its mean RTT is within
+        max(abs_tolerance_ms, rel_tolerance x mean) and that of its jitter (mean
+        absolute difference of consecutive RTTs) within jitter_tolerance_ms. Noisy
+        targets keep going up to max_echoes. An optional global budget caps the echoes
+        of a whole sweep: every target is guaranteed min_echoes, and echoes beyond
+        that are only handed out while the budget has room.
+
+        :param min_echoes: Echoes every target gets before it may stop
+        :param max_echoes: Hard cap per target
+        :param rel_tolerance: Allowed CI half-width of the mean RTT, relative to the mean
+        :param abs_tolerance_ms: Allowed CI half-width of the mean RTT in ms (the larger tolerance wins)
+        :param jitter_tolerance_ms: Allowed CI half-width of the jitter in ms (None ignores jitter)
+        :param confidence: Confidence level of the intervals
+        :param budget: Total echoes per sweep (None for no limit)
+        """
+        if not 1 <= min_echoes <= max_echoes:
+            raise ValueError("Need 1 <= min_echoes <= max_echoes.")
+        self.min_echoes = min_echoes
+        self.max_echoes = max_echoes
+        self.rel_tolerance = rel_tolerance
+        self.abs_tolerance_ms = abs_tolerance_ms
+        self.jitter_tolerance_ms = jitter_tolerance_ms
+        self.confidence = confidence
+        self.budget = budget
+
+        self._lock = threading.Lock()
+        self.start_sweep(0)
+
+    def start_sweep(self, targets):
+        """Reset the budget and counters; reserves min_echoes for each of `targets`."""
+        with self._lock:
+            self.used = 0
+            self._reserved = self.min_echoes * targets
+            self.sessions = 0
+            self.stop_reasons = {}
+
+    def session(self, target):
+        with self._lock:
+            self.sessions += 1
+        return AdaptiveSession(self, target)
+
+    def _account(self, session, reason):
+        """
+        Count the echo a session just sent and grant (or refuse) its next one
+
+        Echoes within a target's minimum come out of its reservation; extra echoes
+        are charged when granted, so concurrent sessions can't overrun the budget.
+
+        :param reason: Why the session wants to stop, or None if it wants another echo
+        :return: True if the next echo is granted
+        """
+        with self._lock:
+            if session.sent <= self.min_echoes:
+                # This echo was part of the target's guaranteed minimum
+                self.used += 1
+                self._reserved = max(0, self._reserved - 1)
+            session._extra_granted = False
+            if reason is None:
+                if session.sent < self.min_echoes:
+                    return True
+                # Extra echoes must leave room for every target's outstanding minimum
+                if self.budget is None or self.used + self._reserved < self.budget:
+                    self.used += 1
+                    session._extra_granted = True
+                    return True
+                reason = 'budget'
+            self._end(session, reason)
+            return False
+
+    def _release(self, session):
+        with self._lock:
+            if session._extra_granted:
+                # Granted but never sent
+                self.used -= 1
+                session._extra_granted = False
+            self._end(session, 'ended')
+
+    def _end(self, session, reason):
+        if session.sent < self.min_echoes:
+            # Give back the part of the minimum this target won't use
+            self._reserved = max(0, self._reserved - (self.min_echoes - session.sent))
+        self.stop_reasons[reason] = self.stop_reasons.get(reason, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "targets": self.sessions,
+                "echoes": self.used,
+                "budget": self.budget,
+                "avg_echoes_per_target": self.used / self.sessions if self.sessions else 0.0,
+                "stop_reasons": dict(self.stop_reasons),
+            }
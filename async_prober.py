@@ -0,0 +1,278 @@
+import asyncio
+import os
+import socket
+import struct
+import time
+
+import instrumentation
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+def icmp_checksum(data):
+    """Standard internet checksum over an ICMP packet."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident, seq, payload=b''):
+    """Build an ICMP echo request packet (the kernel may rewrite the identifier)."""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident & 0xFFFF, seq & 0xFFFF)
+    checksum = icmp_checksum(header + payload)
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident & 0xFFFF, seq & 0xFFFF)
+    return header + payload
+
+
+def parse_echo_reply(packet):
+    """Return the sequence number of an ICMP echo reply, or None for anything else."""
+    # Some platforms hand datagram ICMP sockets the IP header too
+    if len(packet) >= 20 and packet[0] >> 4 == 4:
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, _, seq = struct.unpack("!BBHHH", packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return seq
+
+
+def icmp_available():
+    """Check whether this process may open an unprivileged ICMP datagram socket."""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except (OSError, AttributeError):
+        return False
+    sock.close()
+    return True
+
+
+class AsyncProber:
+    def __init__(self, max_in_flight=256, timeout_sec=2, interval_sec=0.0, method='auto', tcp_port=443,
+                 resolver=None, adaptive=None, pacer=None, instruments=None):
+        """
+        Probe many targets concurrently from a single asyncio event loop
+
+        :param max_in_flight: Maximum number of targets being probed at once; each holds a socket,
+                              so keep it well under the open-file limit (often 1024)
+        :param timeout_sec: Seconds to wait for each echo before counting it as lost
+        :param interval_sec: Pause between consecutive echoes to the same target
+        :param method: 'icmp', 'tcp' or 'auto' (ICMP when the OS allows it, TCP otherwise)
+        :param tcp_port: Port used for TCP-connect RTT measurements
+        :param resolver: Optional DNSCache; lookups then run in the default executor
+        :param adaptive: Optional adaptive.AdaptiveSampler; each target then gets up to its
+                         max_echoes echoes and stops once its statistics converge
+        :param pacer: Optional rate_limit.ProbePacer every echo waits on before it is sent
+        :param instruments: Instrumentation for leveled logging (default: the shared one)
+        """
+        self.max_in_flight = max_in_flight
+        self.timeout_sec = timeout_sec
+        self.interval_sec = interval_sec
+        self.tcp_port = tcp_port
+        self.resolver = resolver
+        self.adaptive = adaptive
+        self.pacer = pacer
+        self.instruments = instruments or instrumentation.shared
+        # {website: echoes sent} for targets of the last run that were probed but never answered
+        self.outages = {}
+        # Counters from the last run, as on ProbeScheduler: indices in dropped got None because
+        # a deadline cut them off, not because the probe failed
+        self.timed_out = 0
+        self.abandoned = 0
+        self.dropped = set()
+
+        if method == 'auto':
+            method = 'icmp' if icmp_available() else 'tcp'
+        if method not in ('icmp', 'tcp'):
+            raise ValueError(f"Unknown probe method '{method}'. Choose 'icmp', 'tcp' or 'auto'.")
+        self.method = method
+
+    async def resolve(self, website):
+        """Resolve a hostname to its first IPv4 address without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        if self.resolver is not None:
+            return await loop.run_in_executor(None, self.resolver.resolve, website)
+        try:
+            infos = await loop.getaddrinfo(website, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            return None
+        return infos[0][4][0] if infos else None
+
+    async def icmp_echo(self, ip_address, count, session=None, queue_delays=None):
+        """
+        Send count ICMP echoes over one datagram socket. Returns RTTs (ms) of the replies.
+
+        :param session: Optional AdaptiveSession told about every echo; stops the run early
+        :param queue_delays: Optional list that receives each echo's pacing delay in seconds
+        """
+        loop = asyncio.get_running_loop()
+        ping_times = []
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        sock.setblocking(False)
+        try:
+            sock.connect((ip_address, 0))
+            ident = os.getpid()
+            for seq in range(count):
+                if seq and self.interval_sec:
+                    await asyncio.sleep(self.interval_sec)
+                if self.pacer is not None:
+                    delay = await self.pacer.acquire_async(ip_address)
+                    if queue_delays is not None:
+                        queue_delays.append(delay)
+                sent_at = time.perf_counter()
+                await loop.sock_sendall(sock, build_echo_request(ident, seq, struct.pack("!d", sent_at)))
+                deadline = sent_at + self.timeout_sec
+                rtt = None
+                # Skip stray or late replies until ours turns up or the echo times out
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        packet = await asyncio.wait_for(loop.sock_recv(sock, 2048), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if parse_echo_reply(packet) == seq:
+                        rtt = (time.perf_counter() - sent_at) * 1000
+                        ping_times.append(rtt)
+                        break
+                if session is not None and not session.record(rtt):
+                    break
+        finally:
+            sock.close()
+        return ping_times
+
+    async def tcp_echo(self, ip_address, count, session=None, queue_delays=None):
+        """
+        Time count TCP handshakes. Returns RTTs (ms) of the attempts that got an answer.
+
+        :param session: Optional AdaptiveSession told about every attempt; stops the run early
+        :param queue_delays: Optional list that receives each attempt's pacing delay in seconds
+        """
+        ping_times = []
+        for attempt in range(count):
+            if attempt and self.interval_sec:
+                await asyncio.sleep(self.interval_sec)
+            if self.pacer is not None:
+                delay = await self.pacer.acquire_async(ip_address)
+                if queue_delays is not None:
+                    queue_delays.append(delay)
+            started = time.perf_counter()
+            rtt = writer = None
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip_address, self.tcp_port), self.timeout_sec)
+                rtt = (time.perf_counter() - started) * 1000
+            except ConnectionRefusedError:
+                # A RST still proves the host answered, and costs one round trip
+                rtt = (time.perf_counter() - started) * 1000
+            except (asyncio.TimeoutError, OSError):
+                pass
+            if writer is not None:
+                # Wait for the transport to go, or the loop warns about it when many targets share it
+                writer.close()
+                try:
+                    await asyncio.wait_for(writer.wait_closed(), self.timeout_sec)
+                except (asyncio.TimeoutError, OSError):
+                    pass
+            if rtt is not None:
+                ping_times.append(rtt)
+            if session is not None and not session.record(rtt):
+                break
+        return ping_times
+
+    async def probe(self, website, count=4):
+        """Probe one target. Returns a result dict like PingHeatmap.run_ping, or None."""
+        session = self.adaptive.session(website) if self.adaptive is not None else None
+        try:
+            ip_address = await self.resolve(website)
+            if ip_address is None:
+                self.instruments.warning(f"  Error: Could not resolve hostname {website}. Skipping.")
+                return None
+
+            if session is not None:
+                count = session.max_echoes
+            queue_delays = []
+            try:
+                if self.method == 'icmp':
+                    ping_times = await self.icmp_echo(ip_address, count, session, queue_delays)
+                else:
+                    ping_times = await self.tcp_echo(ip_address, count, session, queue_delays)
+            except OSError as e:
+                self.instruments.warning(f"  Error probing {website} ({ip_address}): {e}")
+                return None
+        finally:
+            if session is not None:
+                session.close()
+        sent = session.sent if session is not None else count
+
+        if not ping_times:
+            self.instruments.warning(f"  No replies from {website} ({ip_address}).")
+            self.outages[website] = sent
+            return None
+
+        return {
+            "website": website,
+            "ip_address": ip_address,
+            "avg_ping": sum(ping_times) / len(ping_times),
+            "ping_times": ping_times,
+            "packet_loss": (sent - len(ping_times)) / sent * 100,
+            "sent": sent,
+            "queue_delay_ms": sum(queue_delays) * 1000,
+            "method": self.method
+        }
+
+    async def probe_many(self, websites, count=4, target_deadline=None, sweep_deadline=None):
+        """
+        Probe every target concurrently. Results are returned in input order.
+
+        count may be a single echo count or a list giving one count per target.
+        A probe running longer than target_deadline seconds, and every probe not finished
+        sweep_deadline seconds after the start, is cancelled and gives None; their indices
+        are in self.dropped.
+        """
+        self.outages = {}
+        self.timed_out = self.abandoned = 0
+        self.dropped = set()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        counts = count if isinstance(count, (list, tuple)) else [count] * len(websites)
+
+        async def bounded(index, website, target_count):
+            async with semaphore:
+                if target_deadline is None:
+                    return await self.probe(website, target_count)
+                try:
+                    return await asyncio.wait_for(self.probe(website, target_count), target_deadline)
+                except asyncio.TimeoutError:
+                    self.instruments.warning(f"  Probe of {website} exceeded {target_deadline}s; result discarded.")
+                    self.timed_out += 1
+                    self.dropped.add(index)
+                    return None
+
+        tasks = [asyncio.ensure_future(bounded(i, website, c)) for i, (website, c) in enumerate(zip(websites, counts))]
+        if not tasks:
+            return []
+        _, pending = await asyncio.wait(tasks, timeout=sweep_deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        results = []
+        for index, task in enumerate(tasks):
+            if task.cancelled():
+                self.abandoned += 1
+                self.dropped.add(index)
+                results.append(None)
+            else:
+                results.append(task.result())
+        if self.abandoned:
+            self.instruments.warning(f"Sweep deadline of {sweep_deadline}s passed: "
+                                     f"{self.abandoned} probes abandoned.")
+        return results
+
+    def run(self, websites, count=4, target_deadline=None, sweep_deadline=None):
+        """Blocking wrapper around probe_many for callers without an event loop."""
+        return asyncio.run(self.probe_many(list(websites), count, target_deadline, sweep_deadline))
@@ -0,0 +1,168 @@
+import hashlib
+import os
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import numpy as np
+
+import instrumentation
+
+# Fixed figure layout shared by the cached background and every data layer, so the
+# two line up pixel for pixel. The colorbar gets its own reserved slot.
+MAP_RECT = [0.04, 0.06, 0.82, 0.86]
+COLORBAR_RECT = [0.88, 0.22, 0.015, 0.56]
+
+DEFAULT_FEATURES = ('land', 'ocean', 'coastline', 'borders', 'gridlines')
+
+# Rendered backgrounds keyed by BasemapCache.key(), shared by every cache instance. A
+# 300 dpi world map is ~35 MB even as RGB, so only the most recently used few are kept
+MEMORY_CACHE_ENTRIES = 4
+_memory_cache = OrderedDict()
+
+# matplotlib/cartopy modules, imported on first render (see load_plotting)
+_plotting = None
+
+
+def load_plotting(headless=False):
+    """
+    Import the plotting stack on first use
+
+    matplotlib and cartopy (with PROJ/GEOS) take seconds to import, so nothing
+    outside rendering imports them at module level.
+
+    :param headless: Select the non-interactive Agg backend before pyplot loads
+    :return: Namespace with matplotlib, plt, ccrs, cfeature, cartopy and LinearSegmentedColormap
+    """
+    global _plotting
+    if headless:
+        import matplotlib
+        if matplotlib.get_backend().lower() != 'agg':
+            matplotlib.use('Agg')
+    if _plotting is None:
+        import matplotlib
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import LinearSegmentedColormap
+        import cartopy
+        import cartopy.crs as ccrs
+        import cartopy.feature as cfeature
+        _plotting = SimpleNamespace(matplotlib=matplotlib, plt=plt, ccrs=ccrs, cfeature=cfeature,
+                                    cartopy=cartopy, LinearSegmentedColormap=LinearSegmentedColormap)
+    return _plotting
+
+
+class BasemapCache:
+    def __init__(self, projection='Miller', figsize=(16, 8), dpi=300, features=DEFAULT_FEATURES,
+                 cache_dir=os.path.join("~", ".cache", "ping_map", "basemaps")):
+        """
+        Render the map background once and reuse it for every data layer
+
+        :param projection: Name of a cartopy.crs projection class (e.g. 'Miller', 'Robinson')
+        :param figsize: Figure size in inches
+        :param dpi: Output resolution; the background is rasterized at this dpi
+        :param features: Background layers to draw, any of DEFAULT_FEATURES
+        :param cache_dir: Directory for on-disk copies (None keeps the cache in memory only)
+        """
+        self.projection = projection
+        self.figsize = tuple(figsize)
+        self.dpi = dpi
+        self.features = tuple(features)
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+
+        # Where the last background came from: 'memory', 'disk' or 'rendered'
+        self.last_source = None
+
+    def key(self):
+        """Cache key covering everything that changes the rendered pixels."""
+        mods = load_plotting()
+        parts = (self.projection, self.figsize, self.dpi, self.features, tuple(MAP_RECT),
+                 mods.matplotlib.__version__, mods.cartopy.__version__)
+        return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+    def _make_map_axes(self, fig):
+        ax = fig.add_axes(MAP_RECT, projection=getattr(load_plotting().ccrs, self.projection)())
+        ax.set_global()
+        return ax
+
+    def render(self):
+        """Rasterize the background layers to a uint8 RGB array, or RGBA if not opaque (no caching)."""
+        mods = load_plotting()
+        plt, cfeature = mods.plt, mods.cfeature
+        fig = plt.figure(figsize=self.figsize, dpi=self.dpi)
+        try:
+            ax = self._make_map_axes(fig)
+            if 'land' in self.features:
+                ax.add_feature(cfeature.LAND, facecolor='lightgray', zorder=0)
+            if 'ocean' in self.features:
+                ax.add_feature(cfeature.OCEAN, facecolor='lightblue', zorder=0)
+            if 'coastline' in self.features:
+                ax.add_feature(cfeature.COASTLINE, linewidth=0.5, zorder=1)
+            if 'borders' in self.features:
+                ax.add_feature(cfeature.BORDERS, linestyle=':', linewidth=0.5, zorder=1)
+            if 'gridlines' in self.features:
+                ax.gridlines(draw_labels=True, dms=True, x_inline=False, y_inline=False, zorder=2)
+            fig.canvas.draw()
+            rgba = np.asarray(fig.canvas.buffer_rgba())
+            # The figure background is opaque, so the alpha channel is a quarter of the bytes for nothing
+            return rgba[..., :3].copy() if (rgba[..., 3] == 255).all() else rgba.copy()
+        finally:
+            plt.close(fig)
+
+    def get(self):
+        """Return the background from memory, disk or a fresh render, in that order."""
+        key = self.key()
+        background = _memory_cache.get(key)
+        if background is not None:
+            _memory_cache.move_to_end(key)
+            self.last_source = 'memory'
+            return background
+
+        # Compressed: the flat land/ocean fills shrink a background to a few MB on disk
+        path = os.path.join(self.cache_dir, f"basemap-{key}.npz") if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with np.load(path) as archive:
+                    background = archive["background"]
+                self.last_source = 'disk'
+            except (OSError, ValueError, KeyError) as e:
+                instrumentation.shared.warning(f"Ignoring unreadable cached basemap {path}: {e}")
+
+        if background is None:
+            background = self.render()
+            self.last_source = 'rendered'
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Write then rename so a concurrent reader never sees half a file
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.savez_compressed(f, background=background)
+                os.replace(tmp_path, path)
+
+        _memory_cache[key] = background
+        while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+            _memory_cache.popitem(last=False)
+        return background
+
+    def new_figure(self):
+        """
+        Create a figure with the cached background composited underneath
+
+        :return: (figure, map axes with a transparent background, colorbar axes)
+        """
+        background = self.get()
+        # Screen dpi for show(); save() renders at self.dpi, where the background maps 1:1 to pixels
+        fig = load_plotting().plt.figure(figsize=self.figsize)
+        background_ax = fig.add_axes([0, 0, 1, 1], zorder=-1)
+        background_ax.imshow(background, aspect='auto', interpolation='none')
+        background_ax.set_axis_off()
+        ax = self._make_map_axes(fig)
+        ax.patch.set_visible(False)
+        cax = fig.add_axes(COLORBAR_RECT)
+        return fig, ax, cax
+
+    def save(self, fig, output_file):
+        """Save at the cache dpi so the background stays pixel-aligned with the data."""
+        fig.savefig(output_file, dpi=self.dpi)
+
+    @staticmethod
+    def clear_memory():
+        _memory_cache.clear()
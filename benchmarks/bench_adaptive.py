@@ -0,0 +1,166 @@
+"""
+Benchmark adaptive probe counts against a fixed echo count per target.
+
+The stub `ping` from fake_network.py is placed first on PATH. It answers every
+echo after sleeping for a random RTT: the last octet of the loopback target is the
+mean RTT in ms and the third octet its standard deviation, so targets range from stable
+to noisy without any network traffic. Each target is probed once with a fixed
+--count and once with an AdaptiveSampler (optionally under a global budget); the
+benchmark reports echoes spent, sweep time and how far each estimate of the mean
+RTT is from the true one.
+
+First it checks that lost echoes reach the sessions: with a lossy stub ping
+(fake_network.py, Linux format, which prints nothing for a lost echo) every
+session must count the echoes ping actually sent, and a target that never
+answers must stop with 'no_reply' instead of waiting for ping to give up. A reply
+arriving after its echo was reported lost must not be counted a second time.
+
+Usage: python benchmarks/bench_adaptive.py [--targets 40] [--count 20] [--budget 300]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from adaptive import AdaptiveSampler
+from fake_network import FakeNetwork, install_stub_ping
+from ping_stream import PingStream
+
+def probe(target, count, sampler):
+    """The run_ping loop: stream replies and stop when the adaptive session says so."""
+    session = sampler.session(target) if sampler is not None else None
+    stream = PingStream(target, count=session.max_echoes if session else count, deadline_sec=30,
+                        report_losses=session is not None)
+    try:
+        for rtt in stream:
+            if session is not None and not session.record(rtt):
+                break
+    finally:
+        if session is not None:
+            session.close()
+    return stream.ping_times
+
+
+def check_losses():
+    """Lossy stub ping: sessions must see every lost echo; silent targets stop on 'no_reply'."""
+    ok = True
+    with tempfile.TemporaryDirectory() as stub_dir:
+        saved = os.environ.get("PATH", "")
+        network = FakeNetwork(seed=3, loss=0.3, hang_rate=0.0)
+        install_stub_ping(stub_dir, network, "linux")
+        sampler = AdaptiveSampler(min_echoes=3, max_echoes=12, rel_tolerance=0.0, abs_tolerance_ms=0.0)
+        sampler.start_sweep(20)
+        for i in range(20):
+            target = f"10.0.0.{i + 1}"
+            session = sampler.session(target)
+            stream = PingStream(target, count=session.max_echoes, deadline_sec=10, report_losses=True)
+            for rtt in stream:
+                if not session.record(rtt):
+                    break
+            session.close()
+            expected_lost = network.echoes(target, session.max_echoes)[:session.sent].count(None)
+            seen_lost = session.sent - session.rtt.n
+            if session.sent != session.max_echoes or seen_lost != expected_lost:
+                print(f"  {target}: session counted {session.sent} echoes, {seen_lost} lost; "
+                      f"ping sent {session.max_echoes}, {expected_lost} lost")
+                ok = False
+        echoes = sampler.stats()["echoes"]
+        if echoes != 20 * 12:
+            print(f"  sampler charged {echoes} echoes for {20 * 12} sent")
+            ok = False
+
+        install_stub_ping(stub_dir, FakeNetwork(seed=3, hang_rate=1.0, hang_sec=30), "linux")
+        sampler = AdaptiveSampler(min_echoes=3, max_echoes=12)
+        session = sampler.session("10.0.1.1")
+        start = time.perf_counter()
+        for rtt in PingStream("10.0.1.1", count=session.max_echoes, timeout_sec=0.2, interval_sec=0.1,
+                              deadline_sec=30, report_losses=True):
+            if not session.record(rtt):
+                break
+        session.close()
+        elapsed = time.perf_counter() - start
+        if session.stop_reason != 'no_reply' or session.sent != 3 or elapsed > 5:
+            print(f"  silent target: stop reason {session.stop_reason} after {session.sent} echoes, {elapsed:.1f}s")
+            ok = False
+        os.environ["PATH"] = saved
+
+    # A reply that arrives after its echo was reported lost must not be counted again
+    sampler = AdaptiveSampler(min_echoes=3, max_echoes=12)
+    session = sampler.session("10.0.2.1")
+    stream = PingStream("10.0.2.1", count=session.max_echoes, system="Linux", report_losses=True)
+    for line in ("64 bytes from 10.0.2.1: icmp_seq=2 ttl=64 time=9.0 ms",
+                 "64 bytes from 10.0.2.1: icmp_seq=1 ttl=64 time=1500 ms"):
+        rtt, lost = stream._handle_line(line, 0.0)
+        for value in [None] * lost + ([rtt] if rtt is not None else []):
+            session.record(value)
+    session.close()
+    if session.sent != 2 or stream.ping_times != [9.0, 1500.0]:
+        print(f"  late reply: session counted {session.sent} echoes for 2 sent, ping_times {stream.ping_times}")
+        ok = False
+    print(f"lost echoes reach adaptive sessions: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def sweep(targets, count, sampler, workers):
+    if sampler is not None:
+        sampler.start_sweep(len(targets))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda target: probe(target, count, sampler), targets))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--targets", type=int, default=40)
+    parser.add_argument("--count", type=int, default=20, help="Fixed echo count to compare against")
+    parser.add_argument("--noisy-share", type=float, default=0.25, help="Fraction of noisy targets")
+    parser.add_argument("--budget", type=int, default=None, help="Global echo budget for the budgeted run")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    targets = []
+    for _ in range(args.targets):
+        mean = rng.randint(10, 120)
+        sd = rng.randint(15, 40) if rng.random() < args.noisy_share else rng.randint(0, 1)
+        targets.append(f"127.0.{sd}.{mean}")
+    true_means = [int(target.rsplit(".", 1)[1]) for target in targets]
+    budget = args.budget or args.targets * args.count // 2
+
+    ok = check_losses()
+
+    runs = [
+        (f"fixed {args.count}", None),
+        ("adaptive", AdaptiveSampler(min_echoes=3, max_echoes=30)),
+        (f"adaptive, budget {budget}", AdaptiveSampler(min_echoes=3, max_echoes=30, budget=budget)),
+    ]
+    with tempfile.TemporaryDirectory() as stub_dir:
+        install_stub_ping(stub_dir, FakeNetwork(distribution='address', loss=0.0, hang_rate=0.0, time_scale=1.0))
+        print(f"{args.targets} targets ({sum(t.split('.')[2] not in ('0', '1') for t in targets)} noisy), "
+              f"{args.workers} workers")
+        print(f"{'run':>22} {'echoes':>7} {'stable/noisy avg':>17} {'sweep':>7} {'mean abs err':>13}")
+        for name, sampler in runs:
+            elapsed, results = sweep(targets, args.count, sampler, args.workers)
+            echoes = sum(len(times) for times in results)
+            noisy = [t.split('.')[2] not in ('0', '1') for t in targets]
+            stable_avg = sum(len(r) for r, n in zip(results, noisy) if not n) / max(1, noisy.count(False))
+            noisy_avg = sum(len(r) for r, n in zip(results, noisy) if n) / max(1, noisy.count(True))
+            errors = [abs(sum(r) / len(r) - m) for r, m in zip(results, true_means) if r]
+            print(f"{name:>22} {echoes:>7} {stable_avg:>8.1f}/{noisy_avg:<8.1f} {elapsed:>6.2f}s "
+                  f"{sum(errors) / len(errors):>10.2f} ms")
+            if sampler is not None:
+                stats = sampler.stats()
+                print(f"{'':>22} sampler counted {stats['echoes']} echoes, stop reasons: {stats['stop_reasons']}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
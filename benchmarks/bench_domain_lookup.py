@@ -0,0 +1,87 @@
+"""
+Benchmark suffix-trie domain lookup against the old dict + string slicing lookup.
+
+Generates a domain,lat,lon mapping file of --domains entries spread over common
+TLDs and second-level country suffixes, loads it into a DomainSuffixTrie, then
+looks up --lookups hostnames (mostly subdomains of mapped domains, some unmapped)
+cold and again with the per-hostname memo warm.
+
+Usage: python benchmarks/bench_domain_lookup.py [--domains 300000] [--lookups 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain_trie import DomainSuffixTrie
+
+SUFFIXES = ["com", "org", "net", "io", "de", "fr", "ru", "co.uk", "com.au", "co.jp", "com.br", "com.ar", "co.za"]
+SUBDOMAINS = ["", "www.", "api.", "cdn.", "static.eu.", "a.b.c."]
+
+
+def legacy_lookup(mapping, website):
+    """The original get_website_location matching: full name, then a sliced base domain."""
+    parts = website.split('.')
+    if len(parts) >= 2:
+        base_domain = f"{parts[-2]}.{parts[-1]}"
+        if len(parts) >= 3 and len(parts[-2]) == 2 and len(parts[-1]) == 2:
+            base_domain = f"{parts[-3]}.{parts[-2]}.{parts[-1]}"
+    else:
+        base_domain = website
+    return mapping.get(website) or mapping.get(base_domain)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--domains", type=int, default=300_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    domains = [f"site{i}.{rng.choice(SUFFIXES)}" for i in range(args.domains)]
+    hostnames = [rng.choice(SUBDOMAINS) + rng.choice(domains) if rng.random() < 0.9
+                 else f"unmapped{i}.example" for i in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "domains.csv")
+        with open(path, "w") as f:
+            f.write("domain,lat,lon\n")
+            for domain in domains:
+                f.write(f"{domain},{rng.uniform(-60, 70):.4f},{rng.uniform(-180, 180):.4f}\n")
+
+        trie = DomainSuffixTrie()
+        start = time.perf_counter()
+        loaded = trie.load(path)
+        load_time = time.perf_counter() - start
+
+    mapping = {domain: [0.0, 0.0] for domain in domains}
+    start = time.perf_counter()
+    legacy_hits = sum(legacy_lookup(mapping, host) is not None for host in hostnames)
+    legacy_time = time.perf_counter() - start
+
+    trie.memo_entries = 0  # cold: every lookup walks the trie
+    start = time.perf_counter()
+    trie_hits = sum(trie.lookup(host)[1] is not None for host in hostnames)
+    cold_time = time.perf_counter() - start
+
+    trie.memo_entries = len(hostnames)
+    for host in hostnames:
+        trie.lookup(host)
+    start = time.perf_counter()
+    for host in hostnames:
+        trie.lookup(host)
+    warm_time = time.perf_counter() - start
+
+    print(f"loaded {loaded:,} domains in {load_time:.2f}s")
+    print(f"{'lookup':>14} {'hits':>9} {'time':>8} {'lookups/s':>12}")
+    for name, hits, seconds in (("legacy slicing", legacy_hits, legacy_time), ("trie (cold)", trie_hits, cold_time),
+                                ("trie (memo)", trie_hits, warm_time)):
+        print(f"{name:>14} {hits:>9,} {seconds:>7.3f}s {len(hostnames) / seconds:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark batch grid accumulation against the per-point add_ping_point_to_grid loop.
+
+The per-point loop is timed on a subset of the samples and extrapolated to the
+full sample count, since at resolution 3600 it would take far too long to run
+in full. Both paths are checked to produce the same grid on that subset.
+
+Usage: python benchmarks/bench_grid.py [--samples 1000000] [--loop-samples 20000]
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from IP_heatmap import PingHeatmap
+
+
+def make_samples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(-90, 90, n)
+    lons = rng.uniform(-180, 180, n)
+    pings = rng.gamma(2.0, 40.0, n)
+    return lats, lons, pings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--loop-samples", type=int, default=20_000)
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[90, 720, 3600])
+    args = parser.parse_args()
+
+    lats, lons, pings = make_samples(args.samples)
+    loop_n = min(args.loop_samples, args.samples)
+
+    print(f"{args.samples:,} samples, per-point loop timed on {loop_n:,} and extrapolated")
+    print(f"{'resolution':>10} {'loop (est)':>11} {'batch min':>10} {'mean':>8} {'median':>8} {'speedup':>8} {'match':>6}")
+
+    for resolution in args.resolutions:
+        with redirect_stdout(StringIO()):
+            heatmap = PingHeatmap(resolution=resolution)
+
+        start = time.perf_counter()
+        for lat, lon, ping in zip(lats[:loop_n], lons[:loop_n], pings[:loop_n]):
+            heatmap.add_ping_point_to_grid(lat, lon, ping)
+        loop_time = (time.perf_counter() - start) * args.samples / loop_n
+        loop_grid = heatmap.ping_grid.copy()
+
+        heatmap.ping_grid.fill(1000.0)
+        heatmap.add_ping_points_to_grid(lats[:loop_n], lons[:loop_n], pings[:loop_n])
+        match = np.array_equal(loop_grid, heatmap.ping_grid)
+
+        heatmap.ping_grid.fill(1000.0)
+        start = time.perf_counter()
+        heatmap.add_ping_points_to_grid(lats, lons, pings)
+        batch_time = time.perf_counter() - start
+
+        timings = {}
+        for reducer in ("mean", "median"):
+            start = time.perf_counter()
+            heatmap.aggregate_ping_points(lats, lons, pings, reducer=reducer)
+            timings[reducer] = time.perf_counter() - start
+
+        print(f"{resolution:>10} {loop_time:>10.2f}s {batch_time:>9.3f}s {timings['mean']:>7.3f}s "
+              f"{timings['median']:>7.3f}s {loop_time / batch_time:>7.0f}x {str(match):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark grid interpolation: all-samples broadcasting vs k-d tree vs FFT smoothing.
+
+Brute force (every sample weighs into every cell) and the tree-based idw/kernel
+methods are timed on evenly spaced rows of the grid, up to --max-cells cells, and
+extrapolated to the full grid. The FFT 'smooth' method always runs on the full grid.
+Tree idw with k = samples is also checked against brute force on a small grid.
+
+Usage: python benchmarks/bench_interpolation.py [--samples 100000] [--resolutions 90 720 3600]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interpolation import SphericalInterpolator, brute_force_grid, load_kdtree
+
+
+def make_samples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(-60, 75, n)
+    lons = rng.uniform(-180, 180, n)
+    pings = rng.gamma(2.0, 40.0, n)
+    return lats, lons, pings
+
+
+def timed_rows(evaluate, lat_grid, lon_grid, max_cells):
+    """Time evaluate on evenly spaced rows fitting in max_cells; return (seconds for full grid, estimated?)."""
+    rows = max(1, min(len(lat_grid), max_cells // len(lon_grid)))
+    # Spread the subset over all latitudes: polar rows are much slower to query than mid-latitudes
+    subset = lat_grid[np.linspace(0, len(lat_grid) - 1, rows).round().astype(int)]
+    start = time.perf_counter()
+    evaluate(subset, lon_grid)
+    elapsed = time.perf_counter() - start
+    return elapsed * len(lat_grid) / rows, rows < len(lat_grid)
+
+
+def check_exact(lats, lons, pings, n=500):
+    """Tree idw using every sample must reproduce the brute-force reference."""
+    lat_grid, lon_grid = np.linspace(-90, 90, 30), np.linspace(-180, 180, 60)
+    interpolator = SphericalInterpolator(lats[:n], lons[:n], pings[:n])
+    tree = interpolator.grid(lat_grid, lon_grid, method='idw', k=n)
+    brute = brute_force_grid(lats[:n], lons[:n], pings[:n], lat_grid, lon_grid)
+    return np.allclose(tree, brute, rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[90, 720, 3600])
+    parser.add_argument("--max-cells", type=int, default=2_000_000,
+                        help="Cells actually evaluated per method before extrapolating")
+    parser.add_argument("--k", type=int, default=8, help="Neighbours for tree idw")
+    parser.add_argument("--bandwidth", type=float, default=300.0, help="Kernel bandwidth in km")
+    args = parser.parse_args()
+
+    lats, lons, pings = make_samples(args.samples)
+    start = time.perf_counter()
+    interpolator = SphericalInterpolator(lats, lons, pings)
+    build_time = time.perf_counter() - start
+
+    print(f"{args.samples:,} samples, scipy k-d tree: {'yes' if load_kdtree() is not None else 'no (brute-force fallback)'}, "
+          f"build {build_time:.3f}s")
+    print(f"tree idw (k = samples) matches brute force: {check_exact(lats, lons, pings)}")
+    print("(est) = timed on a subset of rows and extrapolated")
+    print(f"{'resolution':>10} {'cells':>12} {'brute':>14} {'tree idw':>14} {'tree kernel':>14} {'fft smooth':>11}")
+
+    methods = {
+        'brute': lambda la, lo: brute_force_grid(lats, lons, pings, la, lo),
+        'idw': lambda la, lo: interpolator.grid(la, lo, method='idw', k=args.k),
+        'kernel': lambda la, lo: interpolator.grid(la, lo, method='kernel', bandwidth_km=args.bandwidth),
+    }
+    for resolution in args.resolutions:
+        # Same grid as PingHeatmap(resolution)
+        lat_grid = np.linspace(-90, 90, resolution)
+        lon_grid = np.linspace(-180, 180, resolution * 2)
+
+        cells = []
+        for name in ('brute', 'idw', 'kernel'):
+            # Brute force costs cells x samples; keep its evaluated work comparable
+            limit = args.max_cells if name != 'brute' else max(len(lon_grid), 20_000_000 // args.samples)
+            seconds, estimated = timed_rows(methods[name], lat_grid, lon_grid, limit)
+            cells.append(f"{seconds:.2f}s{' (est)' if estimated else ''}")
+
+        start = time.perf_counter()
+        interpolator.grid(lat_grid, lon_grid, method='smooth', bandwidth_km=args.bandwidth)
+        smooth_time = time.perf_counter() - start
+
+        print(f"{resolution:>10} {len(lat_grid) * len(lon_grid):>12,} {cells[0]:>14} {cells[1]:>14} "
+              f"{cells[2]:>14} {smooth_time:>10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
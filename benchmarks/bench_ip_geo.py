@@ -0,0 +1,95 @@
+"""
+Benchmark the offline IP-range geolocation index.
+
+Builds a synthetic index of --ranges non-overlapping IPv4 ranges, saves it,
+memory-maps it back and times batch lookups (uint32 arrays and dotted strings)
+and single-address lookups. Batch results are cross-checked against lookup(),
+and an empty index must answer every address with NaN / None.
+
+Usage: python benchmarks/bench_ip_geo.py [--ranges 3000000] [--lookups 5000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ip_geo import IPGeoIndex
+
+
+def make_index(n, seed=0):
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.choice(2 ** 32 - 256, n, replace=False)).astype(np.uint32)
+    next_start = np.append(starts[1:].astype(np.int64) - 1, 2 ** 32 - 1)
+    ends = np.minimum(starts + rng.integers(0, 4096, n), next_start).astype(np.uint32)
+    lats = rng.uniform(-60, 70, n).astype(np.float32)
+    lons = rng.uniform(-180, 180, n).astype(np.float32)
+    return IPGeoIndex(starts, ends, lats, lons)
+
+
+def check_empty_index():
+    empty = np.array([], dtype=np.uint32)
+    index = IPGeoIndex(empty, empty, np.array([], dtype=np.float32), np.array([], dtype=np.float32))
+    lats, lons = index.lookup_many(["8.8.8.8", "1.2.3.4"])
+    ok = np.isnan(lats).all() and np.isnan(lons).all() and len(lats) == 2 and index.lookup("8.8.8.8") is None
+    print(f"empty index answers NaN: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def to_dotted(ips):
+    return [f"{ip >> 24}.{(ip >> 16) & 255}.{(ip >> 8) & 255}.{ip & 255}" for ip in ips.tolist()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ranges", type=int, default=3_000_000)
+    parser.add_argument("--lookups", type=int, default=5_000_000)
+    parser.add_argument("--string-lookups", type=int, default=500_000)
+    parser.add_argument("--single-lookups", type=int, default=50_000)
+    args = parser.parse_args()
+    ok = check_empty_index()
+
+    rng = np.random.default_rng(1)
+    queries = rng.integers(0, 2 ** 32, args.lookups, dtype=np.uint64).astype(np.uint32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_index(args.ranges).save(tmp)
+        start = time.perf_counter()
+        index = IPGeoIndex.load(tmp)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lats, _ = index.lookup_many(queries)
+        batch_time = time.perf_counter() - start
+
+        strings = to_dotted(queries[:args.string_lookups])
+        start = time.perf_counter()
+        string_lats, _ = index.lookup_many(strings)
+        string_time = time.perf_counter() - start
+
+        singles = strings[:args.single_lookups]
+        start = time.perf_counter()
+        single = [index.lookup(ip) for ip in singles]
+        single_time = time.perf_counter() - start
+
+        match = all((loc is None and np.isnan(lat)) or (loc is not None and loc[0] == float(lat))
+                    for loc, lat in zip(single, string_lats))
+        del index  # release the memory maps before the directory is removed
+
+    print(f"{args.ranges:,} ranges, memory-mapped load in {load_time * 1000:.2f} ms, "
+          f"{np.isfinite(lats).mean():.1%} of random addresses covered")
+    print(f"{'lookup':>16} {'count':>11} {'time':>8} {'lookups/s':>12}")
+    for name, count, seconds in (("batch uint32", len(queries), batch_time),
+                                 ("batch strings", len(strings), string_time),
+                                 ("single lookup()", len(singles), single_time)):
+        print(f"{name:>16} {count:>11,} {seconds:>7.3f}s {count / seconds:>12,.0f}")
+    print(f"batch matches lookup(): {match}")
+    return 0 if ok and match else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark the multi-process, multi-vantage sweep orchestrator.
+
+The stub `ping` from fake_network.py is placed first on PATH; it prints one reply
+per echo with the RTT taken from the last octet of the loopback target, sleeping
+that long (so no network traffic is generated). The same target list is swept by:
+
+  * one process with a thread pool (the estimate_concurrent_users layout),
+  * a LocalVantage sharding chunks over --processes worker processes,
+  * two vantages in replicate mode, one local and one reached over the JSON-lines
+    protocol through a VantageServer on loopback.
+
+For these targets the stub is a /bin/sh script (a shell and one `sleep` per echo,
+a few ms of CPU), so the sweep rate is bound by the concurrency of each layout
+until the machine runs out of cores for spawning. On one CPU, 400 targets with
+--workers 4 take 5.6s in one process and 2.1s in four.
+
+Usage: python benchmarks/bench_orchestrator.py [--targets 2000] [--processes 4] [--workers 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_network import FakeNetwork, install_stub_ping
+from orchestrator import LocalVantage, RemoteVantage, SweepOrchestrator, VantageServer, probe_shard
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--targets", type=int, default=2000)
+    parser.add_argument("--count", type=int, default=2)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent pings per process")
+    args = parser.parse_args()
+
+    # Third octet 0: every echo takes exactly the last octet's RTT
+    targets = [f"127.{i // 40 % 250}.0.{5 + i % 40}" for i in range(args.targets)]
+
+    with tempfile.TemporaryDirectory() as stub_dir:
+        install_stub_ping(stub_dir, FakeNetwork(distribution='address', loss=0.0, hang_rate=0.0, time_scale=1.0))
+        print(f"{len(targets):,} targets x {args.count} echoes, {os.cpu_count()} CPU(s)")
+        print(f"{'layout':>36} {'sweep':>8} {'targets/s':>10} {'samples':>8}")
+
+        def report(name, elapsed, samples):
+            print(f"{name:>36} {elapsed:>7.2f}s {len(targets) / elapsed:>10.0f} {samples:>8}")
+
+        start = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            single = probe_shard(targets, args.count, 5, None, args.workers)
+        report(f"1 process x {args.workers} threads", time.perf_counter() - start, len(single))
+
+        local = LocalVantage("local", processes=args.processes, workers_per_process=args.workers, chunk_size=128)
+        orchestrator = SweepOrchestrator([local])
+        with redirect_stdout(StringIO()):
+            orchestrator.sweep(targets, count=args.count)
+        report(f"{args.processes} processes x {args.workers} threads", orchestrator.elapsed_sec,
+               len(orchestrator.samples_by_vantage["local"]))
+
+        server = VantageServer(LocalVantage("loopback", processes=args.processes,
+                                            workers_per_process=args.workers, chunk_size=128))
+        port = server.start()
+        orchestrator = SweepOrchestrator([local, RemoteVantage("loopback", "127.0.0.1", port)])
+        with redirect_stdout(StringIO()):
+            orchestrator.sweep(targets, count=args.count)
+        samples = sum(len(s) for s in orchestrator.samples_by_vantage.values())
+        report("local + loopback server (replicate)", orchestrator.elapsed_sec, samples)
+        server.shutdown()
+
+        merged = orchestrator.samples()
+        tags = {sample["vantage"] for sample in merged}
+        print(f"merged view: {len(merged):,} sites, best sample from vantages {sorted(tags)}")
+
+
+if __name__ == "__main__":
+    main()
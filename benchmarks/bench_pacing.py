@@ -0,0 +1,144 @@
+"""
+Benchmark the token-bucket probe pacer.
+
+--threads threads each send probes to random destinations in a few /24s as
+fast as the pacer lets them (no real packets; a "send" is a timestamp). The
+benchmark reports the achieved global rate, the burstiest 10 ms window, the
+highest per-destination and per-/24 rates seen in any one-second window, and the
+queueing delay the pacer reports (which the probing code keeps out of RTTs).
+With --echoes each send is a whole ping run: one acquire() for all its echoes,
+which then go out --interval apart as ping would send them. It also times
+reserve() itself, and checks that a send held back by its destination's bucket
+takes its global token when it goes out, not when it started waiting.
+
+Usage: python benchmarks/bench_pacing.py [--sends 3000] [--global-pps 1000] [--echoes 4 --interval 0.05]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import ProbePacer, subnet_key
+
+
+def fire(pacer, destinations, sends, threads, echoes=1, interval=0.0):
+    """Send `sends` probe runs from `threads` threads; returns (timestamp, destination) per packet."""
+    log = []
+    lock = threading.Lock()
+    per_thread = sends // threads
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            destination = rng.choice(destinations)
+            if pacer is not None:
+                pacer.acquire(destination, packets=echoes, interval_sec=interval)
+            start = time.monotonic()
+            with lock:
+                log.extend((start + k * interval, destination) for k in range(echoes))
+            # A worker's ping run lasts until its last echo has gone out
+            time.sleep((echoes - 1) * interval)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sorted(log)
+
+
+def check_send_time_tokens():
+    """Global 10 pps with a burst of 1: no two sends closer than 0.1s, whichever bucket held them."""
+    pacer = ProbePacer(global_pps=10, burst=1, per_destination_pps=1)
+    sends = []
+
+    def held_back():
+        # The second send to one destination waits ~1s for its own bucket
+        for _ in range(2):
+            pacer.acquire("10.9.0.1")
+            sends.append(time.monotonic())
+
+    def others():
+        time.sleep(0.5)
+        for host in range(2, 10):
+            pacer.acquire(f"10.9.1.{host}")
+            sends.append(time.monotonic())
+
+    threads = [threading.Thread(target=held_back), threading.Thread(target=others)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sends.sort()
+    closest = min(b - a for a, b in zip(sends, sends[1:]))
+    ok = closest >= 0.09
+    print(f"tokens taken at send time: closest sends {closest * 1000:.0f} ms apart (limit 100 ms): "
+          f"{'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def peak_rate(times, window):
+    """Largest number of events in any `window`-second span, as events per second."""
+    peak, first = 0, 0
+    for last, t in enumerate(times):
+        while t - times[first] > window:
+            first += 1
+        peak = max(peak, last - first + 1)
+    return peak / window
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sends", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--global-pps", type=float, default=1000)
+    parser.add_argument("--destination-pps", type=float, default=20)
+    parser.add_argument("--subnet-pps", type=float, default=200)
+    parser.add_argument("--echoes", type=int, default=1, help="Packets per send (a ping run's -c)")
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between a run's packets (-i)")
+    args = parser.parse_args()
+    ok = check_send_time_tokens()
+
+    destinations = [f"10.0.{net}.{host}" for net in range(8) for host in range(1, 101)]
+    runs = [("unpaced", None),
+            ("paced", ProbePacer(global_pps=args.global_pps, per_destination_pps=args.destination_pps,
+                                 per_subnet_pps=args.subnet_pps))]
+    print(f"{args.sends:,} sends of {args.echoes} packet(s) from {args.threads} threads to "
+          f"{len(destinations)} destinations in 8 /24s")
+    print(f"limits: {args.global_pps:.0f} pps global, {args.destination_pps:.0f} pps per destination, "
+          f"{args.subnet_pps:.0f} pps per /24")
+    print(f"{'run':>8} {'elapsed':>8} {'avg pps':>8} {'peak 10ms':>10} {'peak dest/s':>12} {'peak /24/s':>11}")
+    for name, pacer in runs:
+        start = time.monotonic()
+        log = fire(pacer, destinations, args.sends, args.threads, args.echoes, args.interval)
+        elapsed = time.monotonic() - start
+        by_destination = defaultdict(list)
+        by_subnet = defaultdict(list)
+        for t, destination in log:
+            by_destination[destination].append(t)
+            by_subnet[subnet_key(destination)].append(t)
+        times = [t for t, _ in log]
+        print(f"{name:>8} {elapsed:>7.2f}s {len(log) / elapsed:>8.0f} {peak_rate(times, 0.01):>10.0f} "
+              f"{max(peak_rate(t, 1.0) for t in by_destination.values()):>12.0f} "
+              f"{max(peak_rate(t, 1.0) for t in by_subnet.values()):>11.0f}")
+        if pacer is not None:
+            stats = pacer.stats()
+            print(f"{'':>8} queueing: {stats['delayed']} of {stats['acquired']} sends waited, "
+                  f"avg {stats['avg_queue_delay_ms']:.1f} ms, max {stats['max_queue_delay_ms']:.1f} ms")
+
+    pacer = ProbePacer(global_pps=1e9, per_destination_pps=1e9, per_subnet_pps=1e9)
+    calls = 100000
+    start = time.perf_counter()
+    for i in range(calls):
+        pacer.reserve(destinations[i % len(destinations)])
+    print(f"reserve() with three buckets: {(time.perf_counter() - start) / calls * 1e6:.2f} us per call")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
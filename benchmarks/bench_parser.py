@@ -0,0 +1,216 @@
+"""
+Check and benchmark the shared ping output parser.
+
+First parses every file in benchmarks/fixtures/ping (Linux iputils, BusyBox,
+macOS, English/German/French Windows, IPv6) and compares the result with
+expected.json, and checks that the substring fast paths in ping_parser give the
+same RTT, seq and TTL as its regular expressions alone. Then measures lines per
+second, one parser per ping run as PingStream uses it, for the previous
+split-based reply/summary functions and for ping_parser: over all fixtures,
+over the English-spelled ones only (the legacy code returns nothing for the
+localized replies, so that is the like-for-like comparison), and over those
+stretched to --echoes replies per run, as long as the estimator's runs. The
+timed rows take turns so machine noise hits them alike.
+
+The legacy code reads only each reply's RTT and the summary average, while
+ping_parser also reads seq and TTL from every reply, so it is the slower of
+the two; the ratios printed are what those extra fields cost.
+
+Usage: python benchmarks/bench_parser.py [--lines 200000] [--echoes 30] [--update-expected]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ping_parser import (REPLY_RE, SEQ_RE, SUB_MS_RTT, TTL_RE, PingOutputParser, parse_output, parse_reply,
+                         parse_reply_line)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ping")
+
+
+def legacy_parse_reply_line(line):
+    """The reply parser PingStream used before ping_parser (kept here for comparison)."""
+    if "time=" in line:
+        value = line.split("time=", 1)[1].split()[0]
+        try:
+            return float(value[:-2] if value.endswith("ms") else value)
+        except ValueError:
+            return None
+    if "time<" in line:
+        return 0.5
+    return None
+
+
+def legacy_parse_summary_line(line):
+    """The summary parser IP_heatmap used before ping_parser (kept here for comparison)."""
+    if 'rtt min/avg/max/mdev' in line or 'round-trip min/avg/max/stddev' in line:
+        parts = line.split('=')[1].strip().split('/')
+        if len(parts) >= 4:
+            try:
+                return float(parts[1])
+            except ValueError:
+                return None
+    elif 'Average =' in line:
+        try:
+            return float(line.split('Average =')[1].strip().split('ms')[0].strip())
+        except ValueError:
+            return None
+    return None
+
+
+def legacy_parse(lines):
+    """Replies on the way in, then a second walk over the leftovers for the summary."""
+    ping_times, other_lines = [], []
+    for line in lines:
+        rtt = legacy_parse_reply_line(line)
+        if rtt is None:
+            if line.strip():
+                other_lines.append(line.strip())
+        else:
+            ping_times.append(rtt)
+    avg = None
+    for line in other_lines:
+        avg = legacy_parse_summary_line(line)
+        if avg is not None:
+            break
+    return ping_times, avg
+
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            fixtures[os.path.basename(path)] = f.read()
+    return fixtures
+
+
+def check_fixtures(fixtures, update):
+    expected_path = os.path.join(FIXTURE_DIR, "expected.json")
+    results = {name: parse_output(text) for name, text in fixtures.items()}
+    if update:
+        with open(expected_path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {expected_path}")
+        return True
+    with open(expected_path) as f:
+        expected = json.load(f)
+    ok = True
+    print(f"{'fixture':<28} {'replies':>7} {'legacy':>7} {'loss %':>7} {'avg ms':>8}  match")
+    for name, result in results.items():
+        legacy_times, _ = legacy_parse(fixtures[name].splitlines())
+        match = expected.get(name) == json.loads(json.dumps(result))
+        ok = ok and match
+        loss = f"{result['loss_pct']:.1f}" if result['loss_pct'] is not None else "-"
+        avg = f"{result['avg_ms']:.2f}" if result['avg_ms'] is not None else "-"
+        print(f"{name:<28} {len(result['ping_times']):>7} {len(legacy_times):>7} {loss:>7} {avg:>8}  "
+              f"{'ok' if match else 'MISMATCH'}")
+    return ok
+
+
+def regex_reply(line):
+    """(rtt, seq, ttl) from the regular expressions alone, the reference for the fast paths."""
+    match = REPLY_RE.search(line)
+    if match is None:
+        return None
+    rtt = SUB_MS_RTT if match.group(1) == '<' else float(match.group(2).replace(',', '.'))
+    seq, ttl = SEQ_RE.search(line), TTL_RE.search(line)
+    return rtt, int(seq.group(1)) if seq else None, int(ttl.group(1)) if ttl else None
+
+
+def check_fast_paths(lines):
+    ok = True
+    for line in lines:
+        expected = regex_reply(line)
+        parser = PingOutputParser()
+        parser.feed(line.replace("(DUP!)", ""))
+        fed = (parser.ping_times[0], parser.seqs[0], parser.ttls[0]) if parser.ping_times else None
+        if parse_reply(line) != expected or fed != expected:
+            print(f"  fast path mismatch on {line.rstrip()!r}: {parse_reply(line)} / {fed} != {expected}")
+            ok = False
+    print(f"substring fast paths agree with the patterns on {len(lines)} lines: {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def stretch(text, echoes):
+    """The same run with its reply lines repeated to `echoes` replies (ping_count runs are longer)."""
+    lines = text.splitlines()
+    replies = [i for i, line in enumerate(lines) if parse_reply_line(line) is not None]
+    if not replies:
+        return text
+    body = [lines[replies[i % len(replies)]] for i in range(echoes)]
+    return "\n".join(lines[:replies[0]] + body + lines[replies[-1] + 1:])
+
+
+def throughput(rows, runs, repeat=7):
+    """Lines per second of each (label, fn(run)) row, best of `repeat` rounds that take turns."""
+    lines = sum(len(run) for run in runs)
+    best = {label: None for label, _ in rows}
+    for _ in range(repeat):
+        for label, fn in rows:
+            start = time.perf_counter()
+            for run in runs:
+                fn(run)
+            elapsed = time.perf_counter() - start
+            best[label] = elapsed if best[label] is None else min(best[label], elapsed)
+    rates = {label: lines / elapsed for label, elapsed in best.items()}
+    for label, rate in rates.items():
+        print(f"{label:<48} {rate / 1e6:>6.2f} M lines/s")
+    return rates
+
+
+def compare(title, fixtures, line_count):
+    runs = [[line + "\n" for line in text.splitlines()] for text in fixtures.values()]
+    per_pass = sum(len(run) for run in runs)
+    runs = runs * max(1, line_count // per_pass)
+    print(f"\n{title}: {sum(len(run) for run in runs):,} lines in {len(runs):,} runs (best of 7)")
+    rates = throughput([
+        ("legacy reply line only", lambda run: [legacy_parse_reply_line(line) for line in run]),
+        ("ping_parser.parse_reply (rtt, seq, ttl)", lambda run: [parse_reply(line) for line in run]),
+        ("legacy split-based reply + summary walk", legacy_parse),
+        ("PingOutputParser.feed (as PingStream uses it)", lambda run: PingOutputParser().feed_all(run)),
+        ("PingOutputParser.result (all fields)", lambda run: PingOutputParser().feed_all(run).result()),
+    ], runs)
+    replies = [[line for run in runs for line in run if legacy_parse_reply_line(line) is not None]]
+    reply_rates = throughput([
+        ("reply lines only: legacy (rtt)", lambda run: [legacy_parse_reply_line(line) for line in run]),
+        ("reply lines only: parse_reply (rtt, seq, ttl)", lambda run: [parse_reply(line) for line in run]),
+    ], replies)
+    legacy = rates["legacy split-based reply + summary walk"]
+    print(f"  ping_parser / legacy: reply lines "
+          f"{reply_rates['reply lines only: parse_reply (rtt, seq, ttl)'] / reply_rates['reply lines only: legacy (rtt)']:.2f}x, "
+          f"feed {rates['PingOutputParser.feed (as PingStream uses it)'] / legacy:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--echoes", type=int, default=30,
+                        help="Replies per run for the stretched runs (the estimator's ping_count)")
+    parser.add_argument("--update-expected", action="store_true",
+                        help="Rewrite expected.json from the current parser after adding fixtures")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    ok = check_fixtures(fixtures, args.update_expected)
+
+    corpus = [line + "\n" for text in fixtures.values() for line in text.splitlines()]
+    variants = [line.replace("time=", "time=1,") for line in corpus] + [line.replace(" ttl=", " TTL=") for line in corpus]
+    ok = check_fast_paths(corpus + variants) and ok
+
+    compare(f"All {len(fixtures)} fixtures", fixtures, args.lines)
+    english = {name: text for name, text in fixtures.items() if not name.endswith(("_de.txt", "_fr.txt"))}
+    compare(f"{len(english)} English-spelled fixtures", english, args.lines)
+    stretched = {name: stretch(text, args.echoes) for name, text in english.items()}
+    compare(f"English-spelled fixtures stretched to {args.echoes} replies", stretched, args.lines)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
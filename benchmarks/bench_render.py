@@ -0,0 +1,74 @@
+"""
+Benchmark generate_visualization with a cold vs warm basemap cache.
+
+cold:        nothing cached; the background is rasterized from cartopy features
+warm (disk): in-memory cache cleared, background loaded from the on-disk copy
+warm (mem):  background reused from the in-process cache
+
+Usage: python benchmarks/bench_render.py [--dpi 300] [--points 100] [--features land ocean ...]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from basemap_cache import BasemapCache, DEFAULT_FEATURES
+from IP_heatmap import PingHeatmap
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--points", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--plot-type", choices=["scatter", "pcolormesh"], default="scatter")
+    parser.add_argument("--features", nargs="+", default=list(DEFAULT_FEATURES))
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="basemap-bench-")
+    out_dir = tempfile.mkdtemp(prefix="render-bench-")
+    try:
+        cache = BasemapCache(dpi=args.dpi, features=args.features, cache_dir=cache_dir)
+        with redirect_stdout(StringIO()):
+            heatmap = PingHeatmap(resolution=90, basemap_cache=cache, headless=True)
+        rng = np.random.default_rng(0)
+        for i in range(args.points):
+            lat, lon, ping = rng.uniform(-60, 70), rng.uniform(-180, 180), rng.gamma(2.0, 40.0)
+            heatmap.ping_results_list.append([lat, lon, ping, f"site{i}"])
+        heatmap.rebuild_grid_from_results()
+
+        def render(label):
+            start = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                heatmap.generate_visualization(output_file=os.path.join(out_dir, f"{label}.png"),
+                                               plot_type=args.plot_type)
+            return time.perf_counter() - start, cache.last_source
+
+        print(f"{args.points} points, dpi {args.dpi}, features {', '.join(args.features)}")
+        BasemapCache.clear_memory()
+        cold, source = render("cold")
+        print(f"{'cold':>12}: {cold:7.3f}s  (background {source})")
+
+        disk = []
+        for i in range(args.repeats):
+            BasemapCache.clear_memory()
+            disk.append(render(f"disk{i}")[0])
+        print(f"{'warm (disk)':>12}: {min(disk):7.3f}s  ({cold / min(disk):.1f}x faster)")
+
+        memory = [render(f"mem{i}")[0] for i in range(args.repeats)]
+        print(f"{'warm (mem)':>12}: {min(memory):7.3f}s  ({cold / min(memory):.1f}x faster)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark the persistent result cache with overlapping sweeps.
+
+Simulates several dashboards that trigger PingHeatmap sweeps one after
+another over overlapping target lists (the fake backend from fake_backend.py,
+with probes that take real time). Each dashboard is its own
+PingHeatmap sharing one SQLite cache file, as separate processes would. Reports
+probes sent and wall time with and without the cache, then the per-lookup cost
+of ResultCache.get().
+
+Usage: python benchmarks/bench_result_cache.py [--targets 2000] [--dashboards 4] [--overlap 0.8]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_backend import FakeNetwork, FakePingHeatmap, FakeResolver
+from instrumentation import Instrumentation
+from result_cache import ResultCache, params_key
+
+
+def dashboard_targets(universe, n, overlap, seed):
+    """n targets: `overlap` of them from a shared core, the rest specific to this dashboard."""
+    rng = random.Random(seed)
+    core = universe[:n]
+    shared = rng.sample(core, int(n * overlap))
+    own = [f"own{seed}-{i}.example" for i in range(n - len(shared))]
+    return shared + own
+
+
+def run(target_lists, network, cache_path, workers):
+    probes = 0
+    start = time.perf_counter()
+    for targets in target_lists:
+        instruments = Instrumentation(level="error")
+        cache = ResultCache(cache_path, max_age_sec=300) if cache_path else None
+        heatmap = FakePingHeatmap(network, resolution=45, resolver=FakeResolver(), headless=True,
+                                  instruments=instruments, result_cache=cache)
+        for website, result in heatmap.probe_websites(targets, [4] * len(targets), workers=workers):
+            heatmap.record_ping_result(website, result)
+        # Every probed target went through the fake ping once
+        probes += instruments.snapshot()["stages"].get("wait", {}).get("count", 0)
+        if cache is not None:
+            cache.close()
+    return probes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--targets", type=int, default=2000, help="Targets per dashboard sweep")
+    parser.add_argument("--dashboards", type=int, default=4)
+    parser.add_argument("--overlap", type=float, default=0.8, help="Share of each sweep common to all dashboards")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--time-scale", type=float, default=0.1,
+                        help="Real seconds per simulated second of RTT (each probe sleeps for its echoes)")
+    args = parser.parse_args()
+
+    network = FakeNetwork(seed=1, hang_rate=0.0, time_scale=args.time_scale)
+    universe = [f"site{i}.example" for i in range(args.targets)]
+    target_lists = [dashboard_targets(universe, args.targets, args.overlap, seed) for seed in range(args.dashboards)]
+    total = sum(len(t) for t in target_lists)
+    print(f"{args.dashboards} dashboards x {args.targets} targets, {args.overlap:.0%} overlap ({total} lookups)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "results.sqlite")
+        for label, path in (("no cache", None), ("cache", cache_path)):
+            probes, elapsed = run(target_lists, network, path, args.workers)
+            print(f"{label:>9}: {probes:>6} probes ({probes / total:.0%} of lookups), {elapsed:.2f}s")
+
+        cache = ResultCache(cache_path)
+        key = params_key(tool="heatmap", count=4, timeout_sec=5, adaptive=False)
+        resolver = FakeResolver()
+        lookups = [(site, resolver.resolve(site)) for site in universe]
+        start = time.perf_counter()
+        hits = sum(cache.get(site, ip, key) is not None for site, ip in lookups)
+        elapsed = time.perf_counter() - start
+        print(f"get(): {elapsed / len(lookups) * 1e6:.1f} us per lookup ({hits} of {len(lookups)} fresh)")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark the per-site ring buffers behind the estimator's rolling history.
+
+Part 1 checks RingBuffer's rolling mean/variance/jitter against plain Python on
+the same values, then times appending echoes one at a time and a probe session
+at a time, against a list and a bounded deque.
+
+Part 2 simulates a resident collector: many runs over many sites, recording
+each run's echoes. Keeping raw ping_times lists grows without bound; SiteHistory
+stays at sites x capacity x 4 bytes. Then times window_metrics() for every site.
+
+Usage: python benchmarks/bench_ring_buffer.py [--sites 1000] [--runs 200] [--capacity 1024] [--window 256]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ring_buffer import RingBuffer, SiteHistory
+
+
+def check_rolling_stats():
+    rng = random.Random(0)
+    buffer = RingBuffer(100)
+    values = [rng.uniform(5, 300) for _ in range(250)]
+    for start in range(0, len(values), 7):
+        buffer.extend(values[start:start + 7])
+    window = [float(np.float32(v)) for v in values[-40:]]
+    expected = (statistics.mean(window), statistics.variance(window),
+                statistics.mean(abs(b - a) for a, b in zip(window, window[1:])))
+    actual = (buffer.mean(40), buffer.variance(40), buffer.jitter(40))
+    assert len(buffer) == 100 and np.allclose(actual, expected, rtol=1e-9), (actual, expected)
+    print(f"rolling mean/variance/jitter over 40 of 250 values: match ({actual[0]:.2f} / {actual[1]:.1f} / "
+          f"{actual[2]:.2f})")
+
+
+def time_appends(n, capacity, session=4):
+    values = np.random.default_rng(0).uniform(5, 300, n).astype(np.float32)
+    as_list = values.tolist()
+    cases = {}
+
+    buffer = RingBuffer(capacity)
+    start = time.perf_counter()
+    for value in as_list:
+        buffer.append(value)
+    cases["RingBuffer.append"] = time.perf_counter() - start
+
+    buffer = RingBuffer(capacity)
+    start = time.perf_counter()
+    for i in range(0, n, session):
+        buffer.extend(values[i:i + session])
+    cases[f"RingBuffer.extend ({session} echoes)"] = time.perf_counter() - start
+
+    kept = deque(maxlen=capacity)
+    start = time.perf_counter()
+    for value in as_list:
+        kept.append(value)
+    cases["deque(maxlen).append"] = time.perf_counter() - start
+
+    grown = []
+    start = time.perf_counter()
+    for value in as_list:
+        grown.append(value)
+    cases["list.append (unbounded)"] = time.perf_counter() - start
+
+    for label, elapsed in cases.items():
+        print(f"{label:<30} {n / elapsed / 1e6:>6.2f} M echoes/s")
+
+
+def simulate_collector(args):
+    rng = np.random.default_rng(1)
+    sites = [f"site{i}.example" for i in range(args.sites)]
+    base = rng.lognormal(4, 0.6, args.sites)
+
+    history = SiteHistory(capacity=args.capacity)
+    raw = {site: [] for site in sites}
+    checkpoints = {}
+    start = time.perf_counter()
+    record_sec = 0.0
+    for run in range(args.runs):
+        rtts = base[:, None] * rng.uniform(0.8, 1.5, (args.sites, args.count))
+        lost = rng.random((args.sites, args.count)) < 0.02
+        for i, site in enumerate(sites):
+            ping_times = rtts[i][~lost[i]].tolist()
+            raw[site].extend(ping_times)
+            t0 = time.perf_counter()
+            history.record(site, ping_times, args.count)
+            record_sec += time.perf_counter() - t0
+        if run + 1 in (args.runs // 4, args.runs // 2, args.runs):
+            checkpoints[run + 1] = sum(len(times) for times in raw.values())
+    elapsed = time.perf_counter() - start
+
+    ring_bytes = sum(buffer.data.nbytes for buffer in history.buffers.values())
+    print(f"\n{args.sites} sites x {args.runs} runs x {args.count} echoes ({elapsed:.1f}s simulated, "
+          f"{record_sec:.2f}s in SiteHistory.record, "
+          f"{args.sites * args.runs / record_sec / 1e3:.0f}k sessions/s)")
+    for runs, echoes in checkpoints.items():
+        # A Python float in a list costs an 8-byte pointer plus a 24-byte object
+        print(f"  after {runs:>4} runs: raw ping_times lists ~{echoes * 32 / 2 ** 20:>7.1f} MiB, "
+              f"ring buffers {ring_bytes / 2 ** 20:.1f} MiB (fixed)")
+
+    start = time.perf_counter()
+    metrics = history.window_metrics(sites, args.window)
+    window_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    for site in sites[:100]:
+        statistics.mean(raw[site][-args.window:])
+    per_site_sec = (time.perf_counter() - start) / 100 * args.sites
+    print(f"window_metrics() over the last {args.window} echoes of {args.sites} sites: {window_sec * 1000:.0f} ms "
+          f"(all statistics); statistics.mean alone on raw lists: ~{per_site_sec * 1000:.0f} ms")
+    print(f"  mean loss {np.mean(metrics['packet_loss']):.1f}%, mean jitter {np.mean(metrics['jitter']):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--count", type=int, default=4, help="Echoes per site per run")
+    parser.add_argument("--capacity", type=int, default=1024, help="Echoes kept per site")
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--appends", type=int, default=1000000)
+    args = parser.parse_args()
+
+    check_rolling_stats()
+    time_appends(args.appends, args.capacity)
+    simulate_collector(args)
+
+
+if __name__ == "__main__":
+    main()
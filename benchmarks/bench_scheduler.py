@@ -0,0 +1,73 @@
+"""
+Benchmark the concurrent probe scheduler against a stubbed ping binary.
+
+The stub `ping` from fake_network.py is placed first on PATH. Each echo sleeps
+for a per-target latency (encoded in the last octet of the loopback address it is
+asked to ping) and prints a Linux-style reply, so no network traffic is generated.
+
+Usage: python benchmarks/bench_scheduler.py [--targets 40] [--workers 1 4 8 16]
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_network import FakeNetwork, install_stub_ping
+
+ECHOES = 4
+
+def make_targets(n, min_ms=50, max_ms=250):
+    """Loopback addresses whose last octet is the simulated latency in ms."""
+    span = max_ms - min_ms
+    return [f"127.0.0.{min_ms + (i * 37) % (span + 1)}" for i in range(n)]
+
+
+def sweep(heatmap, targets, workers):
+    """Run one quiet sweep and return (elapsed seconds, results snapshot)."""
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        heatmap.generate_visualization = lambda **kwargs: None
+        heatmap.run_analysis(targets, ping_count=ECHOES, timeout_sec=5, workers=workers)
+    elapsed = time.perf_counter() - start
+    return elapsed, ([list(r) for r in heatmap.ping_results_list], heatmap.ping_grid.copy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--targets", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    from IP_heatmap import PingHeatmap
+
+    with tempfile.TemporaryDirectory() as stub_dir:
+        install_stub_ping(stub_dir, FakeNetwork(distribution='address', loss=0.0, hang_rate=0.0, time_scale=1.0))
+        targets = make_targets(args.targets)
+        latencies = [int(t.rsplit('.', 1)[1]) / 1000.0 for t in targets]
+
+        with redirect_stdout(StringIO()):
+            heatmap = PingHeatmap(resolution=90)
+
+        print(f"{len(targets)} targets x {ECHOES} echoes, sum of latencies {sum(latencies) * ECHOES:.2f}s, "
+              f"max latency {max(latencies):.3f}s per echo")
+        print(f"{'workers':>8} {'elapsed':>9} {'bound':>9} {'identical':>10}")
+
+        baseline = None
+        for workers in args.workers:
+            elapsed, snapshot = sweep(heatmap, targets, workers)
+            if baseline is None:
+                baseline = snapshot
+            identical = snapshot[0] == baseline[0] and (snapshot[1] == baseline[1]).all()
+            bound = max(latencies) * ECHOES * math.ceil(len(targets) / workers)
+            print(f"{workers:>8} {elapsed:>8.2f}s {bound:>8.2f}s {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
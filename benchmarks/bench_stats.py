@@ -0,0 +1,96 @@
+"""
+Benchmark the vectorized metrics engine against per-site statistics-module metrics.
+
+Generates --sites sites with up to --ping-count RTTs each (random losses), then
+times the old per-site build_metrics (statistics.mean/median/variance plus a
+list-comprehension jitter) against ping_stats.metrics_by_site, and the
+population estimate on top of both. Shared fields are checked for agreement,
+and a batch where no site replied must give NaN statistics and 100% loss.
+
+Usage: python benchmarks/bench_stats.py [--sites 5000] [--ping-count 30]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ping_stats
+from locale_quantifier import ConcurrentUserPopulationEstimator
+
+
+def legacy_metrics(website, ping_times, count):
+    """The per-site metrics as build_metrics computed them before ping_stats."""
+    diffs = [abs(ping_times[i] - ping_times[i - 1]) for i in range(1, len(ping_times))]
+    return {
+        "website": website,
+        "avg_ping": statistics.mean(ping_times),
+        "median_ping": statistics.median(ping_times),
+        "min_ping": min(ping_times),
+        "max_ping": max(ping_times),
+        "ping_times": ping_times,
+        "jitter": statistics.mean(diffs) if diffs else 0,
+        "packet_loss": (count - len(ping_times)) / count * 100,
+        "ping_variance": statistics.variance(ping_times) if len(ping_times) > 1 else 0
+    }
+
+
+def check_empty_batch():
+    """A batch with no replies at all (zero sample columns) yields NaN stats, not IndexError."""
+    metrics = ping_stats.compute_metrics(ping_stats.pad_samples([[], []]), 4)
+    assert metrics["received"].tolist() == [0, 0], metrics["received"]
+    for name in ("avg_ping", "median_ping", "min_ping", "max_ping", "p95_ping", "p99_ping"):
+        assert np.isnan(metrics[name]).all(), (name, metrics[name])
+    assert metrics["packet_loss"].tolist() == [100.0, 100.0], metrics["packet_loss"]
+    assert ping_stats.metrics_by_site(["a"], [[]], [4]) == {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sites", type=int, default=5000)
+    parser.add_argument("--ping-count", type=int, default=30)
+    args = parser.parse_args()
+    check_empty_batch()
+
+    rng = random.Random(0)
+    websites = [f"site{i}.example" for i in range(args.sites)]
+    samples = [[rng.gammavariate(2.0, 40.0) for _ in range(args.ping_count - rng.randint(0, 3))]
+               for _ in websites]
+
+    start = time.perf_counter()
+    legacy = {w: legacy_metrics(w, times, args.ping_count) for w, times in zip(websites, samples)}
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = ping_stats.metrics_by_site(websites, samples, args.ping_count)
+    vector_time = time.perf_counter() - start
+
+    fields = ("avg_ping", "median_ping", "min_ping", "max_ping", "jitter", "packet_loss", "ping_variance")
+    worst = max(abs(legacy[w][f] - vectorized[w][f]) / max(1.0, abs(legacy[w][f])) for w in websites for f in fields)
+
+    with tempfile.TemporaryDirectory() as tmp, redirect_stdout(StringIO()):
+        estimator = ConcurrentUserPopulationEstimator(output_dir=tmp)
+    start = time.perf_counter()
+    estimate = estimator.calculate_user_population(vectorized)
+    population_time = time.perf_counter() - start
+
+    print(f"{args.sites:,} sites x {args.ping_count} pings")
+    print(f"{'step':>24} {'time':>9}")
+    print(f"{'legacy build_metrics':>24} {legacy_time:>8.3f}s")
+    print(f"{'ping_stats (all sites)':>24} {vector_time:>8.3f}s  ({legacy_time / vector_time:.0f}x, "
+          f"also p50/p95/p99 and RFC 3550 jitter)")
+    print(f"{'calculate_user_population':>24} {population_time:>8.3f}s")
+    print(f"largest relative difference on shared fields: {worst:.1e}")
+    print(f"total estimated concurrent users: {estimate['total_estimated_concurrent_users']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark streaming per-echo ping reading against waiting on communicate().
+
+The stub `ping` from fake_network.py is placed first on PATH. It prints one
+Linux-style reply line per echo, spaced by the per-target latency encoded in the last octet
+of the loopback address (so no network traffic is generated). For each target
+the benchmark measures time to the first sample, and how many samples survive a
+deadline shorter than the full run, for both readers.
+
+Usage: python benchmarks/bench_stream.py [--count 10] [--deadline 1.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_network import FakeNetwork, install_stub_ping
+from ping_parser import parse_reply_line
+from ping_stream import PingStream, build_ping_command
+
+def communicate_reader(target, count, deadline):
+    """The old approach: wait for ping to exit, parse everything, lose it all on timeout."""
+    start = time.perf_counter()
+    process = subprocess.Popen(build_ping_command(target, count), stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        output, _ = process.communicate(timeout=deadline)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        return time.perf_counter() - start, None, 0
+    samples = [rtt for rtt in map(parse_reply_line, output.splitlines()) if rtt is not None]
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed if samples else None, len(samples)
+
+
+def stream_reader(target, count, deadline):
+    stream = PingStream(target, count=count, deadline_sec=deadline).run()
+    return stream.elapsed_sec, stream.first_sample_sec, len(stream.ping_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--deadline", type=float, default=1.0,
+                        help="Deadline in seconds (shorter than count x RTT for the slow targets)")
+    parser.add_argument("--latencies", type=int, nargs="+", default=[20, 80, 150, 250])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as stub_dir:
+        install_stub_ping(stub_dir, FakeNetwork(distribution='address', loss=0.0, hang_rate=0.0, time_scale=1.0))
+        print(f"{args.count} echoes per target, deadline {args.deadline:.1f}s")
+        print(f"{'rtt':>5} {'reader':>12} {'elapsed':>8} {'first sample':>13} {'samples kept':>13}")
+        for ms in args.latencies:
+            target = f"127.0.0.{ms}"
+            for name, reader in (("communicate", communicate_reader), ("stream", stream_reader)):
+                elapsed, first, kept = reader(target, args.count, args.deadline)
+                first_text = f"{first:.3f}s" if first is not None else "none"
+                print(f"{ms:>3}ms {name:>12} {elapsed:>7.3f}s {first_text:>13} {kept:>6}/{args.count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Reproducible end-to-end benchmark suite on a fake ping backend.
+
+Runs PingHeatmap.run_analysis (probe + grid + render through
+generate_visualization) and ConcurrentUserPopulationEstimator
+.estimate_concurrent_users at several target counts against the seeded
+FakeNetwork in fake_network.py, so runs are comparable without a network.
+Scales up to --stub-max go through the stub `ping` executable once per output
+format (Linux, macOS, Windows), exercising PingStream and the parsers; larger
+scales replace only the ping call. Every case runs in its own interpreter
+so caches and peak RSS don't leak between cases.
+
+Results are written as JSON (--output); --compare prints the change against an
+earlier results file.
+
+Usage: python benchmarks/bench_suite.py [--scales 100,10000,100000] [--output bench.json]
+                                        [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+LOCATION_DOMAINS = 500
+
+
+def make_targets(n):
+    return [f"host{i}.site{i % LOCATION_DOMAINS}.bench" for i in range(n)]
+
+
+def write_locations(path, seed):
+    """domain,lat,lon rows for every site*.bench suffix the targets use."""
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for k in range(LOCATION_DOMAINS):
+            f.write(f"site{k}.bench,{rng.uniform(-60, 70):.4f},{rng.uniform(-180, 180):.4f}\n")
+
+
+def run_case(case):
+    """Run one benchmark case in this process and return its result dictionary."""
+    from basemap_cache import BasemapCache
+    from fake_backend import FakePingHeatmap, FakePopulationEstimator
+    from fake_network import FakeNetwork, FakeResolver, install_stub_ping
+    from instrumentation import Instrumentation
+    from IP_heatmap import PingHeatmap
+    from locale_quantifier import ConcurrentUserPopulationEstimator
+
+    network = FakeNetwork(**case["network"])
+    targets = make_targets(case["targets"])
+    instruments = Instrumentation(level="error")
+    result = {"case": case}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if case["backend"] == "stub":
+            install_stub_ping(tmp, network, case["format"])
+        location_file = os.path.join(tmp, "locations.csv")
+        write_locations(location_file, network.seed)
+
+        start = time.perf_counter()
+        if case["tool"] == "heatmap":
+            kwargs = dict(resolution=case["resolution"], resolver=FakeResolver(), headless=True,
+                          location_file=location_file, instruments=instruments,
+                          basemap_cache=BasemapCache(dpi=case["dpi"], features=('gridlines',)))
+            if case["backend"] == "stub":
+                heatmap = PingHeatmap(**kwargs)
+            else:
+                heatmap = FakePingHeatmap(network, **kwargs)
+            heatmap.run_analysis(targets, ping_count=case["ping_count"], timeout_sec=case["timeout_sec"],
+                                 workers=case["workers"], output_file=os.path.join(tmp, "map.png"))
+            result["successful"] = len(heatmap.ping_results_list)
+            result["rendered"] = os.path.exists(os.path.join(tmp, "map.png"))
+        else:
+            kwargs = dict(ping_count=case["ping_count"], thread_count=case["workers"], output_dir=tmp,
+                          resolver=FakeResolver(), ping_deadline_sec=case["timeout_sec"], instruments=instruments)
+            if case["backend"] == "stub":
+                estimator = ConcurrentUserPopulationEstimator(**kwargs)
+            else:
+                estimator = FakePopulationEstimator(network, **kwargs)
+            estimator.target_websites = targets
+            estimate = estimator.estimate_concurrent_users()
+            result["successful"] = len(estimator.connection_metrics)
+            result["total_estimated_concurrent_users"] = estimate.get("total_estimated_concurrent_users")
+        elapsed = time.perf_counter() - start
+
+    snapshot = instruments.snapshot()
+    result.update({
+        "wall_sec": elapsed,
+        "targets_per_sec": case["targets"] / elapsed if elapsed else None,
+        "stages": snapshot["stages"],
+        "counters": snapshot["counters"],
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin'
+                                                                              else 1024 * 1024),
+    })
+    return result
+
+
+def build_cases(args):
+    network = dict(seed=args.seed, distribution=args.distribution, median_ms=60.0, spread=0.4,
+                   loss=args.loss, hang_rate=args.hang_rate, time_scale=0.0, hang_sec=3.0)
+    cases = []
+    for n in args.scales:
+        variants = [("stub", fmt) for fmt in ("linux", "macos", "windows")] if n <= args.stub_max \
+            else [("inprocess", None)]
+        for tool in args.tools:
+            for backend, fmt in variants:
+                cases.append({"name": f"{tool}/{n}/{backend}" + (f"-{fmt}" if fmt else ""), "tool": tool,
+                              "targets": n, "backend": backend, "format": fmt, "network": network,
+                              "ping_count": args.ping_count, "timeout_sec": 2, "workers": args.workers,
+                              "resolution": 90, "dpi": args.dpi})
+    return cases
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "git_commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = {r["case"]["name"]: r for r in json.load(f)["results"]}
+    print(f"\nChange against {previous_path}:")
+    for r in results:
+        old = previous.get(r["case"]["name"])
+        if old is None or not old.get("wall_sec"):
+            continue
+        change = (r["wall_sec"] - old["wall_sec"]) / old["wall_sec"] * 100
+        print(f"  {r['case']['name']:<34} {old['wall_sec']:>8.2f}s -> {r['wall_sec']:>8.2f}s ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=[100, 10000, 100000])
+    parser.add_argument("--tools", type=lambda s: s.split(","), default=["heatmap", "estimator"])
+    parser.add_argument("--stub-max", type=int, default=1000,
+                        help="Largest scale run through the stub ping executable (one process per target)")
+    parser.add_argument("--ping-count", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distribution", choices=("fixed", "lognormal", "gamma"), default="lognormal")
+    parser.add_argument("--loss", type=float, default=0.02)
+    parser.add_argument("--hang-rate", type=float, default=0.01)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--output", default="bench_suite.json")
+    parser.add_argument("--compare")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Child mode: the tools print to stdout, so the result goes to a file
+        with open(args.run_case) as f:
+            case = json.load(f)
+        with open(args.run_case, 'w') as f:
+            json.dump(run_case(case), f)
+        return
+
+    results = []
+    print(f"{'case':<34} {'wall':>9} {'targets/s':>10} {'ok':>8} {'rss':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in build_cases(args):
+            path = os.path.join(tmp, "case.json")
+            with open(path, 'w') as f:
+                json.dump(case, f)
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", path],
+                           stdout=subprocess.DEVNULL, check=True)
+            with open(path) as f:
+                result = json.load(f)
+            results.append(result)
+            print(f"{case['name']:<34} {result['wall_sec']:>8.2f}s {result['targets_per_sec']:>10.0f} "
+                  f"{result['successful']:>8} {result['peak_rss_mb']:>6.0f}MB")
+
+    with open(args.output, 'w') as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
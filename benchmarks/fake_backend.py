@@ -0,0 +1,61 @@
+"""
+In-process fake probe backends for sweeps too large to spawn a ping per target.
+
+FakePingHeatmap and FakePopulationEstimator replace only the system ping call
+with the seeded FakeNetwork model from fake_network.py; resolution, the grid,
+statistics, rendering and estimation run unchanged.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_network import FakeNetwork, FakeResolver, install_stub_ping  # noqa: F401 (one import for callers)
+from IP_heatmap import PingHeatmap
+from locale_quantifier import ConcurrentUserPopulationEstimator
+
+
+def model_echoes(network, ip_address, count):
+    """Reply times for one ping run; sleeps for them when the network has a time_scale."""
+    rtts = network.echoes(ip_address, count)
+    if network.time_scale:
+        time.sleep(sum(r for r in rtts if r is not None) / 1000 * network.time_scale)
+    return [r for r in rtts if r is not None]
+
+
+class FakePingHeatmap(PingHeatmap):
+    def __init__(self, network, **kwargs):
+        """PingHeatmap whose run_ping asks the FakeNetwork instead of spawning ping."""
+        self.network = network
+        super().__init__(**kwargs)
+
+    def run_ping(self, website, count=4, timeout_sec=5, session=None, deadline_sec=None):
+        with self.instruments.stage("dns"):
+            ip_address = self.resolver.resolve(website)
+        with self.instruments.stage("wait"):
+            ping_times = model_echoes(self.network, ip_address, count)
+        if not ping_times:
+            self.outages[website] = count
+            return None
+        return {"website": website, "ip_address": ip_address, "avg_ping": sum(ping_times) / len(ping_times),
+                "ping_times": ping_times, "sent": count, "queue_delay_ms": 0.0}
+
+
+class FakePopulationEstimator(ConcurrentUserPopulationEstimator):
+    def __init__(self, network, **kwargs):
+        """Population estimator whose run_ping_samples asks the FakeNetwork instead of spawning ping."""
+        self.network = network
+        super().__init__(**kwargs)
+
+    def run_ping_samples(self, website, count=30, deadline_sec=None):
+        with self.instruments.stage("dns"):
+            ip_address = self.resolver.resolve(website)
+        with self.instruments.stage("wait"):
+            ping_times = model_echoes(self.network, ip_address, count)
+        if not ping_times:
+            self.outages[website] = count
+            return None
+        return {"website": website, "ip_address": ip_address, "ping_times": ping_times, "sent": count,
+                "queue_delay_ms": 0.0}
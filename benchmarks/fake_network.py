@@ -0,0 +1,242 @@
+"""
+Seeded latency model for the benchmark suite (standard library only).
+
+FakeNetwork gives every target a deterministic latency profile derived from a
+seed and the target address: a base RTT, per-echo noise from a fixed,
+lognormal or gamma distribution, packet loss, and a share of targets that hang
+until the caller's deadline. With distribution='address' the profile is read
+from a dotted target instead: the last octet is the RTT in ms and the third
+octet the per-echo standard deviation in ms (127.0.0.80 always answers in 80 ms,
+127.0.30.80 averages 80 ms with a 30 ms spread). install_stub_ping() puts a fake `ping` executable
+first on PATH that prints Linux, macOS or Windows formatted output from the
+model. For 'address' targets without spread, loss or hangs in Linux format it
+is a /bin/sh script; otherwise a Python script that imports only this module. FakeResolver
+maps hostnames to stable 10.x.y.z addresses so no DNS is used.
+
+fake_backend.py plugs the same model into the tools without spawning ping.
+"""
+import json
+import math
+import os
+import random
+import stat
+import sys
+import zlib
+
+PING_FORMATS = ("linux", "macos", "windows")
+
+
+class FakeNetwork:
+    def __init__(self, seed=0, distribution='lognormal', median_ms=60.0, spread=0.4, loss=0.02,
+                 hang_rate=0.01, time_scale=0.0, hang_sec=2.0):
+        """
+        :param distribution: 'fixed' (every echo at the base RTT), 'lognormal', 'gamma' or
+                             'address' (RTT and spread encoded in the target address)
+        :param median_ms: Median base RTT across targets
+        :param spread: Log-scale spread of base RTTs across targets and of echoes within one
+        :param loss: Probability that a single echo is lost
+        :param hang_rate: Share of targets that never answer and stall until killed
+        :param time_scale: Real seconds slept per simulated second (0: answer instantly)
+        :param hang_sec: How long a hanging stub ping stalls before exiting
+        """
+        if distribution not in ('fixed', 'lognormal', 'gamma', 'address'):
+            raise ValueError(f"Unknown distribution '{distribution}'.")
+        self.seed = seed
+        self.distribution = distribution
+        self.median_ms = median_ms
+        self.spread = spread
+        self.loss = loss
+        self.hang_rate = hang_rate
+        self.time_scale = time_scale
+        self.hang_sec = hang_sec
+
+    def to_json(self):
+        return json.dumps(self.__dict__)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls(**json.loads(text))
+
+    def _rng(self, target, salt=""):
+        return random.Random(zlib.crc32(f"{self.seed}:{target}:{salt}".encode()))
+
+    def profile(self, target):
+        """(base_rtt_ms, hangs) for a target; the same on every call and in every process."""
+        rng = self._rng(target)
+        base = self.median_ms * math.exp(rng.gauss(0.0, self.spread))
+        if self.distribution == 'address':
+            base = float(target.rsplit('.', 1)[1])
+        return base, rng.random() < self.hang_rate
+
+    def echoes(self, target, count, run=0):
+        """RTT in ms per echo (None for a lost one); `run` varies the draw between sweeps."""
+        base, hangs = self.profile(target)
+        if hangs:
+            return [None] * count
+        rng = self._rng(target, run)
+        rtts = []
+        for _ in range(count):
+            if rng.random() < self.loss:
+                rtts.append(None)
+            elif self.distribution == 'fixed':
+                rtts.append(base)
+            elif self.distribution == 'address':
+                rtts.append(max(0.1, rng.gauss(base, float(target.split('.')[2]))))
+            elif self.distribution == 'lognormal':
+                rtts.append(base * math.exp(rng.gauss(0.0, self.spread / 4)))
+            else:
+                shape = 1.0 / max(self.spread / 4, 1e-3) ** 2
+                rtts.append(rng.gammavariate(shape, base / shape))
+        return rtts
+
+
+def format_ping_output(target, rtts, ping_format):
+    """Reply lines and summary as the given platform's ping would print them."""
+    replies = [rtt for rtt in rtts if rtt is not None]
+    lines = []
+    if ping_format == "windows":
+        lines.append(f"Pinging {target} with 32 bytes of data:")
+        for rtt in rtts:
+            if rtt is None:
+                lines.append("Request timed out.")
+            elif rtt < 1:
+                lines.append(f"Reply from {target}: bytes=32 time<1ms TTL=57")
+            else:
+                lines.append(f"Reply from {target}: bytes=32 time={int(rtt)}ms TTL=57")
+        lines.append(f"Ping statistics for {target}:")
+        lines.append(f"    Packets: Sent = {len(rtts)}, Received = {len(replies)}, "
+                     f"Lost = {len(rtts) - len(replies)} ({(len(rtts) - len(replies)) * 100 // max(1, len(rtts))}% loss),")
+        if replies:
+            lines.append("Approximate round trip times in milli-seconds:")
+            lines.append(f"    Minimum = {int(min(replies))}ms, Maximum = {int(max(replies))}ms, "
+                         f"Average = {int(sum(replies) / len(replies))}ms")
+        return lines
+
+    lines.append(f"PING {target} ({target}): 56 data bytes" if ping_format == "macos"
+                 else f"PING {target} ({target}) 56(84) bytes of data.")
+    for seq, rtt in enumerate(rtts, start=0 if ping_format == "macos" else 1):
+        if rtt is not None:
+            lines.append(f"64 bytes from {target}: icmp_seq={seq} ttl=57 time={rtt:.3f} ms")
+        elif ping_format == "macos":
+            lines.append(f"Request timeout for icmp_seq {seq}")
+    lines.append("")
+    lines.append(f"--- {target} ping statistics ---")
+    lines.append(f"{len(rtts)} packets transmitted, {len(replies)} received, "
+                 f"{(len(rtts) - len(replies)) * 100 / max(1, len(rtts)):.1f}% packet loss")
+    if replies:
+        mean = sum(replies) / len(replies)
+        dev = math.sqrt(sum((r - mean) ** 2 for r in replies) / len(replies))
+        label = "round-trip min/avg/max/stddev" if ping_format == "macos" else "rtt min/avg/max/mdev"
+        lines.append(f"{label} = {min(replies):.3f}/{mean:.3f}/{max(replies):.3f}/{dev:.3f} ms")
+    return lines
+
+
+STUB_PING = '''#!{python} -S
+import os, sys, time
+sys.path.insert(0, {bench_dir!r})
+from fake_network import FakeNetwork, format_ping_output
+
+args = sys.argv[1:]
+count = 4
+for flag in ("-c", "-n"):
+    if flag in args:
+        count = int(args[args.index(flag) + 1])
+target = args[-1]
+network = FakeNetwork.from_json(os.environ["FAKE_PING_NETWORK"])
+ping_format = os.environ.get("FAKE_PING_FORMAT", "linux")
+if network.profile(target)[1]:
+    time.sleep(network.hang_sec)
+    sys.exit(1)
+rtts = network.echoes(target, count)
+lines = format_ping_output(target, rtts, ping_format)
+for line in lines:
+    rtt = None
+    if "time=" in line:
+        rtt = float(line.split("time=")[1].split()[0].rstrip("ms"))
+    if rtt and network.time_scale:
+        time.sleep(rtt / 1000 * network.time_scale)
+    print(line, flush=True)
+sys.exit(0 if any(r is not None for r in rtts) else 1)
+'''
+
+
+# For the usual benchmark network ('address' targets, no loss, no hangs, real-time or instant) a
+# /bin/sh stub prints the Linux output itself, so a spawn costs a shell and a `sleep` per echo
+# instead of a Python start (~20 ms of CPU). Targets with a spread still go to the Python stub.
+STUB_PING_SH = '''#!/bin/sh
+count=4
+prev=
+for arg; do
+    case $prev in -c|-n) count=$arg ;; esac
+    prev=$arg
+done
+target=$prev
+rtt=${{target##*.}}
+spread=${{target%.*}}
+spread=${{spread##*.}}
+case $count$rtt in *[!0-9]*) exec {python} -S {stub_py} "$@" ;; esac
+if [ "$spread" != 0 ] || [ "$rtt" -eq 0 ]; then
+    exec {python} -S {stub_py} "$@"
+fi
+ms=$rtt.000
+delay=$(printf '%d.%03d' $((rtt / 1000)) $((rtt % 1000)))
+echo "PING $target ($target) 56(84) bytes of data."
+seq=1
+while [ "$seq" -le "$count" ]; do
+    {sleep}
+    echo "64 bytes from $target: icmp_seq=$seq ttl=57 time=$ms ms"
+    seq=$((seq + 1))
+done
+echo
+echo "--- $target ping statistics ---"
+echo "$count packets transmitted, $count received, 0.0% packet loss"
+echo "rtt min/avg/max/mdev = $ms/$ms/$ms/0.000 ms"
+'''
+
+
+def install_stub_ping(directory, network, ping_format="linux"):
+    """Put a fake `ping` driven by `network` first on PATH (for this process and its children)."""
+    if ping_format not in PING_FORMATS:
+        raise ValueError(f"Unknown ping format '{ping_format}'.")
+    path = os.path.join(directory, "ping")
+    stub = STUB_PING.format(python=sys.executable, bench_dir=os.path.dirname(os.path.abspath(__file__)))
+    if (ping_format == "linux" and network.distribution == 'address' and network.loss == 0
+            and network.hang_rate == 0 and network.time_scale in (0, 1)):
+        stub_py = os.path.join(directory, "ping.py")
+        with open(stub_py, 'w') as f:
+            f.write(stub)
+        sleep = 'sleep "$delay"' if network.time_scale else ":"
+        stub = STUB_PING_SH.format(python=sys.executable, stub_py=stub_py, sleep=sleep)
+    with open(path, 'w') as f:
+        f.write(stub)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["FAKE_PING_NETWORK"] = network.to_json()
+    os.environ["FAKE_PING_FORMAT"] = ping_format
+    if not os.environ.get("PATH", "").startswith(directory + os.pathsep):
+        os.environ["PATH"] = directory + os.pathsep + os.environ.get("PATH", "")
+
+
+class FakeResolver:
+    """Stand-in for DNSCache: every hostname resolves to a stable 10.x.y.z address."""
+
+    def __init__(self):
+        self.lookups = 0
+
+    def resolve(self, hostname):
+        self.lookups += 1
+        h = zlib.crc32(hostname.encode())
+        return f"10.{h >> 16 & 255}.{h >> 8 & 255}.{h & 255 or 1}"
+
+    def resolve_many(self, hostnames, workers=16):
+        return {hostname: self.resolve(hostname) for hostname in hostnames}
+
+    def reset_stats(self):
+        self.lookups = 0
+
+    def stats(self):
+        return {"hits": 0, "negative_hits": 0, "misses": self.lookups, "failures": 0, "entries": 0,
+                "lookup_time_sec": 0.0, "estimated_time_saved_sec": 0.0}
+
+    def save(self, path=None):
+        pass
+
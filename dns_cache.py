@@ -0,0 +1,156 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+
+class DNSCache:
+    def __init__(self, ttl_sec=300, negative_ttl_sec=60, max_entries=4096, cache_file=None):
+        """
+        Hostname -> IPv4 resolver with an in-process TTL/LRU cache
+
+        Lookups go through socket.getaddrinfo, which doesn't report the record's TTL, so
+        every answer is kept for the fixed ttl_sec whatever TTL its zone publishes. Keep
+        ttl_sec at or below the shortest TTL of the targets (CDNs often use 20-60 s) when
+        a stale address matters more than the repeated lookups.
+
+        :param ttl_sec: How long a successful lookup is reused (a fixed time, not the record TTL)
+        :param negative_ttl_sec: How long a failed lookup is remembered before retrying
+        :param max_entries: Least recently used entries are evicted beyond this size
+        :param cache_file: Optional JSON file used to persist the cache between runs
+        """
+        self.ttl_sec = ttl_sec
+        self.negative_ttl_sec = negative_ttl_sec
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+
+        # hostname -> (ip address or None for a failed lookup, expiry as wall-clock time)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        if cache_file and os.path.exists(cache_file):
+            self.load(cache_file)
+
+    def reset_stats(self):
+        """Zero the hit/miss counters, e.g. at the start of a sweep."""
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.lookup_time_sec = 0.0
+
+    def stats(self):
+        """Counters plus an estimate of resolver time saved by cache hits."""
+        avg_lookup = self.lookup_time_sec / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "entries": len(self._entries),
+            "lookup_time_sec": self.lookup_time_sec,
+            "estimated_time_saved_sec": avg_lookup * (self.hits + self.negative_hits)
+        }
+
+    def _lookup(self, hostname):
+        """Return (found, ip) from the cache, updating counters and LRU order."""
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry is None:
+                return False, None
+            ip_address, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[hostname]
+                return False, None
+            self._entries.move_to_end(hostname)
+            if ip_address is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, ip_address
+
+    def _store(self, hostname, ip_address):
+        ttl = self.ttl_sec if ip_address is not None else self.negative_ttl_sec
+        with self._lock:
+            self._entries[hostname] = (ip_address, time.time() + ttl)
+            self._entries.move_to_end(hostname)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resolve(self, hostname):
+        """
+        Resolve hostname to its first IPv4 address
+
+        :param hostname: Name (or dotted IP) to resolve
+        :return: IP address string, or None if the name does not resolve
+        """
+        found, ip_address = self._lookup(hostname)
+        if found:
+            return ip_address
+
+        started = time.perf_counter()
+        try:
+            ip_address = socket.gethostbyname(hostname)
+        except (socket.gaierror, socket.herror, UnicodeError):
+            ip_address = None
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.misses += 1
+            self.lookup_time_sec += elapsed
+            if ip_address is None:
+                self.failures += 1
+        self._store(hostname, ip_address)
+        return ip_address
+
+    def resolve_many(self, hostnames, workers=16):
+        """
+        Resolve a whole target list up front, concurrently
+
+        :param hostnames: Iterable of names; duplicates are looked up once
+        :param workers: Number of resolver threads
+        :return: Dictionary of hostname -> IP address (or None)
+        """
+        unique = list(dict.fromkeys(hostnames))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return dict(zip(unique, executor.map(self.resolve, unique)))
+
+    def save(self, path=None):
+        """Write unexpired entries to the cache file as JSON."""
+        path = path or self.cache_file
+        if not path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = {host: [ip, expires_at] for host, (ip, expires_at) in self._entries.items()
+                       if expires_at > now}
+        with open(path, 'w') as f:
+            json.dump(entries, f)
+
+    def load(self, path=None):
+        """Merge unexpired entries from a cache file written by save()."""
+        path = path or self.cache_file
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            instrumentation.shared.warning(f"Could not load DNS cache from {path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for host, (ip_address, expires_at) in entries.items():
+                if expires_at > now:
+                    self._entries[host] = (ip_address, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by PingHeatmap, ConcurrentUserPopulationEstimator and AsyncProber unless
+# they are given a resolver of their own
+shared_cache = DNSCache()
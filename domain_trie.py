@@ -0,0 +1,122 @@
+import csv
+import json
+from collections import OrderedDict
+
+
+class DomainSuffixTrie:
+    def __init__(self, memo_entries=65536):
+        """
+        Longest-suffix lookup of hostnames against a domain -> value mapping
+
+        Domains are stored label by label from the TLD inwards, so "news.com.au" is
+        the path au -> com -> news. A lookup walks the hostname's labels the same way
+        and keeps the deepest stored value, in O(labels) no matter how many domains
+        are loaded. Matches respect label boundaries ("bbc.co.uk" never matches
+        "notbbc.co.uk"). Results are memoized per hostname.
+
+        :param memo_entries: Hostnames whose results are kept (least recently used evicted)
+        """
+        self._root = {}
+        self._size = 0
+        self.memo_entries = memo_entries
+        self._memo = OrderedDict()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, domain):
+        node = self._find_node(domain)
+        return node is not None and None in node
+
+    @staticmethod
+    def normalize(hostname):
+        return hostname.strip().rstrip('.').lower()
+
+    def _find_node(self, domain):
+        node = self._root
+        for label in reversed(self.normalize(domain).split('.')):
+            node = node.get(label)
+            if node is None:
+                return None
+        return node
+
+    def insert(self, domain, value):
+        """Map domain (and every hostname under it without a longer match) to value."""
+        labels = self.normalize(domain).split('.')
+        if not all(labels):
+            raise ValueError(f"Invalid domain '{domain}'.")
+        node = self._root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        if None not in node:
+            self._size += 1
+        # Values live under the None key; labels are never None
+        node[None] = value
+        self._memo.clear()
+
+    def update(self, mapping):
+        for domain, value in mapping.items():
+            self.insert(domain, value)
+
+    def lookup(self, hostname):
+        """
+        Longest stored suffix of hostname
+
+        :return: (matched domain, value), or (None, None) if nothing matches
+        """
+        hostname = self.normalize(hostname)
+        result = self._memo.get(hostname)
+        if result is not None:
+            self._memo.move_to_end(hostname)
+            return result
+
+        labels = hostname.split('.')
+        node = self._root
+        match = (None, None)
+        for depth, label in enumerate(reversed(labels), start=1):
+            node = node.get(label)
+            if node is None:
+                break
+            if None in node:
+                match = ('.'.join(labels[-depth:]), node[None])
+
+        self._memo[hostname] = match
+        if len(self._memo) > self.memo_entries:
+            self._memo.popitem(last=False)
+        return match
+
+    def load(self, path):
+        """
+        Add mappings from a file
+
+        JSON files hold {"domain": [lat, lon], ...}; anything else is read as CSV
+        rows of domain,lat,lon (blank lines and lines starting with # are skipped).
+
+        :return: Number of domains read
+        """
+        count = 0
+        if path.endswith('.json'):
+            with open(path, 'r') as f:
+                mapping = json.load(f)
+            for domain, (lat, lon) in mapping.items():
+                self.insert(domain, [float(lat), float(lon)])
+                count += 1
+        else:
+            with open(path, 'r', newline='') as f:
+                for row in csv.reader(f):
+                    if not row or row[0].lstrip().startswith('#'):
+                        continue
+                    try:
+                        domain, lat, lon = row[:3]
+                        self.insert(domain, [float(lat), float(lon)])
+                    except ValueError:
+                        # Header lines and malformed rows
+                        continue
+                    count += 1
+        return count
+
+    @classmethod
+    def from_mapping(cls, mapping, **kwargs):
+        trie = cls(**kwargs)
+        trie.update(mapping)
+        return trie
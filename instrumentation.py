@@ -0,0 +1,194 @@
+import bisect
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "quiet": 100}
+
+# Histogram bucket upper bounds in seconds: 1-2.5-5 steps from 10 us to 100 s
+BUCKET_BOUNDS = tuple(m * 10.0 ** e for e in range(-5, 2) for m in (1, 2.5, 5)) + (100.0,)
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        """Fixed-bucket histogram of durations in seconds, plus count/sum/min/max."""
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)   # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Bucket-interpolated quantile (like Prometheus' histogram_quantile)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, max(self.min, low + (high - low) * (rank - seen) / n))
+            seen += n
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_sec": self.sum,
+            "mean_sec": self.sum / self.count if self.count else None,
+            "min_sec": self.min,
+            "max_sec": self.max,
+            "p50_sec": self.quantile(0.5),
+            "p95_sec": self.quantile(0.95),
+            "p99_sec": self.quantile(0.99),
+        }
+
+
+class Instrumentation:
+    def __init__(self, level="info", enabled=True, stream=None):
+        """
+        Per-stage timing histograms, counters and a leveled replacement for print
+
+        :param level: Lowest level that is printed: 'debug', 'info', 'warning', 'error'
+                      or 'quiet'. Per-target progress is logged at 'debug' and per-target
+                      failures (timeouts, DNS errors) at 'warning', so 'info' still prints
+                      those failures and 'error' is the lowest level that keeps the probing
+                      hot path print-free; only sweep-level errors print at 'error'.
+        :param enabled: Record timings and counters (printing follows level regardless)
+        :param stream: Where log lines go (default: sys.stdout at the time of the call)
+        """
+        self.set_level(level)
+        self.enabled = enabled
+        self.stream = stream
+        self._lock = threading.Lock()
+        self.reset()
+
+    def set_level(self, level):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level '{level}'. Choose one of {', '.join(LEVELS)}.")
+        self.level = level
+        self._threshold = LEVELS[level]
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+    # --- Timing ---
+    def observe(self, stage, seconds):
+        """Record one duration for a stage."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def stage(self, stage):
+        """Time the enclosed block as one observation of `stage`."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    # --- Logging ---
+    def enabled_for(self, level):
+        """True if messages at `level` are printed (check before building costly messages)."""
+        return LEVELS[level] >= self._threshold
+
+    def log(self, level, message, *args):
+        """Print message at `level`; with args it is `message % args`, only built if printed."""
+        if LEVELS[level] >= self._threshold:
+            print(message % args if args else message, file=self.stream or sys.stdout)
+
+    def debug(self, message, *args):
+        self.log("debug", message, *args)
+
+    def info(self, message, *args):
+        self.log("info", message, *args)
+
+    def warning(self, message, *args):
+        self.log("warning", message, *args)
+
+    def error(self, message, *args):
+        self.log("error", message, *args)
+
+    # --- Export ---
+    def snapshot(self):
+        """Every stage's histogram summary and every counter as a plain dictionary."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "uptime_sec": time.time() - self.started,
+                "stages": {stage: histogram.to_dict() for stage, histogram in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+
+    def to_prometheus(self, prefix="ping_heatmap"):
+        """Prometheus text exposition format: one histogram per stage, one counter per counter."""
+        lines = [f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(histogram.bounds + (float('inf'),), histogram.buckets):
+                    cumulative += n
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            for name, value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, path, prefix="ping_heatmap"):
+        """Write the Prometheus text format (e.g. for node_exporter's textfile collector)."""
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus(prefix))
+
+    def report(self):
+        """Human-readable per-stage table (printed at 'info')."""
+        if not self.enabled_for("info"):
+            return
+        snapshot = self.snapshot()
+        self.info(f"{'stage':>14} {'count':>7} {'total':>9} {'mean':>9} {'p95':>9} {'max':>9}")
+        for stage, s in snapshot["stages"].items():
+            self.info(f"{stage:>14} {s['count']:>7} {s['sum_sec']:>8.3f}s {s['mean_sec'] * 1000:>7.2f}ms "
+                      f"{s['p95_sec'] * 1000:>7.2f}ms {s['max_sec'] * 1000:>7.2f}ms")
+
+
+# Shared by PingHeatmap, the population estimator and PingStream unless they're given their own.
+# It starts at 'debug' so the tools print the same per-target progress they always have.
+shared = Instrumentation(level="debug")
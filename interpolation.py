@@ -0,0 +1,239 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+_UNLOADED = object()
+_ckdtree = _UNLOADED
+
+
+def load_kdtree():
+    """
+    scipy's cKDTree, imported on first use (scipy.spatial alone takes ~0.2s to import)
+
+    :return: The cKDTree class, or None without scipy (callers fall back to brute force)
+    """
+    global _ckdtree
+    if _ckdtree is _UNLOADED:
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:  # scipy is optional; fall back to chunked brute force
+            cKDTree = None
+        _ckdtree = cKDTree
+    return _ckdtree
+
+
+def to_unit_vectors(lats, lons):
+    """Convert latitude/longitude in degrees to points on the unit sphere, shape (n, 3)."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Great-circle distance in km for a straight-line distance between unit vectors."""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+def km_to_chord(km):
+    return 2.0 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+
+class SphericalInterpolator:
+    def __init__(self, lats, lons, values, use_tree=True):
+        """
+        Interpolate scattered samples on the globe using great-circle distances
+
+        Samples are indexed as unit vectors in a k-d tree, where straight-line (chord)
+        distance orders neighbours exactly as great-circle distance does. Without
+        scipy a chunked brute-force neighbour search is used instead.
+
+        :param lats: Sample latitudes in degrees
+        :param lons: Sample longitudes in degrees
+        :param values: Sample values (e.g. ping in ms)
+        :param use_tree: Set False to force the brute-force search
+        """
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.points = to_unit_vectors(self.lats, self.lons)
+        self.values = np.asarray(values, dtype=np.float64)
+        if len(self.values) == 0:
+            raise ValueError("SphericalInterpolator needs at least one sample.")
+        tree_class = load_kdtree() if use_tree else None
+        self.tree = tree_class(self.points) if tree_class is not None else None
+
+    def _neighbours(self, queries, k, max_chord=np.inf):
+        """k nearest samples of each query point: (chord distances, sample indices)."""
+        k = min(k, len(self.values))
+        if self.tree is not None:
+            dist, idx = self.tree.query(queries, k=k, distance_upper_bound=max_chord, workers=-1)
+            if k == 1:
+                dist, idx = dist[:, None], idx[:, None]
+            return dist, idx
+
+        # Brute force: full distance matrix per chunk, then partial sort for the k nearest
+        dist = np.sqrt(np.maximum(
+            2.0 - 2.0 * queries @ self.points.T, 0.0))  # |a-b|^2 = 2 - 2 a.b on the unit sphere
+        idx = np.argpartition(dist, k - 1, axis=1)[:, :k] if k < dist.shape[1] else \
+            np.broadcast_to(np.arange(k), dist.shape).copy()
+        dist = np.take_along_axis(dist, idx, axis=1)
+        order = np.argsort(dist, axis=1)
+        dist, idx = np.take_along_axis(dist, order, axis=1), np.take_along_axis(idx, order, axis=1)
+        too_far = dist > max_chord
+        dist[too_far], idx[too_far] = np.inf, len(self.values)
+        return dist, idx
+
+    def _gather(self, idx):
+        # Missing neighbours are reported with index == n_samples; give them a dummy value
+        padded = np.append(self.values, 0.0)
+        return padded[idx]
+
+    def idw(self, lats, lons, k=8, power=2.0, max_distance_km=None):
+        """
+        Inverse-distance weighting over the k nearest samples
+
+        :param max_distance_km: Ignore samples further than this (cells with none become NaN)
+        :return: Interpolated values, NaN where no sample is in range
+        """
+        max_chord = km_to_chord(max_distance_km) if max_distance_km is not None else np.inf
+        dist, idx = self._neighbours(to_unit_vectors(lats, lons), k, max_chord)
+        dist_km = chord_to_km(np.where(np.isfinite(dist), dist, 0.0))
+
+        valid = np.isfinite(dist)
+        with np.errstate(divide='ignore'):
+            weights = np.where(valid, 1.0 / np.maximum(dist_km, 1e-6) ** power, 0.0)
+        total = weights.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, (weights * self._gather(idx)).sum(axis=1) / total, np.nan)
+
+    def kernel(self, lats, lons, bandwidth_km=500.0, k=32, cutoff=3.0):
+        """
+        Gaussian kernel smoothing on great-circle distance (Nadaraya-Watson)
+
+        :param bandwidth_km: Kernel standard deviation
+        :param k: Maximum number of neighbours considered per point
+        :param cutoff: Ignore samples beyond cutoff x bandwidth (cells with none become NaN)
+        """
+        dist, idx = self._neighbours(to_unit_vectors(lats, lons), k, km_to_chord(cutoff * bandwidth_km))
+        valid = np.isfinite(dist)
+        dist_km = chord_to_km(np.where(valid, dist, 0.0))
+        weights = np.where(valid, np.exp(-0.5 * (dist_km / bandwidth_km) ** 2), 0.0)
+        total = weights.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, (weights * self._gather(idx)).sum(axis=1) / total, np.nan)
+
+    def grid(self, lat_grid, lon_grid, method='idw', chunk_size=None, **kwargs):
+        """
+        Evaluate the interpolator on every cell of a lat/lon grid
+
+        :param lat_grid: 1-D array of grid latitudes (rows)
+        :param lon_grid: 1-D array of grid longitudes (columns)
+        :param method: 'idw', 'kernel' or 'smooth'; kwargs are passed through
+        :param chunk_size: Cells evaluated per batch (bounds peak memory)
+        :return: Array of shape (len(lat_grid), len(lon_grid))
+        """
+        if method == 'idw':
+            evaluate = self.idw
+        elif method == 'kernel':
+            evaluate = self.kernel
+        elif method == 'smooth':
+            return smooth_grid(self.lats, self.lons, self.values, lat_grid, lon_grid, **kwargs)
+        else:
+            raise ValueError(f"Unknown interpolation method '{method}'. Choose 'idw', 'kernel' or 'smooth'.")
+
+        if chunk_size is None:
+            # ~500k cells per batch with a tree; brute force keeps its distance matrix near 5M entries
+            chunk_size = 500_000 if self.tree is not None else max(1, 5_000_000 // len(self.values))
+        return _evaluate_on_grid(evaluate, lat_grid, lon_grid, chunk_size, **kwargs)
+
+
+def _evaluate_on_grid(evaluate, lat_grid, lon_grid, chunk_size, **kwargs):
+    """Call evaluate(lats, lons) over all grid cells in flat batches of chunk_size."""
+    lat_grid = np.asarray(lat_grid, dtype=np.float64)
+    lon_grid = np.asarray(lon_grid, dtype=np.float64)
+    n_cols = len(lon_grid)
+    out = np.empty(len(lat_grid) * n_cols)
+    for start in range(0, len(out), chunk_size):
+        flat = np.arange(start, min(start + chunk_size, len(out)))
+        out[flat] = evaluate(lat_grid[flat // n_cols], lon_grid[flat % n_cols], **kwargs)
+    return out.reshape(len(lat_grid), n_cols)
+
+
+def smooth_grid(lats, lons, values, lat_grid, lon_grid, bandwidth_km=500.0, cutoff=3.0, chunk_rows=256):
+    """
+    Gaussian kernel smoothing on a uniform lat/lon grid via FFT convolution
+
+    Samples are binned onto the grid (value sums and counts), both layers are
+    convolved with a Gaussian and divided. The longitude width of the kernel in
+    cells grows with 1/cos(latitude) so it stays bandwidth_km wide on the ground,
+    and wraps around the antimeridian. Cost is O(cells log cells) regardless of the
+    number of samples, which makes it the fast choice for very fine grids; it is a
+    separable approximation of the 'kernel' method that is closest at low latitudes.
+
+    :param cutoff: Cells whose total kernel weight is below that of one sample at
+                   cutoff x bandwidth are left NaN
+    :param chunk_rows: Rows (and columns) transformed per batch (bounds peak memory)
+    """
+    lat_grid = np.asarray(lat_grid, dtype=np.float64)
+    lon_grid = np.asarray(lon_grid, dtype=np.float64)
+    n_rows, n_cols = len(lat_grid), len(lon_grid)
+    lat_step = (lat_grid[-1] - lat_grid[0]) / max(n_rows - 1, 1)
+    lon_step = (lon_grid[-1] - lon_grid[0]) / max(n_cols - 1, 1)
+
+    # Bin samples onto the nearest cells
+    row = np.clip(np.rint((np.asarray(lats) - lat_grid[0]) / lat_step), 0, n_rows - 1).astype(np.intp)
+    col = np.clip(np.rint((np.asarray(lons) - lon_grid[0]) / lon_step), 0, n_cols - 1).astype(np.intp)
+    flat = row * n_cols + col
+    weights = np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols).astype(np.float32)
+    sums = np.bincount(flat, weights=np.asarray(values, dtype=np.float64),
+                       minlength=n_rows * n_cols).reshape(n_rows, n_cols).astype(np.float32)
+
+    km_per_deg = np.pi * EARTH_RADIUS_KM / 180.0
+
+    # Longitude pass: per-row sigma, periodic, so a plain FFT along each row is exact
+    freqs = np.fft.rfftfreq(n_cols)
+    cos_lat = np.maximum(np.cos(np.radians(lat_grid)), 1e-6)
+    sigma_cols = np.minimum(bandwidth_km / (km_per_deg * lon_step * cos_lat), n_cols)
+    for start in range(0, n_rows, chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        transfer = np.exp(-2.0 * (np.pi * sigma_cols[rows, None] * freqs[None, :]) ** 2)
+        for layer in (weights, sums):
+            layer[rows] = np.fft.irfft(np.fft.rfft(layer[rows], axis=1) * transfer, n=n_cols, axis=1)
+
+    # Latitude pass: constant sigma, zero-padded so the poles don't wrap into each other
+    sigma_rows = bandwidth_km / (km_per_deg * lat_step)
+    pad = int(min(np.ceil(4 * sigma_rows), 4 * n_rows))
+    n_fft = n_rows + pad
+    transfer = np.exp(-2.0 * (np.pi * sigma_rows * np.fft.rfftfreq(n_fft)) ** 2)[:, None]
+    for start in range(0, n_cols, chunk_rows):
+        cols = slice(start, start + chunk_rows)
+        for layer in (weights, sums):
+            layer[:, cols] = np.fft.irfft(np.fft.rfft(layer[:, cols], n=n_fft, axis=0) * transfer,
+                                          n=n_fft, axis=0)[:n_rows]
+
+    # Normalized 2-D Gaussian weight of a single sample at the cutoff radius, per row
+    min_weight = np.exp(-0.5 * cutoff ** 2) / (2 * np.pi * sigma_rows * sigma_cols[:, None])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = sums.astype(np.float64) / weights
+    out[weights < min_weight] = np.nan
+    return out
+
+
+def brute_force_grid(sample_lats, sample_lons, values, lat_grid, lon_grid, power=2.0):
+    """
+    Reference IDW using every sample for every cell via NumPy broadcasting
+
+    This is the naive O(cells x samples) approach the k-d tree path replaces; it
+    is kept for benchmarking and cross-checking.
+    """
+    points = to_unit_vectors(sample_lats, sample_lons)
+    values = np.asarray(values, dtype=np.float64)
+
+    def evaluate(lats, lons):
+        queries = to_unit_vectors(lats, lons)
+        dist_km = chord_to_km(np.sqrt(np.maximum(2.0 - 2.0 * queries @ points.T, 0.0)))
+        weights = 1.0 / np.maximum(dist_km, 1e-6) ** power
+        return (weights @ values) / weights.sum(axis=1)
+
+    return _evaluate_on_grid(evaluate, lat_grid, lon_grid, max(1, 5_000_000 // len(values)))
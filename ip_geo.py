@@ -0,0 +1,170 @@
+import csv
+import ipaddress
+import os
+import socket
+
+import numpy as np
+
+import instrumentation
+
+# Column files of a built index, all the same length and sorted by range start
+INDEX_FILES = {
+    "starts": "starts.npy",
+    "ends": "ends.npy",
+    "lats": "lats.npy",
+    "lons": "lons.npy",
+}
+
+
+def ip_to_int(ip_address):
+    """Dotted IPv4 string -> int (raises OSError for anything else)."""
+    return int.from_bytes(socket.inet_aton(ip_address), 'big')
+
+
+def ips_to_array(ip_addresses):
+    """
+    Convert IPv4 addresses to a uint32 array in one pass
+
+    Accepts an array of ints as-is; strings that are not valid IPv4 become 0
+    (0.0.0.0 is never a routable probe target, so it acts as a miss).
+    """
+    if isinstance(ip_addresses, np.ndarray) and ip_addresses.dtype.kind in 'ui':
+        return ip_addresses.astype(np.uint32, copy=False)
+    packed = []
+    for ip_address in ip_addresses:
+        try:
+            packed.append(socket.inet_aton(ip_address) if isinstance(ip_address, str) else
+                          int(ip_address).to_bytes(4, 'big'))
+        except (OSError, ValueError, OverflowError, TypeError):
+            packed.append(b'\0\0\0\0')
+    return np.frombuffer(b''.join(packed), dtype='>u4').astype(np.uint32)
+
+
+def _parse_range(fields):
+    """(start, end, lat, lon) from a 'start,end,lat,lon' or 'cidr,lat,lon' row."""
+    if len(fields) >= 4:
+        start, end, lat, lon = fields[:4]
+        return _parse_ip(start), _parse_ip(end), float(lat), float(lon)
+    network = ipaddress.IPv4Network(fields[0].strip(), strict=False)
+    return int(network.network_address), int(network.broadcast_address), float(fields[1]), float(fields[2])
+
+
+def _parse_ip(value):
+    value = value.strip()
+    return int(value) if value.isdigit() else int(ipaddress.IPv4Address(value))
+
+
+class IPGeoIndex:
+    def __init__(self, starts, ends, lats, lons):
+        """
+        Offline IPv4 -> (lat, lon) lookup over sorted, non-overlapping address ranges
+
+        The index is four parallel arrays (uint32 range starts and ends, float32
+        coordinates). A lookup is one searchsorted over the starts plus an end check,
+        so batches of addresses are resolved entirely in NumPy. Use build() to
+        convert a CSV of ranges once and load() to memory-map the result.
+        """
+        self.starts = starts
+        self.ends = ends
+        self.lats = lats
+        self.lons = lons
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def build(cls, csv_path, index_dir=None):
+        """
+        Build an index from a CSV of IPv4 ranges
+
+        Rows are either start_ip,end_ip,lat,lon (dotted or integer addresses) or
+        cidr,lat,lon. Header rows, comments (#), IPv6 and malformed rows are skipped.
+        Where ranges overlap, the one starting first wins and the rest is trimmed.
+
+        :param index_dir: If given, save the arrays there for load()
+        """
+        starts, ends, lats, lons = [], [], [], []
+        skipped = 0
+        with open(csv_path, 'r', newline='') as f:
+            for fields in csv.reader(f):
+                if not fields or fields[0].lstrip().startswith('#'):
+                    continue
+                try:
+                    start, end, lat, lon = _parse_range(fields)
+                except ValueError:
+                    skipped += 1
+                    continue
+                starts.append(start)
+                ends.append(end)
+                lats.append(lat)
+                lons.append(lon)
+
+        starts = np.array(starts, dtype=np.uint32)
+        ends = np.array(ends, dtype=np.uint32)
+        lats = np.array(lats, dtype=np.float32)
+        lons = np.array(lons, dtype=np.float32)
+        order = np.argsort(starts, kind='stable')
+        starts, ends, lats, lons = starts[order], ends[order], lats[order], lons[order]
+
+        # Trim overlaps so every address falls in at most one range
+        if len(starts) > 1:
+            covered = np.maximum.accumulate(ends.astype(np.int64))
+            new_starts = np.maximum(starts[1:].astype(np.int64), covered[:-1] + 1)
+            keep = np.concatenate(([True], new_starts <= ends[1:]))
+            starts[1:] = np.minimum(new_starts, 0xFFFFFFFF).astype(np.uint32)
+            starts, ends, lats, lons = starts[keep], ends[keep], lats[keep], lons[keep]
+
+        if skipped:
+            instrumentation.shared.warning(f"IP geo index: skipped {skipped} unparseable or non-IPv4 rows "
+                                           f"in {csv_path}")
+        index = cls(starts, ends, lats, lons)
+        if index_dir:
+            index.save(index_dir)
+        return index
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        for name, filename in INDEX_FILES.items():
+            np.save(os.path.join(index_dir, filename), getattr(self, name))
+
+    @classmethod
+    def load(cls, index_dir):
+        """Memory-map a saved index; pages are read on demand, so this returns immediately."""
+        arrays = {name: np.load(os.path.join(index_dir, filename), mmap_mode='r')
+                  for name, filename in INDEX_FILES.items()}
+        return cls(**arrays)
+
+    def lookup_many(self, ip_addresses):
+        """
+        Locate a batch of IPv4 addresses
+
+        :param ip_addresses: Dotted strings or a uint32 array
+        :return: (lats, lons) float32 arrays, NaN where no range matches
+        """
+        ips = ips_to_array(ip_addresses)
+        lats = np.full(len(ips), np.nan, dtype=np.float32)
+        lons = np.full(len(ips), np.nan, dtype=np.float32)
+        if len(self.starts) == 0:
+            return lats, lons
+        # Searching in sorted order walks the starts array forwards instead of jumping
+        # around it, which is several times faster for large batches
+        order = np.argsort(ips)
+        sorted_ips = ips[order]
+        idx = np.searchsorted(self.starts, sorted_ips, side='right') - 1
+        safe_idx = np.maximum(idx, 0)
+        hit = (idx >= 0) & (sorted_ips <= self.ends[safe_idx]) & (sorted_ips != 0)
+        lats[order[hit]] = self.lats[safe_idx[hit]]
+        lons[order[hit]] = self.lons[safe_idx[hit]]
+        return lats, lons
+
+    def lookup(self, ip_address):
+        """(lat, lon) for one address, or None if it isn't covered."""
+        try:
+            ip = ip_to_int(ip_address)
+        except (OSError, TypeError):
+            return None
+        # Search with a matching dtype so NumPy doesn't convert the whole starts array
+        idx = int(np.searchsorted(self.starts, np.uint32(ip), side='right')) - 1
+        if idx < 0 or ip > self.ends[idx]:
+            return None
+        return [float(self.lats[idx]), float(self.lons[idx])]
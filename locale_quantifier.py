@@ -1,18 +1,34 @@
-import subprocess
-import platform
-import statistics
 import time
 import json
 import os
-import socket
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from async_prober import AsyncProber
+from probe_scheduler import ProbeScheduler
+import dns_cache
+import instrumentation
+import ping_stats
+from ping_stream import DEFAULT_INTERVAL_SEC, PingStream
+from result_cache import params_key
 
 class ConcurrentUserPopulationEstimator:
     def __init__(self, 
                  target_websites=None, 
                  ping_count=30, 
                  thread_count=10,
-                 output_dir='user_population_data'):
+                 output_dir='user_population_data',
+                 backend='subprocess',
+                 resolver=None,
+                 sample_log=None,
+                 ping_deadline_sec=10,
+                 adaptive=None,
+                 pacer=None,
+                 instruments=None,
+                 result_cache=None,
+                 bypass_cache=False,
+                 planner=None,
+                 sweep_budget_sec=None,
+                 history=None,
+                 history_window=None):
         """
         Initialize the Concurrent User Population Estimator
         
@@ -20,6 +36,30 @@ class ConcurrentUserPopulationEstimator:
         :param ping_count: Number of pings per website
         :param thread_count: Number of concurrent threads
         :param output_dir: Directory to save analysis data
+        :param backend: 'subprocess' (system ping per site) or 'async' (one event loop for all sites)
+        :param resolver: DNS cache to use (defaults to the cache shared with PingHeatmap)
+        :param sample_log: Optional SampleLogWriter that keeps every probe session on disk
+        :param ping_deadline_sec: Limit on one site's ping run, pacing delay included; replies received
+                                  before it are kept
+        :param adaptive: Optional adaptive.AdaptiveSampler that stops each site's pings once its
+                         RTT and jitter estimates converge (ping_count is then unused)
+        :param pacer: Optional rate_limit.ProbePacer (can be shared with PingHeatmap) that spaces
+                      out ping starts; queueing delay is kept apart from the measured RTTs
+        :param instruments: Instrumentation for stage timings and leveled logging (default: the
+                            shared one; see instrumentation.Instrumentation for the levels)
+        :param result_cache: Optional result_cache.ResultCache (can be shared with PingHeatmap and
+                             other processes); sites with fresh cached samples are not pinged again
+        :param bypass_cache: Ping every site even if the cache has fresh samples (results are
+                             still stored for later runs)
+        :param planner: Optional sweep_planner.SweepPlanner that pings the stalest, most volatile
+                        and lossiest sites first
+        :param sweep_budget_sec: Seconds a sweep may take: pings still running when it runs out are
+                                 abandoned (subprocess backend). With a planner, only the sites
+                                 expected to fit are pinged; the rest wait for a later run
+        :param history: Optional ring_buffer.SiteHistory that keeps every site's last echoes
+                        across runs in fixed-size buffers (memory stays bounded)
+        :param history_window: With a history, estimate from each site's jitter, ping and loss
+                               over this many recent echoes instead of the current run only
         """
         # Create output directory
         self.output_dir = output_dir
@@ -61,25 +101,71 @@ class ConcurrentUserPopulationEstimator:
         # Ping parameters
         self.ping_count = ping_count
         self.thread_count = thread_count
+        self.backend = backend
+        self.resolver = resolver or dns_cache.shared_cache
+        self.sample_log = sample_log
+        self.ping_deadline_sec = ping_deadline_sec
+        self.adaptive = adaptive
+        self.pacer = pacer
+        self.instruments = instruments or instrumentation.shared
+        self.result_cache = result_cache
+        self.bypass_cache = bypass_cache
+        self.planner = planner
+        self.sweep_budget_sec = sweep_budget_sec
+        self.history = history
+        self.history_window = history_window
+        # {website: echoes sent} for sites of the current sweep that were pinged but never
+        # answered, as opposed to those never pinged (unresolved, or cut off by the budget)
+        self.outages = {}
         
         # Storage for connection metrics
         self.connection_metrics = {}
     
     def calculate_jitter(self, ping_times):
         """
-        Calculate jitter (variation in ping times)
+        Calculate jitter (mean absolute difference of consecutive ping times)
         
         :param ping_times: List of ping times
-        :return: Jitter value
+        :return: Jitter value, as ping_stats.compute_metrics reports it
         """
         if len(ping_times) < 2:
             return 0
+        metrics = ping_stats.compute_metrics(ping_stats.pad_samples([ping_times]), len(ping_times))
+        return float(metrics["jitter"][0])
+    
+    def build_metrics(self, website, ping_times, count):
+        """
+        Build the per-site metrics dictionary from raw ping times
         
-        # Calculate differences between consecutive ping times
-        time_diffs = [abs(ping_times[i] - ping_times[i-1]) for i in range(1, len(ping_times))]
+        :param website: Target website
+        :param ping_times: List of ping times in ms for the replies received
+        :param count: Number of ping attempts made
+        :return: Ping statistics dictionary (see ping_stats.compute_metrics for the fields)
+        """
+        return ping_stats.metrics_by_site([website], [ping_times], count)[website]
+    
+    def build_all_metrics(self, samples_by_site, count):
+        """
+        Build metrics for every site in one vectorized pass
         
-        # Return mean of absolute differences
-        return statistics.mean(time_diffs)
+        :param samples_by_site: List of {"website", "ip_address", "ping_times"} dictionaries
+        :param count: Number of ping attempts made per site (or a list, one per entry)
+        :return: Dictionary of website -> metrics for the sites that replied
+        """
+        counts = count if isinstance(count, (list, tuple)) else [count] * len(samples_by_site)
+        # Streams cut short by the deadline report how many echoes actually went out
+        sent = [sample.get("sent", site_count) for sample, site_count in zip(samples_by_site, counts)]
+        results = ping_stats.metrics_by_site([sample["website"] for sample in samples_by_site],
+                                             [sample["ping_times"] for sample in samples_by_site], sent)
+        for sample, site_sent in zip(samples_by_site, sent):
+            metrics = results.get(sample["website"])
+            if metrics is None:
+                continue
+            metrics["sent"] = site_sent
+            for key in ("ip_address", "queue_delay_ms"):
+                if key in sample:
+                    metrics[key] = sample[key]
+        return results
     
     def run_ping(self, website, count=30):
         """
@@ -89,80 +175,73 @@ class ConcurrentUserPopulationEstimator:
         :param count: Number of ping attempts
         :return: Ping statistics dictionary
         """
-        print(f"Analyzing {website}...")
-        
-        # Handle numeric IP or domain separately
-        try:
-            # Try to resolve domain first
-            socket.gethostbyname(website)
-        except socket.gaierror:
-            print(f"Could not resolve {website}")
+        samples = self.run_ping_samples(website, count)
+        if samples is None:
             return None
+        metrics = self.build_metrics(website, samples["ping_times"], samples["sent"])
+        metrics["ip_address"] = samples["ip_address"]
+        return metrics
+    
+    def run_ping_samples(self, website, count=30, deadline_sec=None):
+        """
+        Run ping and return the raw reply times (statistics are computed in batch later)
         
-        # Determine the correct ping command based on OS
-        if platform.system() == "Windows":
-            cmd = ["ping", "-n", str(count), website]
-        else:
-            cmd = ["ping", "-c", str(count), website]
-        
-        try:
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            output, error = process.communicate(timeout=10)  # Reduced timeout
-            
-            if error:
-                print(f"Error running ping: {error}")
-                return None
-            
-            # Parse the ping output
-            ping_times = []
-            
-            if platform.system() == "Windows":
-                # Parse Windows ping output
-                for line in output.split('\n'):
-                    if "time=" in line or "time<" in line:
-                        # Extract time value
-                        if "time=" in line:
-                            try:
-                                time_str = line.split("time=")[1].split("ms")[0].strip()
-                                ping_times.append(float(time_str))
-                            except:
-                                pass
-                        elif "time<" in line:
-                            # For "time<1ms" responses
-                            ping_times.append(0.5)  # Assume half a millisecond
-            else:
-                # Parse Unix/Linux ping output
-                for line in output.split('\n'):
-                    if "time=" in line:
-                        try:
-                            time_str = line.split("time=")[1].split(" ms")[0].strip()
-                            ping_times.append(float(time_str))
-                        except:
-                            pass
-            
-            if ping_times:
-                # Calculate extensive metrics
-                metrics = {
-                    "website": website,
-                    "avg_ping": statistics.mean(ping_times),
-                    "median_ping": statistics.median(ping_times),
-                    "min_ping": min(ping_times),
-                    "max_ping": max(ping_times),
-                    "ping_times": ping_times,
-                    "jitter": self.calculate_jitter(ping_times),
-                    "packet_loss": (count - len(ping_times)) / count * 100,
-                    "ping_variance": statistics.variance(ping_times) if len(ping_times) > 1 else 0
-                }
-                return metrics
-            else:
-                print(f"No ping responses from {website}")
-                return None
+        :param website: Target website
+        :param count: Number of ping attempts
+        :param deadline_sec: Seconds left under the sweep budget, if less than ping_deadline_sec
+        :return: {"website", "ip_address", "ping_times"} dictionary, or None if nothing replied
+        """
+        self.instruments.debug("Analyzing %s...", website)
+        
+        # Resolve once through the shared cache and ping the IP, so ping
+        # doesn't have to resolve the name again
+        with self.instruments.stage("dns"):
+            ip_address = self.resolver.resolve(website)
+        if ip_address is None:
+            self.instruments.warning(f"Could not resolve {website}")
+            return None
         
-        except subprocess.TimeoutExpired:
-            print(f"Ping to {website} timed out")
+        # Read replies as they arrive; if the deadline passes, keep what we have
+        # instead of throwing the whole run away
+        session = self.adaptive.session(website) if self.adaptive is not None else None
+        # Charge every echo the run may send; ping spaces them itself, so the start only
+        # waits until the last one fits under the limits at that spacing
+        echoes = session.max_echoes if session else count
+        queue_delay = (self.pacer.acquire(ip_address, packets=echoes, interval_sec=DEFAULT_INTERVAL_SEC)
+                       if self.pacer is not None else 0.0)
+        # The wait counts against the site's deadline; the ping only gets what is left
+        if deadline_sec is None or deadline_sec > self.ping_deadline_sec:
+            deadline_sec = self.ping_deadline_sec
+        deadline_sec -= queue_delay
+        if deadline_sec <= 0:
+            self.instruments.warning(f"Deadline for {website} passed while queued for pacing")
+            if session is not None:
+                session.close()
             return None
+        # Lost echoes reach the session as None, so it counts every echo actually sent
+        stream = PingStream(ip_address, count=echoes, deadline_sec=deadline_sec, instruments=self.instruments,
+                            report_losses=session is not None)
+        try:
+            for rtt in stream:
+                if session is not None and not session.record(rtt):
+                    break
         except Exception as e:
-            print(f"Error during ping to {website}: {e}")
+            self.instruments.warning(f"Error during ping to {website}: {e}")
+            return None
+        finally:
+            if session is not None:
+                session.close()
+        
+        if stream.timed_out:
+            self.instruments.warning(f"Ping to {website} timed out after {stream.deadline_sec:.1f}s "
+                                     f"({len(stream.ping_times)} of ~{stream.sent} replies kept)")
+        
+        if stream.ping_times:
+            return {"website": website, "ip_address": ip_address, "ping_times": stream.ping_times,
+                    "sent": stream.sent, "queue_delay_ms": queue_delay * 1000}
+        else:
+            self.instruments.warning(f"No ping responses from {website}")
+            self.outages[website] = stream.sent
             return None
     
     def fallback_population_estimation(self):
@@ -193,12 +272,14 @@ class ConcurrentUserPopulationEstimator:
         
         return fallback_estimate
     
-    def calculate_user_population(self, connection_metrics):
+    def calculate_user_population(self, connection_metrics, window=None):
         """
         Calculate concurrent user population estimate based on network metrics
         and average enterprise CPU limitations
         
         :param connection_metrics: Network metrics for websites
+        :param window: Echoes of per-site history to use for jitter, ping and loss
+                       (default: history_window; needs a history)
         :return: Detailed user population estimation
         """
         if not connection_metrics:
@@ -211,69 +292,258 @@ class ConcurrentUserPopulationEstimator:
         AVG_CPU_CLOCK_SPEED = 3.0           # GHz
         AVG_SERVER_PROCESS_CAPACITY = 500   # Estimated concurrent processes per server
         
-        # Calculate network stress indicators
-        jitter_values = [metrics['jitter'] for metrics in connection_metrics.values()]
-        ping_values = [metrics['avg_ping'] for metrics in connection_metrics.values()]
-        
-        # User population estimation
-        total_estimated_population = 0
+        # Network metrics of every site as arrays, so the estimate is computed in one pass
+        websites = list(connection_metrics)
+        jitter_values = np.array([connection_metrics[w]['jitter'] for w in websites], dtype=np.float64)
+        ping_values = np.array([connection_metrics[w]['avg_ping'] for w in websites], dtype=np.float64)
+        loss_values = np.array([connection_metrics[w]['packet_loss'] for w in websites], dtype=np.float64)
+        
+        # Rolling values over each site's recent echoes, for the sites the history has replies for
+        window = self.history_window if window is None else window
+        if self.history is not None and window is not None:
+            rolling = self.history.window_metrics(websites, window)
+            known = rolling['received'] > 0
+            jitter_values = np.where(known, rolling['jitter'], jitter_values)
+            ping_values = np.where(known, rolling['avg_ping'], ping_values)
+            loss_values = np.where(known, rolling['packet_loss'], loss_values)
+        
+        # Calculate population based on network metrics and CPU limitations
+        jitter_factors = np.maximum(0, 1 - (jitter_values / 100))  # Normalize jitter
+        ping_factors = np.maximum(0, 1 - (ping_values / 1000))  # Normalize ping
+        packet_loss_factors = 1 - (loss_values / 100)
+        
+        # CPU-based population estimation
+        cpu_capacity_factor = (
+            AVG_ENTERPRISE_CPU_CORES * 
+            AVG_CPU_THREADS_PER_CORE * 
+            AVG_CPU_CLOCK_SPEED
+        )
+        
+        # Combine factors to estimate concurrent users (truncated like int())
+        estimates = np.trunc(
+            AVG_SERVER_PROCESS_CAPACITY * 
+            jitter_factors * 
+            ping_factors * 
+            packet_loss_factors * 
+            cpu_capacity_factor
+        ).astype(np.int64)
+        
+        # Back to plain Python numbers for the JSON report
+        columns = zip(websites, estimates.tolist(), jitter_values.tolist(), ping_values.tolist(),
+                      loss_values.tolist(), jitter_factors.tolist(), ping_factors.tolist(),
+                      packet_loss_factors.tolist())
         website_populations = {}
-        
-        for website, metrics in connection_metrics.items():
-            # Calculate population based on network metrics and CPU limitations
-            jitter_factor = max(0, 1 - (metrics['jitter'] / 100))  # Normalize jitter
-            ping_factor = max(0, 1 - (metrics['avg_ping'] / 1000))  # Normalize ping
-            packet_loss_factor = 1 - (metrics['packet_loss'] / 100)
-            
-            # CPU-based population estimation
-            cpu_capacity_factor = (
-                AVG_ENTERPRISE_CPU_CORES * 
-                AVG_CPU_THREADS_PER_CORE * 
-                AVG_CPU_CLOCK_SPEED
-            )
-            
-            # Combine factors to estimate concurrent users
-            concurrent_user_estimate = int(
-                AVG_SERVER_PROCESS_CAPACITY * 
-                jitter_factor * 
-                ping_factor * 
-                packet_loss_factor * 
-                cpu_capacity_factor
-            )
-            
+        for website, estimate, jitter, avg_ping, loss, jitter_factor, ping_factor, loss_factor in columns:
             website_populations[website] = {
-                "estimated_concurrent_users": concurrent_user_estimate,
+                "estimated_concurrent_users": estimate,
                 "cpu_capacity_factors": {
                     "cores": AVG_ENTERPRISE_CPU_CORES,
                     "threads_per_core": AVG_CPU_THREADS_PER_CORE,
                     "clock_speed_ghz": AVG_CPU_CLOCK_SPEED
                 },
                 "network_performance": {
-                    "jitter": metrics['jitter'],
-                    "avg_ping": metrics['avg_ping'],
-                    "packet_loss": metrics['packet_loss'],
+                    "jitter": jitter,
+                    "avg_ping": avg_ping,
+                    "packet_loss": loss,
                     "jitter_factor": jitter_factor,
                     "ping_factor": ping_factor,
-                    "packet_loss_factor": packet_loss_factor
+                    "packet_loss_factor": loss_factor
                 }
             }
-            
-            total_estimated_population += concurrent_user_estimate
         
         # Overall population estimation
         population_estimate = {
-            "total_estimated_concurrent_users": total_estimated_population,
+            "total_estimated_concurrent_users": int(estimates.sum()),
             "estimation_method": "cpu_network_metrics",
             "network_stress_indicators": {
-                "avg_jitter": statistics.mean(jitter_values),
-                "max_jitter": max(jitter_values),
-                "avg_ping": statistics.mean(ping_values)
+                "avg_jitter": float(jitter_values.mean()),
+                "max_jitter": float(jitter_values.max()),
+                "avg_ping": float(ping_values.mean())
             },
             "website_populations": website_populations
         }
         
         return population_estimate
     
+    def ping_all_websites(self):
+        """
+        Ping every target website concurrently with the system ping command
+        
+        :return: Dictionary of website -> metrics for the sites that replied
+        """
+        samples = self.ping_all_samples(self.target_websites)
+        
+        # Statistics for every site in one pass
+        with self.instruments.stage("stats"):
+            return self.build_all_metrics(samples, self.ping_count)
+    
+    def ping_all_samples(self, websites, sweep_deadline=None):
+        """
+        Ping websites concurrently with the system ping command
+        
+        :param websites: Websites to ping
+        :param sweep_deadline: Seconds the whole sweep may take; each ping is told the time left,
+                               and sites not finished when it passes are abandoned
+        :return: List of raw samples (see run_ping_samples) for the sites that replied; sites
+                 pinged without any reply are in self.outages
+        """
+        self.outages = {}
+        scheduler = ProbeScheduler(
+            lambda website, deadline_sec: self.run_ping_samples(website, self.ping_count, deadline_sec),
+            workers=self.thread_count,
+            sweep_deadline=sweep_deadline,
+            pass_deadline=True,
+            instruments=self.instruments
+        )
+        samples = [result for _, _, result in scheduler.run(websites) if result]
+        # A ping abandoned at the deadline may still come back empty afterwards; it was cut off
+        dropped = {websites[index] for index in scheduler.dropped}
+        self.outages = {website: sent for website, sent in self.outages.items() if website not in dropped}
+        if scheduler.abandoned:
+            self.instruments.warning(f"Sweep budget of {sweep_deadline}s ran out: "
+                                     f"{scheduler.abandoned} sites abandoned.")
+        return samples
+    
+    def cached_samples(self, websites):
+        """
+        Split websites into those to ping and those with fresh samples in the result cache
+        
+        :param websites: Target websites
+        :return: (websites to ping, list of cached samples)
+        """
+        if self.result_cache is None:
+            return list(websites), []
+        self.result_cache.reset_stats()
+        to_ping, cached = [], []
+        with self.instruments.stage("cache_lookup"):
+            for website in websites:
+                sample = None
+                if not self.bypass_cache:
+                    sample = self.result_cache.get(website, self.resolver.resolve(website), self.cache_key())
+                if sample is not None:
+                    cached.append(sample)
+                else:
+                    to_ping.append(website)
+        if cached:
+            self.instruments.info(f"Reusing fresh cached samples for {len(cached)} sites; "
+                                  f"pinging {len(to_ping)}.")
+        return to_ping, cached
+    
+    def cache_key(self):
+        """Probe parameters that must match for a cached sample to be reused."""
+        return params_key(tool="population", count=self.ping_count, deadline_sec=self.ping_deadline_sec,
+                          backend=self.backend, adaptive=self.adaptive is not None)
+    
+    def log_samples(self, metrics_by_site, websites=None):
+        """
+        Append one run's probe sessions to the sample log (failed sites are logged
+        with no replies so their loss is kept too)
+        
+        :param metrics_by_site: Dictionary of website -> metrics from collect_metrics
+        :param websites: Sites to log (default: every target website)
+        """
+        for website in (self.target_websites if websites is None else websites):
+            metrics = metrics_by_site.get(website)
+            if metrics:
+                self.sample_log.append(website, metrics.get("ip_address"), metrics["ping_times"],
+                                       metrics.get("sent", self.ping_count))
+            else:
+                self.sample_log.append(website, self.resolver.resolve(website), [], self.ping_count)
+        self.sample_log.flush()
+    
+    def collect_metrics(self):
+        """
+        Probe every target website once with the configured backend
+        
+        :return: Dictionary of website -> metrics for the sites that replied
+        """
+        # Resolve every site concurrently before probing
+        self.resolver.reset_stats()
+        with self.instruments.stage("dns_batch"):
+            self.resolver.resolve_many(self.target_websites, workers=self.thread_count)
+        # Sites measured recently with the same parameters are answered from the result cache
+        websites, cached = self.cached_samples(self.target_websites)
+        if self.planner is not None:
+            # Most valuable sites first; the executor starts them in this order. Metrics are kept
+            # per site, so a site listed twice is planned (and pinged) once
+            with self.instruments.stage("plan"):
+                websites = self.planner.plan(list(dict.fromkeys(websites)), budget_sec=self.sweep_budget_sec,
+                                             workers=self.thread_count,
+                                             cost_sec=min(self.ping_count, self.ping_deadline_sec))
+            if self.planner.deferred:
+                self.instruments.info(f"Planner: pinging the {len(websites)} most valuable sites within "
+                                      f"{self.sweep_budget_sec}s; {len(self.planner.deferred)} deferred.")
+        if self.adaptive is not None:
+            self.adaptive.start_sweep(len(websites))
+        if self.pacer is not None:
+            self.pacer.reset_stats()
+        
+        if self.backend == 'async':
+            # Probe every site from one event loop instead of a process per site
+            prober = AsyncProber(resolver=self.resolver, adaptive=self.adaptive, pacer=self.pacer,
+                                 instruments=self.instruments)
+            results = prober.run(websites, count=self.ping_count, sweep_deadline=self.sweep_budget_sec)
+            samples = [result for result in results if result]
+            self.outages = prober.outages
+        else:
+            samples = self.ping_all_samples(websites, sweep_deadline=self.sweep_budget_sec)
+        replied = {sample["website"]: sample for sample in samples}
+        if self.planner is not None:
+            # Only sites actually pinged: one never resolved or cut off by the budget keeps its
+            # staleness instead of counting as a fresh failure
+            for website in websites:
+                if website in replied or website in self.outages:
+                    self.planner.observe(website, replied.get(website))
+        if self.history is not None:
+            # A site pinged without any reply is a total outage: the echoes it was sent go in as all
+            # lost. Sites never pinged (unresolved, or cut off by the budget) are left out
+            for sample in replied.values():
+                self.history.record(sample["website"], sample["ping_times"], sample.get("sent", self.ping_count))
+            for website, sent in self.outages.items():
+                if website not in replied:
+                    self.history.record(website, [], sent)
+            # A cached sample was recorded when it was pinged, unless that was before a restart
+            # (the result cache persists, the history doesn't)
+            for sample in cached:
+                if sample["website"] not in self.history:
+                    self.history.record(sample["website"], sample["ping_times"],
+                                        sample.get("sent", self.ping_count))
+        with self.instruments.stage("stats"):
+            results = self.build_all_metrics(cached + samples, self.ping_count)
+        
+        with self.instruments.stage("save"):
+            if self.sample_log is not None:
+                self.log_samples(results, websites)
+            if self.result_cache is not None:
+                for sample in samples:
+                    self.result_cache.put(sample["website"], sample["ip_address"], self.cache_key(), sample)
+                self.result_cache.flush()
+            if self.planner is not None:
+                self.planner.save()
+            self.resolver.save()
+        
+        dns_stats = self.resolver.stats()
+        self.instruments.info(f"DNS cache: {dns_stats['hits']} hits, {dns_stats['negative_hits']} negative hits, "
+                              f"{dns_stats['misses']} misses, "
+                              f"~{dns_stats['estimated_time_saved_sec']:.2f}s resolver time saved")
+        if self.pacer is not None:
+            pacer_stats = self.pacer.stats()
+            self.instruments.info(f"Pacing: {pacer_stats['delayed']} of {pacer_stats['acquired']} pings queued, "
+                                  f"avg {pacer_stats['avg_queue_delay_ms']:.1f} ms / "
+                                  f"max {pacer_stats['max_queue_delay_ms']:.1f} ms queueing (not included in RTTs)")
+        if self.result_cache is not None:
+            cache_stats = self.result_cache.stats()
+            self.instruments.info(f"Result cache: {cache_stats['hits']} fresh hits, {cache_stats['stale']} stale, "
+                                  f"{cache_stats['misses']} misses, {cache_stats['stored']} results stored")
+        if self.adaptive is not None:
+            adaptive_stats = self.adaptive.stats()
+            self.instruments.info(f"Adaptive probing: {adaptive_stats['echoes']} echoes for "
+                                  f"{adaptive_stats['targets']} sites "
+                                  f"({adaptive_stats['avg_echoes_per_target']:.1f} per site), stop reasons: "
+                                  f"{adaptive_stats['stop_reasons']}")
+        
+        return results
+    
     def estimate_concurrent_users(self):
         """
         Estimate concurrent users based on network metrics
@@ -282,36 +552,22 @@ class ConcurrentUserPopulationEstimator:
         """
         # Reset and prepare
         self.connection_metrics.clear()
-        
-        # Ping websites concurrently
-        with ThreadPoolExecutor(max_workers=self.thread_count) as executor:
-            # Submit ping tasks
-            future_to_website = {
-                executor.submit(self.run_ping, website, self.ping_count): website 
-                for website in self.target_websites
-            }
-            
-            # Collect results
-            for future in as_completed(future_to_website):
-                website = future_to_website[future]
-                try:
-                    result = future.result()
-                    if result:
-                        self.connection_metrics[website] = result
-                except Exception as e:
-                    print(f"Error processing {website}: {e}")
+        self.connection_metrics.update(self.collect_metrics())
         
         # If no connection metrics, use fallback estimation
         if not self.connection_metrics:
             population_estimate = self.fallback_population_estimation()
         else:
             # Calculate concurrent user population
-            population_estimate = self.calculate_user_population(
-                self.connection_metrics
-            )
+            with self.instruments.stage("estimate"):
+                population_estimate = self.calculate_user_population(
+                    self.connection_metrics
+                )
         
         # Save and display results
-        self.save_results(population_estimate)
+        with self.instruments.stage("save"):
+            self.save_results(population_estimate)
+        self.instruments.report()
         
         return population_estimate
     
@@ -329,29 +585,30 @@ class ConcurrentUserPopulationEstimator:
         with open(filename, 'w') as f:
             json.dump(population_estimate, f, indent=4)
         
-        print(f"Results saved to {filename}")
-        print("\n=== Concurrent User Population Estimation for locale ===")
+        self.instruments.info(f"Results saved to {filename}")
+        self.instruments.info("\n=== Concurrent User Population Estimation for locale ===")
         
         # Safe printing with fallback
         total_users = population_estimate.get('total_estimated_concurrent_users', 'N/A')
-        print(f"Total Estimated Concurrent Users: {total_users:,}")
+        self.instruments.info(f"Total Estimated Concurrent Users: {total_users:,}")
         
-        print("Website Breakdown:")
-        website_populations = population_estimate.get('website_populations', {})
-        for website, data in website_populations.items():
-            concurrent_users = data.get('estimated_concurrent_users', 'N/A')
-            print(f"{website}: {concurrent_users:,} concurrent users")
+        if self.instruments.enabled_for("debug"):
+            self.instruments.debug("Website Breakdown:")
+            website_populations = population_estimate.get('website_populations', {})
+            for website, data in website_populations.items():
+                concurrent_users = data.get('estimated_concurrent_users', 'N/A')
+                self.instruments.debug(f"{website}: {concurrent_users:,} concurrent users")
         
         # Print estimation method
-        print(f"Estimation Method: {population_estimate.get('estimation_method', 'Standard')}")
+        self.instruments.info(f"Estimation Method: {population_estimate.get('estimation_method', 'Standard')}")
         
         # Optional: Network stress indicators
         stress_indicators = population_estimate.get('network_stress_indicators', {})
         if stress_indicators.get('avg_jitter') is not None:
-            print("\nNetwork Stress Indicators:")
-            print(f"Average Jitter: {stress_indicators.get('avg_jitter', 'N/A'):.2f}")
-            print(f"Maximum Jitter: {stress_indicators.get('max_jitter', 'N/A'):.2f}")
-            print(f"Average Ping: {stress_indicators.get('avg_ping', 'N/A'):.2f} ms")
+            self.instruments.info("\nNetwork Stress Indicators:")
+            self.instruments.info(f"Average Jitter: {stress_indicators.get('avg_jitter', 'N/A'):.2f}")
+            self.instruments.info(f"Maximum Jitter: {stress_indicators.get('max_jitter', 'N/A'):.2f}")
+            self.instruments.info(f"Average Ping: {stress_indicators.get('avg_ping', 'N/A'):.2f} ms")
 
 def main():
     # Create population estimator
@@ -0,0 +1,366 @@
+import argparse
+import math
+import time
+from collections import deque
+
+import instrumentation
+
+
+class RollingValue:
+    def __init__(self, mode='ewma', half_life_sec=900.0, window=10):
+        """
+        Rolling estimate of one metric, either exponentially decayed or a sliding window
+
+        :param mode: 'ewma' (time-decayed average) or 'window' (mean of the last samples)
+        :param half_life_sec: EWMA half-life; older samples lose half their weight per half-life
+        :param window: Number of samples kept in 'window' mode
+        """
+        if mode not in ('ewma', 'window'):
+            raise ValueError(f"Unknown rolling mode '{mode}'. Choose 'ewma' or 'window'.")
+        self.mode = mode
+        self.half_life_sec = half_life_sec
+        self.samples = deque(maxlen=window)
+        self.value = None
+        self.updated_at = None
+
+    def update(self, sample, timestamp=None):
+        """Fold in a new sample and return the updated estimate."""
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.mode == 'window':
+            self.samples.append(sample)
+            self.value = sum(self.samples) / len(self.samples)
+        elif self.value is None:
+            self.value = sample
+        else:
+            # Irregular cycles are fine: the weight depends on the time since the last sample
+            elapsed = max(0.0, timestamp - self.updated_at)
+            alpha = 1 - 0.5 ** (elapsed / self.half_life_sec) if self.half_life_sec > 0 else 1.0
+            self.value += alpha * (sample - self.value)
+        self.updated_at = timestamp
+        return self.value
+
+
+class HeatmapMonitor:
+    def __init__(self, heatmap, websites, interval_sec=300, ping_count=4, timeout_sec=5, workers=16,
+                 backend='subprocess', mode='ewma', half_life_sec=900.0, window=10, max_age_sec=None,
+                 change_threshold_ms=1.0, plot_type='scatter', output_file="ping_visualization.png"):
+        """
+        Keep a PingHeatmap up to date by probing on a fixed cadence
+
+        Each cycle probes every unique website once, folds the new averages into
+        per-site rolling values, patches only the grid cells whose sites changed and
+        re-renders only when some site moved by more than change_threshold_ms.
+
+        :param heatmap: PingHeatmap instance whose grid and results are maintained
+        :param websites: Websites to monitor (repeats are probed once)
+        :param interval_sec: Seconds between the start of consecutive cycles (0: back to back)
+        :param max_age_sec: Drop sites that haven't answered for this long (None keeps them)
+        :param change_threshold_ms: Minimum change in a site's value that counts as a change
+        """
+        _check_interval(interval_sec)
+        self.heatmap = heatmap
+        self.websites = list(dict.fromkeys(websites))
+        self.interval_sec = interval_sec
+        self.ping_count = ping_count
+        self.timeout_sec = timeout_sec
+        self.workers = workers
+        self.backend = backend
+        self.mode = mode
+        self.half_life_sec = half_life_sec
+        self.window = window
+        self.max_age_sec = max_age_sec
+        self.change_threshold_ms = change_threshold_ms
+        self.plot_type = plot_type
+        self.output_file = output_file
+
+        self.site_values = {}    # website -> RollingValue of avg ping
+        self.rendered = {}       # website -> value at the last render
+        self.site_locations = {} # website -> (lat, lon) from the last placement
+        self.site_cells = {}     # website -> (lat_idx, lon_idx)
+        self.cell_sites = {}     # (lat_idx, lon_idx) -> set of websites
+        self.cycles = 0
+        self.renders = 0
+
+        # Start from an empty grid; after this it is only patched cell by cell
+        self.heatmap.ping_grid.fill(1000.0)
+        self.heatmap.ping_results_list.clear()
+
+    def _cell_for(self, website):
+        cell = self.site_cells.get(website)
+        if cell is None:
+            cell = self._place(website)[0]
+        return cell
+
+    def _place(self, website, ip_address=None):
+        """
+        Put a site in the cell the live sweep would use (heatmap.locate, by IP when possible)
+
+        :return: (cell, previous cell or None); a site whose address moved changes cell
+        """
+        lat, lon, _ = self.heatmap.locate(website, ip_address)
+        lat_idx, lon_idx = self.heatmap.grid_indices([lat], [lon])
+        cell = (int(lat_idx[0]), int(lon_idx[0]))
+        self.site_locations[website] = (lat, lon)
+        previous = self.site_cells.get(website)
+        if previous != cell:
+            if previous is not None:
+                self.cell_sites[previous].discard(website)
+            self.site_cells[website] = cell
+            self.cell_sites.setdefault(cell, set()).add(website)
+        return cell, (previous if previous != cell else None)
+
+    def _refresh_cell(self, cell):
+        """Recompute one grid cell as the minimum of its sites' current values."""
+        values = [self.site_values[site].value for site in self.cell_sites.get(cell, ())
+                  if site in self.site_values]
+        self.heatmap.ping_grid[cell] = min(values) if values else 1000.0
+
+    def _expire_sites(self, now):
+        if self.max_age_sec is None:
+            return []
+        expired = [site for site, rolling in self.site_values.items()
+                   if now - rolling.updated_at > self.max_age_sec]
+        for site in expired:
+            del self.site_values[site]
+        return expired
+
+    def run_cycle(self):
+        """
+        Probe once and update state incrementally
+
+        :return: True if the heatmap was re-rendered
+        """
+        self.cycles += 1
+        now = time.time()
+        self.heatmap.instruments.info(f"\n--- Monitor cycle {self.cycles} ({time.strftime('%Y-%m-%d %H:%M:%S')}) ---")
+
+        dirty_cells = set()
+        results = self.heatmap.probe_websites(self.websites, [self.ping_count] * len(self.websites),
+                                              timeout_sec=self.timeout_sec, workers=self.workers,
+                                              backend=self.backend)
+        for website, result in results:
+            if not result or 'avg_ping' not in result:
+                continue
+            rolling = self.site_values.get(website)
+            if rolling is None:
+                rolling = self.site_values[website] = RollingValue(self.mode, self.half_life_sec, self.window)
+            rolling.update(result['avg_ping'], now)
+            cell, previous = self._place(website, result.get('ip_address'))
+            dirty_cells.add(cell)
+            if previous is not None:
+                dirty_cells.add(previous)
+
+        for website in self._expire_sites(now):
+            dirty_cells.add(self._cell_for(website))
+
+        for cell in dirty_cells:
+            self._refresh_cell(cell)
+        if self.heatmap.sample_log is not None:
+            self.heatmap.sample_log.flush()
+
+        changed = set(self.site_values) != set(self.rendered) or any(
+            abs(rolling.value - self.rendered[site]) > self.change_threshold_ms
+            for site, rolling in self.site_values.items()
+        )
+        if not changed:
+            self.heatmap.instruments.info("No significant change since the last render; skipping render.")
+            return False
+
+        # One row per monitored site, holding its rolling value
+        results_store = self.heatmap.ping_results_list
+        results_store.clear()
+        for website, rolling in self.site_values.items():
+            lat, lon = self.site_locations[website]
+            results_store.append([lat, lon, rolling.value, website])
+
+        self.heatmap.generate_visualization(output_file=self.output_file, plot_type=self.plot_type)
+        self.rendered = {site: rolling.value for site, rolling in self.site_values.items()}
+        self.renders += 1
+        return True
+
+    def run(self, cycles=None):
+        """Run cycles on a fixed cadence until interrupted (or for `cycles` cycles)."""
+        run_cycles(self.run_cycle, self.interval_sec, cycles)
+
+
+class PopulationMonitor:
+    def __init__(self, estimator, interval_sec=300, mode='ewma', half_life_sec=900.0, window=10,
+                 max_age_sec=None, change_threshold=0.01):
+        """
+        Keep a ConcurrentUserPopulationEstimator's metrics rolling across cycles
+
+        Per-site avg ping, jitter and packet loss are kept as rolling values instead
+        of clearing connection_metrics each run. A new estimate is saved only when
+        some site's rolling values moved by more than change_threshold (relative).
+
+        :param estimator: ConcurrentUserPopulationEstimator to drive
+        :param interval_sec: Seconds between the start of consecutive cycles (0: back to back)
+        :param max_age_sec: Drop sites that haven't answered for this long (None keeps them)
+        :param change_threshold: Relative change in any rolling metric that counts as a change
+        """
+        _check_interval(interval_sec)
+        self.estimator = estimator
+        self.interval_sec = interval_sec
+        self.mode = mode
+        self.half_life_sec = half_life_sec
+        self.window = window
+        self.max_age_sec = max_age_sec
+        self.change_threshold = change_threshold
+
+        self.site_metrics = {}   # website -> {metric name: RollingValue}
+        self.latest = {}         # website -> last raw metrics dict
+        self.reported = {}       # website -> metric values at the last saved estimate
+        self.cycles = 0
+        self.last_estimate = None
+
+    def _rolling_metrics(self):
+        """Metrics dicts in the shape calculate_user_population expects."""
+        smoothed = {}
+        for website, rolling in self.site_metrics.items():
+            metrics = dict(self.latest[website])
+            for name, value in rolling.items():
+                metrics[name] = value.value
+            smoothed[website] = metrics
+        return smoothed
+
+    def _changed(self, smoothed):
+        if set(smoothed) != set(self.reported):
+            return True
+        for website, metrics in smoothed.items():
+            for name in ('avg_ping', 'jitter', 'packet_loss'):
+                old, new = self.reported[website][name], metrics[name]
+                if abs(new - old) > self.change_threshold * max(abs(old), 1.0):
+                    return True
+        return False
+
+    def run_cycle(self):
+        """
+        Probe once and update the rolling metrics
+
+        :return: True if a new estimate was calculated and saved
+        """
+        self.cycles += 1
+        now = time.time()
+        self.estimator.instruments.info(f"\n--- Population monitor cycle {self.cycles} "
+                                        f"({time.strftime('%Y-%m-%d %H:%M:%S')}) ---")
+
+        for website, metrics in self.estimator.collect_metrics().items():
+            rolling = self.site_metrics.setdefault(website, {
+                name: RollingValue(self.mode, self.half_life_sec, self.window)
+                for name in ('avg_ping', 'jitter', 'packet_loss')
+            })
+            for name, value in rolling.items():
+                value.update(metrics[name], now)
+            self.latest[website] = metrics
+
+        if self.max_age_sec is not None:
+            for website in [w for w, rolling in self.site_metrics.items()
+                            if now - rolling['avg_ping'].updated_at > self.max_age_sec]:
+                del self.site_metrics[website]
+                del self.latest[website]
+
+        smoothed = self._rolling_metrics()
+        self.estimator.connection_metrics = smoothed
+        if not smoothed or not self._changed(smoothed):
+            self.estimator.instruments.info("No significant change since the last estimate; skipping save.")
+            return False
+
+        self.last_estimate = self.estimator.calculate_user_population(smoothed)
+        self.estimator.save_results(self.last_estimate)
+        self.reported = {website: {name: metrics[name] for name in ('avg_ping', 'jitter', 'packet_loss')}
+                         for website, metrics in smoothed.items()}
+        return True
+
+    def run(self, cycles=None):
+        """Run cycles on a fixed cadence until interrupted (or for `cycles` cycles)."""
+        run_cycles(self.run_cycle, self.interval_sec, cycles)
+
+
+def _check_interval(interval_sec):
+    if interval_sec < 0:
+        raise ValueError(f"interval_sec must be 0 (back-to-back cycles) or positive, got {interval_sec}.")
+
+
+def run_cycles(cycle_fn, interval_sec, cycles=None):
+    """Call cycle_fn every interval_sec seconds (measured start to start; 0 runs cycles back to back)."""
+    _check_interval(interval_sec)
+    completed = 0
+    next_start = time.monotonic()
+    try:
+        while cycles is None or completed < cycles:
+            cycle_fn()
+            completed += 1
+            if cycles is not None and completed >= cycles:
+                break
+            next_start += interval_sec
+            delay = next_start - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif interval_sec == 0:
+                next_start = time.monotonic()
+            else:
+                # Cycle overran the interval; skip the missed slots instead of bursting
+                next_start += math.ceil(-delay / interval_sec) * interval_sec
+    except KeyboardInterrupt:
+        instrumentation.shared.info("\nMonitor stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ping heatmap or population estimator as a resident monitor.")
+    parser.add_argument("tool", choices=["heatmap", "population"])
+    parser.add_argument("--interval", type=float, default=300, help="Seconds between cycles")
+    parser.add_argument("--cycles", type=int, default=None, help="Stop after this many cycles")
+    parser.add_argument("--mode", choices=["ewma", "window"], default="ewma")
+    parser.add_argument("--half-life", type=float, default=900, help="EWMA half-life in seconds")
+    parser.add_argument("--window", type=int, default=10, help="Samples kept in window mode")
+    parser.add_argument("--max-age", type=float, default=None, help="Forget sites silent for this many seconds")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--output", default="ping_monitor.png")
+    parser.add_argument("--log-level", choices=list(instrumentation.LEVELS), default="info",
+                        help="'info' prints cycle summaries only; 'debug' adds per-target progress")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write stage timings here in Prometheus text format after every cycle")
+    parser.add_argument("--result-cache", default=None,
+                        help="SQLite result cache shared with other sweeps; fresh targets are not re-probed")
+    parser.add_argument("--cache-max-age", type=float, default=60,
+                        help="Seconds a cached result counts as fresh")
+    parser.add_argument("--history-window", type=int, default=None,
+                        help="population: estimate from each site's last N echoes (kept in fixed-size ring buffers)")
+    args = parser.parse_args()
+    instrumentation.shared.set_level(args.log_level)
+    result_cache = None
+    if args.result_cache:
+        from result_cache import ResultCache
+        result_cache = ResultCache(args.result_cache, max_age_sec=args.cache_max_age)
+
+    if args.tool == "heatmap":
+        from IP_heatmap import PingHeatmap
+        # A resident process must never block on a plot window
+        heatmap = PingHeatmap(resolution=90, headless=True, result_cache=result_cache)
+        monitor = HeatmapMonitor(heatmap, sorted(heatmap.geo_locations.keys() - {"fallback_default"}),
+                                 interval_sec=args.interval, workers=args.workers, mode=args.mode,
+                                 half_life_sec=args.half_life, window=args.window, max_age_sec=args.max_age,
+                                 output_file=args.output)
+    else:
+        from locale_quantifier import ConcurrentUserPopulationEstimator
+        history = None
+        if args.history_window:
+            from ring_buffer import SiteHistory
+            history = SiteHistory(capacity=args.history_window)
+        estimator = ConcurrentUserPopulationEstimator(ping_count=4, thread_count=args.workers,
+                                                      result_cache=result_cache, history=history,
+                                                      history_window=args.history_window)
+        monitor = PopulationMonitor(estimator, interval_sec=args.interval, mode=args.mode,
+                                    half_life_sec=args.half_life, window=args.window, max_age_sec=args.max_age)
+    if args.metrics_file:
+        run_cycle = monitor.run_cycle
+
+        def run_cycle_and_export():
+            run_cycle()
+            instrumentation.shared.save_prometheus(args.metrics_file)
+        monitor.run_cycle = run_cycle_and_export
+    monitor.run(cycles=args.cycles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import dns_cache
+import instrumentation
+from ping_stream import PingStream
+from probe_scheduler import ProbeScheduler
+
+# Wire protocol between the orchestrator and remote vantage servers: one JSON object
+# per line, UTF-8, over a TCP stream.
+#
+#   request   {"op": "sweep", "targets": [...], "count": 4, "timeout_sec": 5}
+#   replies   {"op": "sample", "sample": {"website", "ip_address", "ping_times", "sent"}}  per target
+#             {"op": "done", "vantage": "<name>", "samples": <n>}
+#             {"op": "error", "message": "..."}                                           instead of done
+PROTOCOL_ENCODING = 'utf-8'
+
+
+def shard_targets(targets, shards):
+    """Split targets into up to `shards` interleaved, non-empty slices."""
+    shards = max(1, min(int(shards), len(targets)))
+    return [targets[i::shards] for i in range(shards)] if targets else []
+
+
+def chunk_targets(targets, chunk_size):
+    return [targets[i:i + chunk_size] for i in range(0, len(targets), chunk_size)]
+
+
+def probe_target(website, count, timeout_sec, source, resolver):
+    """Ping one website and return its raw sample (an empty one if nothing replied)."""
+    ip_address = resolver.resolve(website)
+    if ip_address is None:
+        return {"website": website, "ip_address": None, "ping_times": [], "sent": 0}
+    stream = PingStream(ip_address, count=count, timeout_sec=timeout_sec, source=source)
+    try:
+        stream.run()
+    except OSError as e:
+        instrumentation.shared.warning(f"  Error pinging {website} ({ip_address}): {e}")
+        return {"website": website, "ip_address": ip_address, "ping_times": [], "sent": 0}
+    return {"website": website, "ip_address": ip_address, "ping_times": stream.ping_times, "sent": stream.sent}
+
+
+def probe_shard(targets, count=4, timeout_sec=5, source=None, workers=8):
+    """
+    Probe a shard of targets inside a worker process
+
+    Runs at module level so ProcessPoolExecutor can pickle it. Each process resolves
+    through its own copy of the shared DNS cache and fans pings out over a thread pool.
+
+    :return: List of samples, one per target, in target order
+    """
+    resolver = dns_cache.shared_cache
+    resolver.resolve_many(targets, workers=workers)
+    scheduler = ProbeScheduler(lambda website: probe_target(website, count, timeout_sec, source, resolver),
+                               workers=workers)
+    return [sample or {"website": website, "ip_address": None, "ping_times": [], "sent": 0}
+            for _, website, sample in scheduler.run_ordered(targets)]
+
+
+class LocalVantage:
+    def __init__(self, name, source=None, processes=None, workers_per_process=8, chunk_size=256):
+        """
+        A vantage point on this machine: shards targets over a pool of worker processes
+
+        :param name: Label attached to every sample from this vantage
+        :param source: Source interface or address passed to ping (-I on Linux)
+        :param processes: Worker processes (default: CPU count)
+        :param workers_per_process: Concurrent pings inside each process
+        :param chunk_size: Targets per task; smaller chunks stream results back sooner
+        """
+        self.name = name
+        self.source = source
+        self.processes = processes or os.cpu_count() or 1
+        self.workers_per_process = workers_per_process
+        self.chunk_size = max(1, int(chunk_size))
+
+    def sweep(self, targets, count=4, timeout_sec=5):
+        """Yield one sample per target, chunk by chunk as worker processes finish."""
+        targets = list(targets)
+        if not targets:
+            return
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            futures = [executor.submit(probe_shard, chunk, count, timeout_sec, self.source,
+                                       self.workers_per_process)
+                       for chunk in chunk_targets(targets, self.chunk_size)]
+            for future in as_completed(futures):
+                yield from future.result()
+
+
+class RemoteVantage:
+    def __init__(self, name, host, port, connect_timeout_sec=10, idle_timeout_sec=None):
+        """
+        A vantage point served by VantageServer on another host (or on loopback)
+
+        :param name: Label attached to every sample from this vantage
+        :param idle_timeout_sec: Give up if the server sends nothing for this long
+        """
+        self.name = name
+        self.host = host
+        self.port = port
+        self.connect_timeout_sec = connect_timeout_sec
+        self.idle_timeout_sec = idle_timeout_sec
+
+    def sweep(self, targets, count=4, timeout_sec=5):
+        """Send one sweep request and yield samples as the server streams them back."""
+        request = {"op": "sweep", "targets": list(targets), "count": count, "timeout_sec": timeout_sec}
+        with socket.create_connection((self.host, self.port), timeout=self.connect_timeout_sec) as sock:
+            sock.settimeout(self.idle_timeout_sec)
+            sock.sendall((json.dumps(request) + "\n").encode(PROTOCOL_ENCODING))
+            with sock.makefile('r', encoding=PROTOCOL_ENCODING) as lines:
+                for line in lines:
+                    message = json.loads(line)
+                    if message["op"] == "sample":
+                        yield message["sample"]
+                    elif message["op"] == "done":
+                        return
+                    elif message["op"] == "error":
+                        raise RuntimeError(f"Vantage {self.name} failed: {message['message']}")
+        raise ConnectionError(f"Vantage {self.name} closed the connection before finishing the sweep")
+
+
+class _SweepHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        vantage = self.server.vantage
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("op") != "sweep":
+                    raise ValueError(f"unknown op {request.get('op')!r}")
+                sent = 0
+                for sample in vantage.sweep(request["targets"], request.get("count", 4),
+                                            request.get("timeout_sec", 5)):
+                    self._send({"op": "sample", "sample": sample})
+                    sent += 1
+                self._send({"op": "done", "vantage": vantage.name, "samples": sent})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                self._send({"op": "error", "message": str(e)})
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode(PROTOCOL_ENCODING))
+        self.wfile.flush()
+
+
+class VantageServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, vantage, host='127.0.0.1', port=0):
+        """
+        Serve sweep requests for a LocalVantage over the JSON-lines protocol
+
+        Bind to 127.0.0.1 with port 0 to get a loopback stand-in for a remote host
+        (the chosen port is in server_address[1]).
+        """
+        super().__init__((host, port), _SweepHandler)
+        self.vantage = vantage
+
+    def start(self):
+        """Serve from a background thread and return the bound port."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+
+class SweepOrchestrator:
+    def __init__(self, vantages, mode='replicate', instruments=None):
+        """
+        Run one sweep across several vantage points and merge their sample streams
+
+        :param vantages: LocalVantage/RemoteVantage objects (names must be unique)
+        :param mode: 'replicate' probes every target from every vantage (one view per
+                     vantage); 'shard' splits the targets across vantages (scale-out)
+        :param instruments: Instrumentation for leveled logging (default: the shared one)
+        """
+        names = [vantage.name for vantage in vantages]
+        if len(set(names)) != len(names):
+            raise ValueError("Vantage names must be unique.")
+        if mode not in ('replicate', 'shard'):
+            raise ValueError(f"Unknown mode '{mode}'. Choose 'replicate' or 'shard'.")
+        self.vantages = list(vantages)
+        self.mode = mode
+        self.instruments = instruments or instrumentation.shared
+
+        # vantage name -> list of samples from the last sweep
+        self.samples_by_vantage = {}
+        self.errors = {}
+        self.elapsed_sec = None
+
+    def run(self, targets, count=4, timeout_sec=5):
+        """
+        Sweep all vantages concurrently, yielding (vantage, sample) as samples arrive
+
+        Every sample is also kept in samples_by_vantage. A vantage that fails is
+        recorded in errors and the others carry on.
+        """
+        targets = list(targets)
+        if self.mode == 'shard':
+            assignments = zip(self.vantages, shard_targets(targets, len(self.vantages)))
+        else:
+            assignments = ((vantage, targets) for vantage in self.vantages)
+        self.samples_by_vantage = {vantage.name: [] for vantage in self.vantages}
+        self.errors = {}
+        merged = queue.Queue()
+        start = time.monotonic()
+
+        def drain(vantage, vantage_targets):
+            # One thread per vantage; the queue interleaves their streams
+            try:
+                for sample in vantage.sweep(vantage_targets, count, timeout_sec):
+                    merged.put((vantage.name, sample))
+            except Exception as e:
+                self.errors[vantage.name] = str(e)
+                self.instruments.error(f"Vantage {vantage.name} failed: {e}")
+            finally:
+                merged.put((vantage.name, None))
+
+        threads = [threading.Thread(target=drain, args=assignment, daemon=True) for assignment in assignments]
+        for thread in threads:
+            thread.start()
+        running = len(threads)
+        while running:
+            name, sample = merged.get()
+            if sample is None:
+                running -= 1
+                continue
+            sample["vantage"] = name
+            self.samples_by_vantage[name].append(sample)
+            yield name, sample
+        self.elapsed_sec = time.monotonic() - start
+
+    def sweep(self, targets, count=4, timeout_sec=5):
+        """Run the whole sweep and return samples_by_vantage."""
+        for _ in self.run(targets, count, timeout_sec):
+            pass
+        return self.samples_by_vantage
+
+    def samples(self, vantage=None):
+        """
+        Samples of one vantage, or the merged view of all of them
+
+        In the merged view each website keeps the sample with the lowest average RTT,
+        i.e. the one from its nearest vantage point.
+        """
+        if vantage is not None:
+            return [sample for sample in self.samples_by_vantage.get(vantage, []) if sample["ping_times"]]
+        best = {}
+        for samples in self.samples_by_vantage.values():
+            for sample in samples:
+                if not sample["ping_times"]:
+                    continue
+                current = best.get(sample["website"])
+                if current is None or np.mean(sample["ping_times"]) < np.mean(current["ping_times"]):
+                    best[sample["website"]] = sample
+        return list(best.values())
+
+    def fill_heatmap(self, heatmap, vantage=None):
+        """
+        Add one vantage's samples (or the merged view) to a PingHeatmap's grid and results
+
+        :return: Number of samples added
+        """
+        samples = self.samples(vantage)
+        if not samples:
+            return 0
+        locations = [heatmap.locate(sample["website"], sample.get("ip_address")) for sample in samples]
+        lats = np.array([loc[0] for loc in locations], dtype=np.float32)
+        lons = np.array([loc[1] for loc in locations], dtype=np.float32)
+        pings = np.array([np.mean(sample["ping_times"]) for sample in samples], dtype=np.float32)
+        heatmap.add_ping_points_to_grid(lats, lons, pings)
+        site_ids = [heatmap.ping_results_list.intern(sample["website"]) for sample in samples]
+        heatmap.ping_results_list.extend_arrays(lats, lons, pings, site_ids)
+        return len(samples)
+
+    def population_estimate(self, estimator, vantage=None):
+        """
+        Population estimate from one vantage's samples (or the merged view), tagged by vantage
+
+        :param estimator: ConcurrentUserPopulationEstimator used for metrics and estimation
+        :return: Estimate dictionary with a "vantage" key, or None if no site replied
+        """
+        samples = self.samples(vantage)
+        metrics = estimator.build_all_metrics(samples, [sample["sent"] for sample in samples])
+        if not metrics:
+            return None
+        estimate = estimator.calculate_user_population(metrics)
+        estimate["vantage"] = vantage or "all"
+        return estimate
+
+    def population_by_vantage(self, estimator):
+        """Population estimates for every vantage with replies, plus the merged 'all' view."""
+        estimates = {name: self.population_estimate(estimator, name) for name in self.samples_by_vantage}
+        estimates["all"] = self.population_estimate(estimator)
+        return {name: estimate for name, estimate in estimates.items() if estimate is not None}
+
+
+def parse_vantage(spec, processes, workers):
+    """NAME, NAME@SOURCE (local) or NAME=HOST:PORT (remote) -> vantage object."""
+    if '=' in spec:
+        name, address = spec.split('=', 1)
+        host, port = address.rsplit(':', 1)
+        return RemoteVantage(name, host, int(port))
+    name, _, source = spec.partition('@')
+    return LocalVantage(name, source=source or None, processes=processes, workers_per_process=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ping sweeps across several processes and vantage points.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve = subcommands.add_parser("serve", help="Serve sweeps for this machine over TCP")
+    serve.add_argument("--name", default=socket.gethostname())
+    serve.add_argument("--source", default=None, help="Source interface or address for ping")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9031)
+    serve.add_argument("--processes", type=int, default=None)
+    serve.add_argument("--workers", type=int, default=8, help="Concurrent pings per process")
+
+    sweep = subcommands.add_parser("sweep", help="Sweep targets from one or more vantages")
+    sweep.add_argument("targets_file", help="File with one website per line")
+    sweep.add_argument("--vantage", action="append", default=None,
+                       help="NAME, NAME@SOURCE (local) or NAME=HOST:PORT (remote); repeatable")
+    sweep.add_argument("--mode", choices=["replicate", "shard"], default="replicate")
+    sweep.add_argument("--count", type=int, default=4)
+    sweep.add_argument("--timeout", type=float, default=5)
+    sweep.add_argument("--processes", type=int, default=None)
+    sweep.add_argument("--workers", type=int, default=8, help="Concurrent pings per process")
+    sweep.add_argument("--output", default="ping_vantages.png")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        vantage = LocalVantage(args.name, source=args.source, processes=args.processes,
+                               workers_per_process=args.workers)
+        server = VantageServer(vantage, args.host, args.port)
+        instrumentation.shared.info(f"Serving vantage {args.name} on {args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            instrumentation.shared.info("\nServer stopped.")
+        return
+
+    with open(args.targets_file, encoding='utf-8') as f:
+        targets = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    vantages = [parse_vantage(spec, args.processes, args.workers) for spec in (args.vantage or ["local"])]
+    orchestrator = SweepOrchestrator(vantages, mode=args.mode)
+    orchestrator.sweep(targets, count=args.count, timeout_sec=args.timeout)
+    for name, samples in orchestrator.samples_by_vantage.items():
+        replied = sum(1 for sample in samples if sample["ping_times"])
+        instrumentation.shared.info(f"Vantage {name}: {replied}/{len(samples)} targets replied")
+    instrumentation.shared.info(f"Sweep of {len(targets)} targets took {orchestrator.elapsed_sec:.1f}s")
+
+    from IP_heatmap import PingHeatmap
+    heatmap = PingHeatmap(resolution=90, headless=True)
+    for name in orchestrator.samples_by_vantage:
+        heatmap.ping_grid.fill(1000.0)
+        heatmap.ping_results_list.clear()
+        orchestrator.fill_heatmap(heatmap, name)
+        root, ext = os.path.splitext(args.output)
+        heatmap.generate_visualization(output_file=f"{root}-{name}{ext}")
+    if len(orchestrator.samples_by_vantage) > 1:
+        heatmap.ping_grid.fill(1000.0)
+        heatmap.ping_results_list.clear()
+        orchestrator.fill_heatmap(heatmap)
+        heatmap.generate_visualization(output_file=args.output)
+
+
+if __name__ == "__main__":
+    main()
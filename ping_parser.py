@@ -0,0 +1,243 @@
+import re
+
+# Every per-echo reply line carries its RTT as "=N ms" or "<N ms" with nothing between the
+# sign and the number, whatever the language; summary lines put a space after "=":
+#   Linux iputils  64 bytes from 1.2.3.4: icmp_seq=1 ttl=57 time=12.3 ms   (also "(DUP!)")
+#   BusyBox        64 bytes from 1.2.3.4: seq=0 ttl=57 time=12.345 ms
+#   macOS          64 bytes from 1.2.3.4: icmp_seq=0 ttl=57 time=12.345 ms
+#   Windows        Reply from 1.2.3.4: bytes=32 time=12ms TTL=57   /  time<1ms
+#   localized      Antwort von ...: Bytes=32 Zeit=12ms TTL=57  /  Réponse de ... : octets=32 temps=12 ms TTL=57
+REPLY_RE = re.compile(r"([=<])(\d+(?:[.,]\d+)?) ?ms")
+SEQ_RE = re.compile(r"seq=(\d+)")
+# The iputils/BusyBox/macOS reply in one search; the literal "seq=" prefix makes it cheap to reject
+UNIX_REPLY_RE = re.compile(r"seq=(\d+) ttl=(\d+) time=(\d+(?:\.\d+)?) ms")
+TTL_RE = re.compile(r"ttl=(\d+)", re.IGNORECASE)
+
+# rtt min/avg/max/mdev = 1.0/2.0/3.0/0.5 ms (Linux), round-trip min/avg/max/stddev = ... (macOS),
+# round-trip min/avg/max = 1.0/2.0/3.0 ms (BusyBox: no deviation)
+UNIX_STATS_RE = re.compile(
+    r"(?:rtt|round-trip)\s+min/avg/max(?:/\w+)?\s*=\s*"
+    r"(\d+(?:[.,]\d+)?)/(\d+(?:[.,]\d+)?)/(\d+(?:[.,]\d+)?)(?:/(\d+(?:[.,]\d+)?))?")
+
+# 4 packets transmitted, 3 received, +1 duplicates, 25% packet loss, time 3004ms (Linux),
+# 4 packets transmitted, 3 packets received, 25.0% packet loss (macOS, BusyBox)
+UNIX_PACKETS_RE = re.compile(
+    r"(\d+)\s+packets transmitted,\s*(\d+)\s+(?:packets\s+)?received,"
+    r"(?:\s*\+(\d+)\s+duplicates,)?(?:\s*\+\d+\s+errors,)?\s*(\d+(?:[.,]\d+)?)%")
+
+# Windows in any language keeps the order and the "= N" shape:
+#   Packets: Sent = 4, Received = 3, Lost = 1 (25% loss),   (German puts the percentage on the next line)
+#   Minimum = 1ms, Maximum = 3ms, Average = 2ms   (Mittelwert, Moyenne, Media, ...)
+WINDOWS_PACKETS_RE = re.compile(r"=\s*(\d+),\s*[^=,]+=\s*(\d+),\s*[^=,]+=\s*(\d+)")
+WINDOWS_STATS_RE = re.compile(r"=\s*(\d+)\s*ms,\s*[^=,]+=\s*(\d+)\s*ms,\s*[^=,]+=\s*(\d+)\s*ms", re.IGNORECASE)
+
+# Request timeout for icmp_seq 3 (macOS), Request timed out. (Windows, English/German/French)
+TIMEOUT_RE = re.compile(r"^(?:Request time(?:d )?out|Zeitüberschreitung der Anforderung"
+                        r"|Délai d.attente de la demande)", re.IGNORECASE)
+TIMEOUT_SEQ_RE = re.compile(r"icmp_seq (\d+)")
+
+# Sub-millisecond Windows replies ("time<1ms") count as half a millisecond
+SUB_MS_RTT = 0.5
+
+
+def _number(text):
+    # Some locales print a decimal comma (time=12,3 ms)
+    return float(text.replace(',', '.') if ',' in text else text)
+
+
+def _int_after(line, key):
+    """The number right after `key` when it is a whole space-delimited token, else None."""
+    token = line.partition(key)[2].partition(" ")[0].rstrip()
+    return int(token) if token.isdecimal() else None
+
+
+def parse_reply(line, _search=REPLY_RE.search):
+    """
+    (rtt_ms, seq, ttl) from one echo reply line, or None for any other line
+
+    seq and ttl are None when the format doesn't print them (Windows has no sequence numbers).
+    """
+    # Substring checks settle the common "icmp_seq=N ttl=N time=N ms" and "time<1ms" spellings.
+    # REPLY_RE only sees localized or unusual lines, never one without "ms" or without an "="
+    # or "<" followed by a digit to anchor on (summaries write "= N")
+    if "time=" in line:
+        head, _, tail = line.partition("time=")
+        value, sep, _ = tail.partition("ms")
+        if sep and value[:1].isdigit():
+            try:
+                rtt = float(value)
+            except ValueError:
+                rtt = None      # e.g. a decimal comma
+            if rtt is not None:
+                # Unix prints "seq=N ttl=N " right before the RTT
+                seq, _, ttl = head.partition("seq=")[2].partition(" ttl=")
+                ttl = ttl.rstrip()
+                if seq.isdecimal() and ttl.isdecimal():
+                    return rtt, int(seq), int(ttl)
+                return rtt, _reply_seq(line), _reply_ttl(line)
+    elif "time<1ms" in line:
+        return SUB_MS_RTT, _reply_seq(line), _reply_ttl(line)
+    elif "ms" not in line or ("<" not in line and "=" not in line.replace("= ", "")):
+        return None
+    match = _search(line)
+    if match is None:
+        return None
+    rtt = SUB_MS_RTT if match.group(1) == '<' else _number(match.group(2))
+    return rtt, _reply_seq(line), _reply_ttl(line)
+
+
+def parse_reply_line(line):
+    """RTT in ms from one echo reply line, or None for any other line."""
+    reply = parse_reply(line)
+    return reply[0] if reply else None
+
+
+def _reply_seq(line):
+    if "seq=" not in line:
+        return None
+    seq = _int_after(line, "seq=")
+    if seq is None:
+        match = SEQ_RE.search(line)
+        seq = int(match.group(1)) if match else None
+    return seq
+
+
+def _reply_ttl(line):
+    # Unix prints "ttl=", Windows "TTL="; the case-insensitive pattern only handles anything else
+    key = "ttl=" if "ttl=" in line else "TTL=" if "TTL=" in line else None
+    ttl = _int_after(line, key) if key else None
+    if ttl is None:
+        match = TTL_RE.search(line)
+        ttl = int(match.group(1)) if match else None
+    return ttl
+
+
+def parse_summary(line):
+    """
+    Fields from one ping summary line, or None for any other line
+
+    :return: {"min_ms", "avg_ms", "max_ms", "mdev_ms"} for an RTT summary (mdev_ms is None
+             on BusyBox and Windows) or {"transmitted", "received", "duplicates", "loss_pct"}
+             for a packet count summary
+    """
+    # Cheap substring checks pick the one pattern worth trying
+    if "/" in line:
+        match = UNIX_STATS_RE.search(line)
+        if match:
+            low, avg, high, mdev = match.groups()
+            return {"min_ms": _number(low), "avg_ms": _number(avg), "max_ms": _number(high),
+                    "mdev_ms": _number(mdev) if mdev else None}
+    if "transmitted" in line:
+        match = UNIX_PACKETS_RE.search(line)
+        if match:
+            transmitted, received, duplicates, loss = match.groups()
+            return {"transmitted": int(transmitted), "received": int(received),
+                    "duplicates": int(duplicates) if duplicates else 0, "loss_pct": _number(loss)}
+    elif "=" in line:
+        match = WINDOWS_STATS_RE.search(line) if "ms" in line else WINDOWS_PACKETS_RE.search(line)
+        if match and match.re is WINDOWS_STATS_RE:
+            low, high, avg = match.groups()
+            return {"min_ms": float(low), "avg_ms": float(avg), "max_ms": float(high), "mdev_ms": None}
+        if match:
+            transmitted, received, _ = match.groups()
+            transmitted, received = int(transmitted), int(received)
+            return {"transmitted": transmitted, "received": received, "duplicates": 0,
+                    "loss_pct": (transmitted - received) * 100.0 / transmitted if transmitted else 0.0}
+    return None
+
+
+def parse_summary_line(line):
+    """Average RTT in ms from a ping summary line, or None for any other line."""
+    summary = parse_summary(line)
+    return summary.get("avg_ms") if summary else None
+
+
+class PingOutputParser:
+    def __init__(self):
+        """
+        Single-pass parser for the output of one ping run, fed a line at a time
+
+        Each line is read once, as it arrives: a reply gives its RTT, seq and TTL (see
+        parse_reply), any other line is counted if it is a timeout and tried as a summary
+        until both the packet count and the RTT summary have been seen.
+        Duplicate replies ("(DUP!)") are counted but not added to ping_times.
+        """
+        self.ping_times = []
+        self.seqs = []             # sequence number of each reply (None where the format prints none)
+        self.ttls = []             # TTL of each reply (None where the format prints none)
+        self.timeouts = 0
+        self.duplicates = 0
+        self.summary = {}          # fields from ping's summary lines (see parse_summary)
+        self.other_lines = []      # summary, errors and anything else that isn't a reply
+        self._summary_done = False
+
+    def feed(self, line):
+        """Parse one line; returns its RTT if it was an echo reply, else None."""
+        reply = parse_reply(line)
+        if reply is not None:
+            if "(DUP!)" in line:
+                self.duplicates += 1
+                return None
+            rtt, seq, ttl = reply
+            self.ping_times.append(rtt)
+            self.seqs.append(seq)
+            self.ttls.append(ttl)
+            return rtt
+        line = line.strip()
+        if not line:
+            return None
+        if line[0] in "RZD" and TIMEOUT_RE.match(line):
+            self.timeouts += 1
+        elif not self._summary_done:
+            fields = parse_summary(line)
+            if fields:
+                self.summary.update(fields)
+                self._summary_done = "transmitted" in self.summary and "avg_ms" in self.summary
+        self.other_lines.append(line)
+        return None
+
+    def feed_all(self, lines):
+        for line in lines:
+            self.feed(line)
+        return self
+
+    @property
+    def transmitted(self):
+        return self.summary.get("transmitted")
+
+    @property
+    def loss_pct(self):
+        """Loss from ping's own summary, else from the replies seen (None if neither is known)."""
+        if "loss_pct" in self.summary:
+            return self.summary["loss_pct"]
+        sent = len(self.ping_times) + self.timeouts
+        return self.timeouts * 100.0 / sent if sent else None
+
+    @property
+    def avg_ms(self):
+        """Average RTT: from the replies, else from the summary line (None if neither)."""
+        if self.ping_times:
+            return sum(self.ping_times) / len(self.ping_times)
+        return self.summary.get("avg_ms")
+
+    def result(self):
+        return {
+            "ping_times": list(self.ping_times),
+            "seqs": list(self.seqs),
+            "ttls": list(self.ttls),
+            "timeouts": self.timeouts,
+            "duplicates": self.duplicates,
+            "transmitted": self.transmitted,
+            "received": self.summary.get("received", len(self.ping_times)),
+            "loss_pct": self.loss_pct,
+            "avg_ms": self.avg_ms,
+            "min_ms": self.summary.get("min_ms"),
+            "max_ms": self.summary.get("max_ms"),
+            "mdev_ms": self.summary.get("mdev_ms"),
+        }
+
+
+def parse_output(output):
+    """Parse a complete ping output (string or iterable of lines) in one pass; see PingOutputParser.result."""
+    lines = output.splitlines() if isinstance(output, str) else output
+    return PingOutputParser().feed_all(lines).result()
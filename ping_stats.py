@@ -0,0 +1,125 @@
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def pad_samples(ping_times_lists, width=None):
+    """
+    Pack ragged per-site RTT lists into one NaN-padded float64 array
+
+    :param ping_times_lists: Sequence of per-site lists of RTTs in ms
+    :param width: Number of columns (default: the longest list)
+    :return: Array of shape (sites, width); row i holds site i's samples then NaN
+    """
+    lengths = np.fromiter((len(times) for times in ping_times_lists), dtype=np.intp,
+                          count=len(ping_times_lists))
+    width = int(lengths.max(initial=0)) if width is None else width
+    samples = np.full((len(lengths), width), np.nan)
+    if width and len(lengths):
+        flat = np.fromiter((t for times in ping_times_lists for t in times[:width]), dtype=np.float64)
+        mask = np.arange(width) < np.minimum(lengths, width)[:, None]
+        samples[mask] = flat
+    return samples
+
+
+def _row_percentiles(sorted_samples, received, percentiles):
+    """Linear-interpolated percentiles per row of a row-sorted array (NaNs at the end)."""
+    if sorted_samples.shape[1] == 0:
+        return {q: np.full(len(received), np.nan) for q in percentiles}
+    rows = np.arange(len(received))
+    last = np.maximum(received - 1, 0)
+    out = {}
+    for q in percentiles:
+        pos = last * (q / 100.0)
+        low = np.floor(pos).astype(np.intp)
+        high = np.minimum(low + 1, last)
+        frac = pos - low
+        value = sorted_samples[rows, low] * (1 - frac) + sorted_samples[rows, high] * frac
+        out[q] = np.where(received > 0, value, np.nan)
+    return out
+
+
+def compute_metrics(samples, sent, percentiles=PERCENTILES):
+    """
+    Every per-site statistic for a padded sample array in one vectorized pass
+
+    Rows are sites, columns are replies in arrival order, NaN marks padding.
+    Sites with no replies get NaN statistics and 100% loss.
+
+    :param samples: Array from pad_samples
+    :param sent: Echo requests sent per site (scalar or per-row array)
+    :return: Dict of per-site arrays: received, avg_ping, median_ping, min_ping,
+             max_ping, ping_variance (sample variance, 0 below two replies),
+             jitter (mean absolute difference of consecutive RTTs), rfc3550_jitter
+             (RFC 3550 interarrival jitter estimator), packet_loss (%) and
+             p<q>_ping for each requested percentile
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    valid = ~np.isnan(samples)
+    received = valid.sum(axis=1)
+    has_data = received > 0
+    safe_count = np.maximum(received, 1)
+    sent = np.broadcast_to(np.asarray(sent, dtype=np.float64), received.shape)
+
+    filled = np.where(valid, samples, 0.0)
+    mean = filled.sum(axis=1) / safe_count
+    deviations = np.where(valid, samples - mean[:, None], 0.0)
+    variance = np.where(received > 1, (deviations ** 2).sum(axis=1) / np.maximum(received - 1, 1), 0.0)
+
+    # NaN sorts last, so each row's replies are its first `received` entries
+    sorted_samples = np.sort(samples, axis=1)
+    rows = np.arange(len(received))
+    minimum = sorted_samples[:, 0] if samples.shape[1] else np.full(len(received), np.nan)
+    maximum = sorted_samples[rows, np.maximum(received - 1, 0)] if samples.shape[1] else minimum
+    quantiles = _row_percentiles(sorted_samples, received, sorted(set(percentiles) | {50}))
+
+    # Jitter over consecutive replies: padding is trailing, so valid pairs are a prefix
+    diffs = np.abs(np.diff(samples, axis=1))
+    pair_valid = ~np.isnan(diffs)
+    pairs = pair_valid.sum(axis=1)
+    jitter = np.where(pairs > 0, np.where(pair_valid, diffs, 0.0).sum(axis=1) / np.maximum(pairs, 1), 0.0)
+
+    # RFC 3550 section 6.4.1: J += (|D| - J) / 16, with D the change in RTT between
+    # consecutive replies; the recursion runs across columns, vectorized over sites
+    rfc_jitter = np.zeros(len(received))
+    for column in range(diffs.shape[1]):
+        step = pair_valid[:, column]
+        rfc_jitter[step] += (diffs[step, column] - rfc_jitter[step]) / 16.0
+
+    metrics = {
+        "received": received,
+        "avg_ping": np.where(has_data, mean, np.nan),
+        "median_ping": quantiles[50],
+        "min_ping": np.where(has_data, minimum, np.nan),
+        "max_ping": np.where(has_data, maximum, np.nan),
+        "ping_variance": np.where(has_data, variance, np.nan),
+        "jitter": np.where(has_data, jitter, np.nan),
+        "rfc3550_jitter": np.where(has_data, rfc_jitter, np.nan),
+        "packet_loss": np.where(sent > 0, (sent - received) / np.maximum(sent, 1) * 100, 0.0),
+    }
+    for q in percentiles:
+        metrics[f"p{q}_ping"] = quantiles[q]
+    return metrics
+
+
+def metrics_by_site(websites, ping_times_lists, sent):
+    """
+    Per-site metrics dictionaries (the shape build_metrics returns) for many sites at once
+
+    Sites without replies are left out, as the probing code does.
+
+    :param websites: Site names, parallel to ping_times_lists
+    :param sent: Echo requests sent per site (scalar or list)
+    :return: Dictionary of website -> metrics dictionary
+    """
+    arrays = compute_metrics(pad_samples(ping_times_lists), sent)
+    columns = {name: values.tolist() for name, values in arrays.items() if name != "received"}
+    results = {}
+    for i, (website, ping_times) in enumerate(zip(websites, ping_times_lists)):
+        if not ping_times:
+            continue
+        metrics = {"website": website, "ping_times": ping_times}
+        for name, values in columns.items():
+            metrics[name] = values[i]
+        results[website] = metrics
+    return results
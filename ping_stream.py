@@ -0,0 +1,276 @@
+import asyncio
+import platform
+import queue
+import subprocess
+import threading
+import time
+
+import instrumentation
+from ping_parser import TIMEOUT_SEQ_RE, PingOutputParser
+
+# ping's default spacing between echo requests
+DEFAULT_INTERVAL_SEC = 1.0
+
+
+def build_ping_command(target, count=4, timeout_sec=5, system=None, source=None):
+    """
+    System ping command that prints one line per echo reply
+
+    :param timeout_sec: Per-reply wait; Windows and macOS take it in milliseconds
+    :param system: platform.system() value to build for (default: this machine)
+    :param source: Source interface or address to send from (Linux -I takes either;
+                   Windows and macOS -S need an address)
+    """
+    system = system or platform.system()
+    if system == "Windows":
+        # -n count, -w per-reply timeout in milliseconds
+        cmd = ["ping", "-n", str(count), "-w", str(int(timeout_sec * 1000))]
+        source_flag = "-S"
+    elif system == "Linux":
+        # -c count, -W per-reply timeout in seconds
+        cmd = ["ping", "-c", str(count), "-W", str(timeout_sec)]
+        source_flag = "-I"
+    else:
+        # macOS: -W is in milliseconds
+        cmd = ["ping", "-c", str(count), "-W", str(int(timeout_sec * 1000))]
+        source_flag = "-S"
+    if source:
+        cmd += [source_flag, source]
+    return cmd + [target]
+
+
+class PingStream:
+    def __init__(self, target, count=4, timeout_sec=5, deadline_sec=None, interval_sec=DEFAULT_INTERVAL_SEC,
+                 system=None, source=None, instruments=None, report_losses=False):
+        """
+        Run the system ping and hand out each echo's RTT as its reply line arrives
+
+        Iterate (or `async for`) to receive RTTs in ms one by one. The whole run is
+        bounded by deadline_sec; when it expires the ping process is killed but every
+        reply seen so far is kept in ping_times.
+
+        With report_losses, a lost echo is yielded as None once it is known to be lost:
+        from a timeout line (Windows, macOS), from a gap in icmp_seq when a later reply
+        arrives, when its reply is overdue (interval_sec x echo + timeout_sec after the
+        start), or from ping's transmitted count when it exits. A reply that arrives after
+        its echo was reported lost is kept in ping_times but not yielded. Consumers that
+        count echoes (adaptive sessions) then see each echo actually sent exactly once.
+
+        :param target: IP address (or hostname) to ping
+        :param count: Echo requests to send
+        :param timeout_sec: Per-reply wait passed to ping
+        :param deadline_sec: Limit on the whole run (default: timeout_sec * count + 5)
+        :param interval_sec: ping's send interval, used to estimate echoes sent on a timeout
+        :param source: Source interface or address to ping from (see build_ping_command)
+        :param instruments: Instrumentation receiving spawn/wait/parse timings (default: shared)
+        :param report_losses: Also yield None for every echo that went unanswered
+        """
+        self.target = target
+        self.count = count
+        self.timeout_sec = timeout_sec
+        self.system = system or platform.system()
+        self.report_losses = report_losses
+        self.interval_sec = interval_sec
+        self.deadline_sec = deadline_sec if deadline_sec is not None else timeout_sec * count + 5
+        self.cmd = build_ping_command(target, count, timeout_sec, system, source)
+        self.instruments = instruments or instrumentation.shared
+
+        # Replies, TTLs, timeouts and ping's own summary, parsed in one pass as lines arrive
+        self.parsed = PingOutputParser()
+        self.ping_times = self.parsed.ping_times
+        self.other_lines = self.parsed.other_lines  # summary, errors and anything else ping printed
+        self.timed_out = False
+        self.stopped_early = False  # the consumer stopped reading before ping finished
+        self.returncode = None
+        self.first_sample_sec = None
+        self.elapsed_sec = None
+        self.lost = 0              # echoes reported lost (report_losses)
+        self._next_echo = 0        # oldest echo (0-based) not yet answered or reported lost
+
+    @property
+    def sent(self):
+        """Echo requests sent: ping's own count, else count, or an estimate if cut short."""
+        if not (self.timed_out or self.stopped_early) or self.elapsed_sec is None:
+            return self.parsed.transmitted or self.count
+        estimate = int(self.elapsed_sec / self.interval_sec) + 1 if self.interval_sec > 0 else self.count
+        return max(len(self.ping_times), min(self.count, estimate))
+
+    def _handle_line(self, line, elapsed):
+        """Parse one line; returns (rtt or None, echoes newly known to be lost before or at it)."""
+        timeouts = self.parsed.timeouts
+        with self.instruments.stage("parse"):
+            rtt = self.parsed.feed(line)
+        if rtt is not None and self.first_sample_sec is None:
+            self.first_sample_sec = elapsed
+        if not self.report_losses:
+            return rtt, 0
+        if rtt is not None:
+            seq = self.parsed.seqs[-1]
+            # iputils on Linux counts icmp_seq from 1; macOS and BusyBox ("seq=") from 0
+            echo = None if seq is None else seq - (1 if self.system == "Linux" and "icmp_seq=" in line else 0)
+            lost = self._account_echo(echo, answered=True)
+            # A late reply to an echo already yielded as lost stays in ping_times but is
+            # not yielded again, so a consumer counting echoes doesn't count it twice
+            return (None, 0) if lost is None else (rtt, lost)
+        if self.parsed.timeouts > timeouts:
+            seq = TIMEOUT_SEQ_RE.search(line)
+            return None, self._account_echo(int(seq.group(1)) if seq else None, answered=False)
+        return None, 0
+
+    def _account_echo(self, echo, answered):
+        """
+        Move past one echo (index None: the next one); returns how many echoes that shows
+        lost, or None for a late reply to an echo already reported lost
+        """
+        if echo is None:
+            echo = self._next_echo
+        if echo < self._next_echo:
+            return None if answered else 0
+        lost = echo - self._next_echo + (0 if answered else 1)
+        self._next_echo = echo + 1
+        self.lost += lost
+        return lost
+
+    def _overdue_losses(self, elapsed):
+        """Echoes whose reply is overdue by now (formats that print nothing for a lost echo)."""
+        if not self.report_losses or self.system == "Windows":
+            return 0
+        lost = 0
+        while (self._next_echo < self.count
+               and elapsed >= self._next_echo * self.interval_sec + self.timeout_sec):
+            self._next_echo += 1
+            lost += 1
+        self.lost += lost
+        return lost
+
+    def _next_overdue(self):
+        """Seconds after the start when the oldest outstanding echo becomes overdue (or None)."""
+        if not self.report_losses or self.system == "Windows" or self._next_echo >= self.count:
+            return None
+        return self._next_echo * self.interval_sec + self.timeout_sec
+
+    def _trailing_losses(self):
+        """Echoes ping says it sent that were neither answered nor reported lost."""
+        if not self.report_losses:
+            return 0
+        lost = max(0, (self.parsed.transmitted or self.count) - self._next_echo)
+        self._next_echo += lost
+        self.lost += lost
+        return lost
+
+    def __iter__(self):
+        start = time.monotonic()
+        instruments = self.instruments
+        # stderr is merged so ping's error messages end up in other_lines
+        with instruments.stage("spawn"):
+            process = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       text=True, bufsize=1)
+        lines = queue.Queue()
+
+        def pump():
+            # readline() can't time out, so a helper thread feeds a queue that can
+            for line in process.stdout:
+                lines.put(line)
+            lines.put(None)
+
+        reader = threading.Thread(target=pump, daemon=True)
+        reader.start()
+        exhausted = False
+        try:
+            while True:
+                elapsed = time.monotonic() - start
+                for _ in range(self._overdue_losses(elapsed)):
+                    yield None
+                remaining = self.deadline_sec - elapsed
+                overdue = self._next_overdue()
+                wait_sec = remaining if overdue is None else min(remaining, overdue - elapsed)
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    with instruments.stage("wait"):
+                        line = lines.get(timeout=max(0.0, wait_sec))
+                except queue.Empty:
+                    if wait_sec < remaining:
+                        continue  # an echo became overdue, not the deadline
+                    self.timed_out = True
+                    break
+                if line is None:
+                    exhausted = True
+                    break
+                rtt, lost = self._handle_line(line, time.monotonic() - start)
+                for _ in range(lost):
+                    yield None
+                if rtt is not None:
+                    yield rtt
+            if exhausted:
+                for _ in range(self._trailing_losses()):
+                    yield None
+        finally:
+            self.elapsed_sec = time.monotonic() - start
+            if process.poll() is None:
+                self.stopped_early = not (self.timed_out or exhausted)
+                process.kill()
+            self.returncode = process.wait()
+            # The killed process closes its end of the pipe, so the reader finishes
+            reader.join(timeout=1)
+            if not reader.is_alive():
+                process.stdout.close()
+
+    async def __aiter__(self):
+        start = time.monotonic()
+        instruments = self.instruments
+        with instruments.stage("spawn"):
+            process = await asyncio.create_subprocess_exec(*self.cmd, stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.STDOUT)
+        exhausted = False
+        readline = None
+        try:
+            while True:
+                elapsed = time.monotonic() - start
+                for _ in range(self._overdue_losses(elapsed)):
+                    yield None
+                remaining = self.deadline_sec - elapsed
+                overdue = self._next_overdue()
+                wait_sec = remaining if overdue is None else min(remaining, overdue - elapsed)
+                if readline is None:
+                    readline = asyncio.ensure_future(process.stdout.readline())
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    with instruments.stage("wait"):
+                        # shield: an overdue wake-up must not cancel the pending read
+                        raw = await asyncio.wait_for(asyncio.shield(readline), max(0.0, wait_sec))
+                    readline = None
+                except asyncio.TimeoutError:
+                    if wait_sec < remaining:
+                        continue  # an echo became overdue, not the deadline
+                    self.timed_out = True
+                    break
+                if not raw:
+                    exhausted = True
+                    break
+                rtt, lost = self._handle_line(raw.decode(errors='replace'), time.monotonic() - start)
+                for _ in range(lost):
+                    yield None
+                if rtt is not None:
+                    yield rtt
+            if exhausted:
+                for _ in range(self._trailing_losses()):
+                    yield None
+        finally:
+            self.elapsed_sec = time.monotonic() - start
+            if process.returncode is None:
+                self.stopped_early = not (self.timed_out or exhausted)
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            if readline is not None:
+                readline.cancel()
+            self.returncode = await process.wait()
+
+    def run(self):
+        """Consume the whole stream (up to the deadline) and return self."""
+        for _ in self:
+            pass
+        return self
@@ -0,0 +1,153 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import instrumentation
+
+
+class ProbeScheduler:
+    def __init__(self, probe_fn, workers=8, target_deadline=None, sweep_deadline=None, pass_deadline=False,
+                 instruments=None):
+        """
+        Bounded-concurrency scheduler that fans probe calls out over a thread pool
+
+        A running probe can't be cancelled from outside its thread, so a probe the
+        scheduler gives up on keeps its worker (and its ping process) until it returns.
+        With pass_deadline the probe is told how long it has and can stop itself.
+
+        :param probe_fn: Callable taking a single target and returning a result (or None)
+        :param workers: Maximum number of probes in flight at once
+        :param target_deadline: Seconds a single probe may run before its result is discarded
+        :param sweep_deadline: Seconds the whole sweep may run before pending probes are abandoned
+        :param pass_deadline: Call probe_fn(target, deadline_sec) with the seconds left under both
+                              deadlines (None when neither is set)
+        :param instruments: Instrumentation for leveled logging (default: the shared one)
+        """
+        self.probe_fn = probe_fn
+        self.workers = max(1, int(workers))
+        self.target_deadline = target_deadline
+        self.sweep_deadline = sweep_deadline
+        self.pass_deadline = pass_deadline
+        self.instruments = instruments or instrumentation.shared
+
+        # Counters from the last sweep, useful for reporting
+        self.completed = 0
+        self.timed_out = 0
+        self.abandoned = 0
+        # Indices yielded None because a deadline cut them off, not because the probe failed
+        self.dropped = set()
+
+    def run(self, targets):
+        """
+        Probe every target, yielding (index, target, result) as probes complete
+
+        Probes that exceed the per-target deadline yield a result of None. Once the
+        sweep deadline passes, no new probes are started and the remaining targets
+        yield None as well, so every index is yielded exactly once. The indices cut off
+        by either deadline are in self.dropped by the time they are yielded.
+        """
+        targets = list(targets)
+        self.completed = self.timed_out = self.abandoned = 0
+        self.dropped = set()
+        if not targets:
+            return
+
+        sweep_start = time.monotonic()
+        sweep_end = sweep_start + self.sweep_deadline if self.sweep_deadline is not None else None
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        in_flight = {}  # future -> (index, started_at)
+        next_index = 0
+        try:
+            while next_index < len(targets) or in_flight:
+                now = time.monotonic()
+
+                # Top up the pool unless the sweep deadline has already passed
+                while (next_index < len(targets) and len(in_flight) < self.workers
+                       and (sweep_end is None or now < sweep_end)):
+                    if self.pass_deadline:
+                        future = executor.submit(self.probe_fn, targets[next_index],
+                                                 self._probe_deadline(now, sweep_end))
+                    else:
+                        future = executor.submit(self.probe_fn, targets[next_index])
+                    in_flight[future] = (next_index, time.monotonic())
+                    next_index += 1
+
+                if sweep_end is not None and now >= sweep_end:
+                    # Abandon everything that has not finished yet
+                    for future, (index, _) in in_flight.items():
+                        future.cancel()
+                        self.abandoned += 1
+                        self.dropped.add(index)
+                        yield index, targets[index], None
+                    in_flight.clear()
+                    while next_index < len(targets):
+                        self.abandoned += 1
+                        self.dropped.add(next_index)
+                        yield next_index, targets[next_index], None
+                        next_index += 1
+                    break
+
+                done, _ = wait(list(in_flight), timeout=self._wait_timeout(in_flight, sweep_end),
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index, _ = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.instruments.warning(f"  Error probing {targets[index]}: {e}")
+                        result = None
+                    self.completed += 1
+                    yield index, targets[index], result
+
+                # Give up on probes that have outrun their own deadline
+                if self.target_deadline is not None:
+                    now = time.monotonic()
+                    for future, (index, started_at) in list(in_flight.items()):
+                        if now - started_at >= self.target_deadline:
+                            del in_flight[future]
+                            future.cancel()
+                            self.timed_out += 1
+                            self.dropped.add(index)
+                            yield index, targets[index], None
+        finally:
+            # Don't block on probes we have already given up on
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run_ordered(self, targets):
+        """
+        Probe every target, yielding (index, target, result) in input order
+
+        Results are released as soon as every earlier target has finished, so the
+        caller sees exactly the sequence a one-at-a-time loop would produce.
+        """
+        pending = {}
+        next_index = 0
+        for index, target, result in self.run(targets):
+            pending[index] = (target, result)
+            while next_index in pending:
+                target, result = pending.pop(next_index)
+                yield next_index, target, result
+                next_index += 1
+
+    def _probe_deadline(self, now, sweep_end):
+        """Seconds a probe started now has before the scheduler gives up on it."""
+        limits = []
+        if self.target_deadline is not None:
+            limits.append(self.target_deadline)
+        if sweep_end is not None:
+            limits.append(sweep_end - now)
+        return max(0.0, min(limits)) if limits else None
+
+    def _wait_timeout(self, in_flight, sweep_end):
+        """Work out how long to block before a deadline needs checking."""
+        timeouts = []
+        now = time.monotonic()
+        if sweep_end is not None:
+            timeouts.append(sweep_end - now)
+        if self.target_deadline is not None and in_flight:
+            oldest = min(started_at for _, started_at in in_flight.values())
+            timeouts.append(oldest + self.target_deadline - now)
+        if not timeouts:
+            return None
+        return max(0.0, min(timeouts))
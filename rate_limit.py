@@ -0,0 +1,172 @@
+import asyncio
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1.0):
+        """
+        Token bucket that hands out send times instead of refusing
+
+        Tokens refill at `rate` per second up to `burst`. reserve() always succeeds
+        and may drive the level negative; the debt is the wait before the caller may send.
+
+        :param rate: Sustained tokens (packets) per second
+        :param burst: Bucket depth, i.e. how many packets may go out back to back
+        """
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive.")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, tokens, now, interval_sec=0.0):
+        """
+        Seconds until `tokens` would be available, without taking them
+
+        With interval_sec the tokens are spent one every interval_sec seconds (ping's own
+        spacing), so the k-th only has to be available k x interval_sec after the first.
+        """
+        self._refill(now)
+        delay = (tokens - self.tokens) / self.rate - (tokens - 1) * interval_sec
+        return max(0.0, (1 - self.tokens) / self.rate, delay)
+
+    def take(self, tokens, now):
+        self._refill(now)
+        self.tokens -= tokens
+
+
+def subnet_key(ip_address):
+    """The /24 (IPv4) or /64 (IPv6) network an address belongs to, as a string."""
+    if ':' not in ip_address:
+        return ip_address.rsplit('.', 1)[0]
+    return str(ipaddress.IPv6Network(f"{ip_address}/64", strict=False).network_address)
+
+
+class ProbePacer:
+    def __init__(self, global_pps=None, per_destination_pps=None, per_subnet_pps=None, burst=None,
+                 destination_burst=1, max_tracked=65536):
+        """
+        Pace probe packets so bursts don't queue locally or trip ICMP rate limits
+
+        Every send passes up to three token buckets: one global, one per destination
+        address and one per /24 (IPv4) or /64 (IPv6). acquire() blocks until all of
+        them allow the packet, takes its tokens from all of them then, and returns how
+        long it waited; that queueing delay is reported separately and never included in
+        a measured RTT.
+
+        :param global_pps: Packets per second across all destinations (None: unlimited)
+        :param per_destination_pps: Packets per second to one address (None: unlimited)
+        :param per_subnet_pps: Packets per second into one /24 (None: unlimited)
+        :param burst: Global bucket depth (default: a tenth of a second of global_pps)
+        :param destination_burst: Depth of the per-destination and per-subnet buckets
+        :param max_tracked: Per-destination/per-subnet buckets kept (least recently used dropped)
+        """
+        self.global_bucket = None
+        if global_pps:
+            self.global_bucket = TokenBucket(global_pps, burst if burst is not None else global_pps / 10)
+        self.per_destination_pps = per_destination_pps
+        self.per_subnet_pps = per_subnet_pps
+        self.destination_burst = destination_burst
+        self.max_tracked = max_tracked
+        self._destinations = OrderedDict()
+        self._subnets = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.acquired = 0
+            self.delayed = 0
+            self.total_delay_sec = 0.0
+            self.max_delay_sec = 0.0
+
+    def _bucket(self, buckets, key, rate):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, self.destination_burst)
+            if len(buckets) > self.max_tracked:
+                # An idle bucket is full again, so forgetting it changes nothing
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(key)
+        return bucket
+
+    def reserve(self, ip_address=None, packets=1, interval_sec=0.0):
+        """
+        Take send slots for `packets` packets to ip_address if every bucket has them now
+
+        Nothing is taken otherwise, so the tokens leave every bucket at the same moment,
+        when the packets are sent. (Taking them earlier from a bucket that refills to its
+        burst in the meantime would let that many extra packets through later.)
+
+        :param interval_sec: Spacing of the packets after the first (a ping run's -i interval)
+        :return: 0.0 once the slots are taken, else seconds to wait before trying again
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            if self.global_bucket is not None:
+                buckets.append(self.global_bucket)
+            if ip_address and self.per_destination_pps:
+                buckets.append(self._bucket(self._destinations, ip_address, self.per_destination_pps))
+            if ip_address and self.per_subnet_pps:
+                buckets.append(self._bucket(self._subnets, subnet_key(ip_address), self.per_subnet_pps))
+            delay = max((bucket.delay_for(packets, now, interval_sec) for bucket in buckets), default=0.0)
+            if delay <= 0:
+                for bucket in buckets:
+                    bucket.take(packets, now)
+        return delay
+
+    def _record(self, delay):
+        with self._lock:
+            self.acquired += 1
+            if delay > 0:
+                self.delayed += 1
+                self.total_delay_sec += delay
+                self.max_delay_sec = max(self.max_delay_sec, delay)
+
+    def acquire(self, ip_address=None, packets=1, interval_sec=0.0):
+        """Block until the packets may be sent. Returns the queueing delay in seconds."""
+        waited = 0.0
+        delay = self.reserve(ip_address, packets, interval_sec)
+        if delay > 0:
+            # Sleep until the slowest bucket allows it, then try again: the others may
+            # have been drained by packets sent in the meantime
+            start = time.monotonic()
+            while delay > 0:
+                time.sleep(delay)
+                delay = self.reserve(ip_address, packets, interval_sec)
+            waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    async def acquire_async(self, ip_address=None, packets=1):
+        """acquire() for the event loop: waits with asyncio.sleep instead of blocking."""
+        waited = 0.0
+        delay = self.reserve(ip_address, packets)
+        if delay > 0:
+            start = time.monotonic()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.reserve(ip_address, packets)
+            waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    def stats(self):
+        with self._lock:
+            return {
+                "acquired": self.acquired,
+                "delayed": self.delayed,
+                "avg_queue_delay_ms": self.total_delay_sec / self.acquired * 1000 if self.acquired else 0.0,
+                "max_queue_delay_ms": self.max_delay_sec * 1000,
+                "total_queue_delay_sec": self.total_delay_sec,
+            }
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    hostname    TEXT NOT NULL,
+    ip_address  TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    measured_at REAL NOT NULL,
+    result      TEXT NOT NULL,
+    PRIMARY KEY (hostname, ip_address, params)
+)
+"""
+
+
+def params_key(**params):
+    """Canonical string for a set of probe parameters (same parameters, same key)."""
+    return json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+
+class ResultCache:
+    def __init__(self, path=os.path.join("~", ".cache", "ping_map", "results.sqlite"), max_age_sec=300,
+                 max_age_by_target=None):
+        """
+        Persistent cache of probe results so overlapping sweeps skip recently probed targets
+
+        Entries are keyed by (hostname, resolved IP, probe parameters): a target whose
+        address changed, or a sweep with a different echo count or timeout, is probed
+        again. Only successful results are stored. The file is an SQLite database in
+        WAL mode, so several processes (e.g. dashboards) can share one cache.
+
+        :param path: SQLite file (':memory:' for a cache that lives only in this process)
+        :param max_age_sec: How long a result counts as fresh
+        :param max_age_by_target: Optional {hostname: max age in seconds} overriding max_age_sec
+        """
+        if path != ':memory:':
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_age_sec = max_age_sec
+        self.max_age_by_target = dict(max_age_by_target or {})
+        self._lock = threading.Lock()
+        self._pending = []
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self._db.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.stored = 0
+
+    def stats(self):
+        lookups = self.hits + self.stale + self.misses
+        return {
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "stored": self.stored,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def max_age_for(self, hostname):
+        return self.max_age_by_target.get(hostname, self.max_age_sec)
+
+    def get(self, hostname, ip_address, params, max_age_sec=None):
+        """
+        Cached result for a target if one is fresh enough
+
+        :param params: Probe parameters as returned by params_key()
+        :param max_age_sec: Overrides the configured max age for this lookup
+        :return: The stored result dictionary with 'cached_age_sec' added, or None
+        """
+        if not ip_address:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT measured_at, result FROM results "
+                                   "WHERE hostname = ? AND ip_address = ? AND params = ?",
+                                   (hostname, ip_address, params)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            age = time.time() - row[0]
+            if age > (max_age_sec if max_age_sec is not None else self.max_age_for(hostname)):
+                self.stale += 1
+                return None
+            self.hits += 1
+        result = json.loads(row[1])
+        result["cached_age_sec"] = age
+        return result
+
+    def put(self, hostname, ip_address, params, result, measured_at=None):
+        """Queue a successful result for storage; written on the next flush()."""
+        if not result or not ip_address:
+            return
+        # A result read from the cache keeps its original measurement time
+        if "cached_age_sec" in result:
+            return
+        row = (hostname, ip_address, params, measured_at or time.time(), json.dumps(result))
+        with self._lock:
+            self._pending.append(row)
+
+    def flush(self):
+        """Write queued results in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", self._pending)
+            self.stored += len(self._pending)
+            self._pending = []
+
+    def prune(self, older_than_sec=None):
+        """Delete entries older than older_than_sec (default: the largest configured max age)."""
+        if older_than_sec is None:
+            older_than_sec = max([self.max_age_sec] + list(self.max_age_by_target.values()))
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM results WHERE measured_at < ?",
+                                    (time.time() - older_than_sec,)).rowcount
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
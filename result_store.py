@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class PingResultStore:
+    def __init__(self, capacity=256):
+        """
+        Columnar, array-backed container for [lat, lon, ping, website] results
+
+        Columns are float32 arrays plus an int32 site id into an interned table of
+        website names. Appends are amortized O(1): the arrays double when full.
+
+        :param capacity: Initial number of rows to allocate
+        """
+        capacity = max(1, int(capacity))
+        self._lat = np.empty(capacity, dtype=np.float32)
+        self._lon = np.empty(capacity, dtype=np.float32)
+        self._ping = np.empty(capacity, dtype=np.float32)
+        self._site = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+
+        # Interned website names: id -> name and name -> id
+        self.sites = []
+        self._site_ids = {}
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __iter__(self):
+        """Yield rows as [lat, lon, ping, website] lists, like the old results list."""
+        for i in range(self._size):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("result index out of range")
+        return [float(self._lat[i]), float(self._lon[i]), float(self._ping[i]), self.sites[self._site[i]]]
+
+    # --- Zero-copy column views (valid until the next append) ---
+    @property
+    def lats(self):
+        return self._lat[:self._size]
+
+    @property
+    def lons(self):
+        return self._lon[:self._size]
+
+    @property
+    def pings(self):
+        return self._ping[:self._size]
+
+    @property
+    def site_ids(self):
+        return self._site[:self._size]
+
+    @property
+    def websites(self):
+        """Website name per row (builds a Python list; prefer site_ids in hot paths)."""
+        return [self.sites[i] for i in self.site_ids]
+
+    @property
+    def nbytes(self):
+        return self._lat.nbytes + self._lon.nbytes + self._ping.nbytes + self._site.nbytes
+
+    def intern(self, website):
+        """Return the id of website, adding it to the site table if new."""
+        site_id = self._site_ids.get(website)
+        if site_id is None:
+            site_id = len(self.sites)
+            self.sites.append(website)
+            self._site_ids[website] = site_id
+        return site_id
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._lat)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_lat', '_lon', '_ping', '_site'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def append(self, row):
+        """Append one [lat, lon, ping, website] row."""
+        lat, lon, ping, website = row
+        self._reserve(1)
+        i = self._size
+        self._lat[i] = lat
+        self._lon[i] = lon
+        self._ping[i] = ping
+        self._site[i] = self.intern(website)
+        self._size += 1
+
+    def extend_arrays(self, lats, lons, pings, site_ids):
+        """Append whole columns at once. site_ids must already be interned."""
+        n = len(pings)
+        self._reserve(n)
+        sl = slice(self._size, self._size + n)
+        self._lat[sl] = lats
+        self._lon[sl] = lons
+        self._ping[sl] = pings
+        self._site[sl] = site_ids
+        self._size += n
+
+    def clear(self):
+        """Drop all rows but keep the allocated arrays and site table."""
+        self._size = 0
+
+    def save(self, path):
+        """Export the columns to a compressed .npz file."""
+        np.savez_compressed(path, lat=self.lats, lon=self.lons, ping=self.pings,
+                            site_id=self.site_ids, sites=np.array(self.sites, dtype=np.str_))
+
+    @classmethod
+    def load(cls, path):
+        """Load a store written by save()."""
+        with np.load(path) as data:
+            store = cls(capacity=len(data['ping']))
+            for website in data['sites']:
+                store.intern(str(website))
+            store.extend_arrays(data['lat'], data['lon'], data['ping'], data['site_id'])
+        return store
@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+
+import ping_stats
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.float32):
+        """
+        Fixed-capacity circular buffer over a preallocated NumPy array
+
+        Appending is O(1) and never allocates; once full, the oldest value is
+        overwritten. NaN can be stored to mark a missing value (e.g. a lost echo).
+
+        :param capacity: Maximum number of values kept
+        :param dtype: Element type of the backing array
+        """
+        if capacity < 1:
+            raise ValueError("RingBuffer capacity must be at least 1")
+        self.capacity = capacity
+        self.data = np.full(capacity, np.nan, dtype=dtype)
+        self.head = 0            # index the next value is written to
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def extend(self, values):
+        """Append many values with at most two slice assignments."""
+        values = np.asarray(values, dtype=self.data.dtype)
+        if len(values) >= self.capacity:
+            values = values[-self.capacity:]
+        n = len(values)
+        first = min(n, self.capacity - self.head)
+        self.data[self.head:self.head + first] = values[:first]
+        self.data[:n - first] = values[first:]
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def latest(self, n=None):
+        """The last n values (default: all kept), oldest first, as a new array."""
+        n = self.count if n is None else min(n, self.count)
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n].copy()
+        return np.concatenate((self.data[start:], self.data[:self.head]))
+
+    def mean(self, window=None):
+        values = self.latest(window)
+        valid = values[~np.isnan(values)]
+        return float(valid.mean(dtype=np.float64)) if len(valid) else float('nan')
+
+    def variance(self, window=None):
+        """Sample variance of the non-NaN values in the window (0 below two values)."""
+        values = self.latest(window)
+        valid = values[~np.isnan(values)]
+        return float(valid.var(dtype=np.float64, ddof=1)) if len(valid) > 1 else 0.0
+
+    def jitter(self, window=None):
+        """Mean absolute difference of consecutive values; pairs around a NaN are skipped."""
+        diffs = np.abs(np.diff(self.latest(window).astype(np.float64)))
+        diffs = diffs[~np.isnan(diffs)]
+        return float(diffs.mean()) if len(diffs) else 0.0
+
+
+class SiteHistory:
+    def __init__(self, capacity=1024, dtype=np.float32):
+        """
+        Rolling per-site echo history with bounded memory
+
+        Each site gets one RingBuffer of its last `capacity` echoes: the RTT in ms
+        for a reply, NaN for an echo that was sent but not answered. Memory is
+        sites x capacity x itemsize however long the process runs (1024 float32
+        echoes are 4 KiB per site).
+
+        :param capacity: Echoes kept per site
+        :param dtype: Element type of the per-site buffers
+        """
+        self.capacity = capacity
+        self.dtype = dtype
+        self.buffers = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, website):
+        return website in self.buffers
+
+    def __len__(self):
+        return len(self.buffers)
+
+    def record(self, website, ping_times, sent=None):
+        """
+        Append one probe session's echoes to the site's buffer
+
+        :param ping_times: RTTs in ms of the replies received
+        :param sent: Echo requests sent (default: one per reply); the difference is stored as NaN
+        """
+        sent = len(ping_times) if sent is None else max(int(sent), len(ping_times))
+        echoes = np.full(sent, np.nan, dtype=self.dtype)
+        echoes[:len(ping_times)] = ping_times
+        with self._lock:
+            buffer = self.buffers.get(website)
+            if buffer is None:
+                buffer = self.buffers[website] = RingBuffer(self.capacity, self.dtype)
+            buffer.extend(echoes)
+
+    def window_samples(self, websites, window=None):
+        """
+        Last `window` echoes of every site as one NaN-padded array
+
+        :param websites: Sites to include, one row each (sites without history get an empty row)
+        :param window: Echoes per site (default: the full capacity)
+        :return: (samples, sent): float64 array of shape (sites, window) with each site's
+                 echoes first, and the number of echoes kept per site
+        """
+        window = self.capacity if window is None else min(window, self.capacity)
+        samples = np.full((len(websites), window), np.nan)
+        sent = np.zeros(len(websites), dtype=np.intp)
+        with self._lock:
+            for row, website in enumerate(websites):
+                buffer = self.buffers.get(website)
+                if buffer is None:
+                    continue
+                echoes = buffer.latest(window)
+                samples[row, :len(echoes)] = echoes
+                sent[row] = len(echoes)
+        return samples, sent
+
+    def window_metrics(self, websites, window=None):
+        """
+        Rolling metrics of every site over its last `window` echoes in one vectorized pass
+
+        Lost echoes inside the window count towards packet_loss and split jitter pairs.
+
+        :return: Dict of per-site arrays, as ping_stats.compute_metrics returns
+        """
+        samples, sent = self.window_samples(websites, window)
+        return ping_stats.compute_metrics(samples, sent)
@@ -0,0 +1,357 @@
+import glob
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+# On-disk layout of one log directory
+#
+#   samples-<start>-<pid>.idx      fixed-size records, one per probe session
+#   samples-<start>-<pid>.rtt      float32 per-echo RTTs (ms), referenced by offset
+#   samples-<start>-<pid>.targets  target names, one per line; line number = target id
+#
+# Each writer owns its segments, so both tools can log into the same directory.
+RECORD_FORMAT = "<dI16sfQII"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+IPV4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+
+def pack_ip(ip_address):
+    """Pack an IPv4/IPv6 address string into 16 bytes (IPv4 as IPv4-mapped IPv6)."""
+    if not ip_address:
+        return b'\x00' * 16
+    try:
+        return IPV4_MAPPED_PREFIX + socket.inet_pton(socket.AF_INET, ip_address)
+    except OSError:
+        return socket.inet_pton(socket.AF_INET6, ip_address)
+
+
+def unpack_ip(packed):
+    """Inverse of pack_ip. Returns None for an all-zero address."""
+    packed = bytes(packed)
+    if packed == b'\x00' * 16:
+        return None
+    if packed.startswith(IPV4_MAPPED_PREFIX):
+        return socket.inet_ntop(socket.AF_INET, packed[12:])
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+class SampleLogWriter:
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024, max_segment_age_sec=24 * 3600):
+        """
+        Append-only binary log of probe samples
+
+        :param directory: Directory holding the log segments
+        :param max_segment_bytes: Start a new segment once the current one reaches this size
+        :param max_segment_age_sec: Start a new segment once the current one is this old
+        """
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age_sec = max_segment_age_sec
+        os.makedirs(directory, exist_ok=True)
+
+        self._idx = self._rtt = self._targets = None
+        self._segment_started = 0
+        self._segment_bytes = 0
+
+    def _open_segment(self):
+        self.close()
+        self._segment_started = time.time()
+        base = os.path.join(self.directory, f"samples-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        suffix = 0
+        while os.path.exists(base + (f"-{suffix}" if suffix else "") + ".idx"):
+            suffix += 1
+        if suffix:
+            base += f"-{suffix}"
+        self._idx = open(base + ".idx", 'ab')
+        self._rtt = open(base + ".rtt", 'ab')
+        self._targets = open(base + ".targets", 'a', encoding='utf-8')
+        self._target_ids = {}
+        self._rtt_count = 0
+        self._segment_bytes = 0
+
+    def _needs_rotation(self):
+        if self._idx is None:
+            return True
+        if self._segment_bytes >= self.max_segment_bytes:
+            return True
+        return time.time() - self._segment_started >= self.max_segment_age_sec
+
+    def append(self, target, ip_address, ping_times, sent, timestamp=None, packet_loss=None):
+        """
+        Record one probe session
+
+        :param target: Hostname that was probed
+        :param ip_address: Address actually pinged (may be None)
+        :param ping_times: RTTs in ms of the echoes that came back
+        :param sent: Number of echoes sent
+        :param timestamp: Wall-clock time of the session (defaults to now)
+        :param packet_loss: Loss percentage, when it can't be derived from ping_times and sent
+        """
+        if self._needs_rotation():
+            self._open_segment()
+
+        target_id = self._target_ids.get(target)
+        if target_id is None:
+            target_id = len(self._target_ids)
+            self._target_ids[target] = target_id
+            self._targets.write(target.replace('\n', ' ') + '\n')
+
+        ping_times = list(ping_times or [])
+        if packet_loss is not None:
+            loss = packet_loss
+        else:
+            loss = (sent - len(ping_times)) / sent * 100 if sent else 0.0
+        record = struct.pack(RECORD_FORMAT, timestamp if timestamp is not None else time.time(),
+                             target_id, pack_ip(ip_address), loss, self._rtt_count, len(ping_times), sent)
+        rtts = struct.pack(f"<{len(ping_times)}f", *ping_times)
+
+        # RTTs go first so a reader never sees a record pointing past the RTT file
+        self._rtt.write(rtts)
+        self._idx.write(record)
+        self._rtt_count += len(ping_times)
+        self._segment_bytes += len(record) + len(rtts)
+
+    def flush(self):
+        """Push buffered samples to disk (call at the end of a sweep)."""
+        for f in (self._targets, self._rtt, self._idx):
+            if f is not None:
+                f.flush()
+
+    def close(self):
+        for f in (self._targets, self._rtt, self._idx):
+            if f is not None:
+                f.close()
+        self._idx = self._rtt = self._targets = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SampleLogReader:
+    def __init__(self, directory):
+        """
+        Memory-mapped reader over every segment in a sample log directory
+
+        Target names from all segments are merged into one table, so target ids
+        returned by the reader are consistent across segments.
+
+        :param directory: Directory written by SampleLogWriter
+        """
+        self.record_dtype = np.dtype([
+            ('timestamp', '<f8'), ('target_id', '<u4'), ('ip', 'V16'), ('packet_loss', '<f4'),
+            ('rtt_offset', '<u8'), ('n_echo', '<u4'), ('sent', '<u4')
+        ])
+        assert self.record_dtype.itemsize == RECORD_SIZE
+
+        self.directory = directory
+        self.targets = []
+        self._target_ids = {}
+        self.segments = []
+        for idx_path in sorted(glob.glob(os.path.join(directory, "samples-*.idx"))):
+            segment = self._open_segment(idx_path[:-4])
+            if segment is not None:
+                self.segments.append(segment)
+        self.segments.sort(key=lambda seg: seg['t_min'])
+
+    def _open_segment(self, base):
+        n_records = os.path.getsize(base + ".idx") // RECORD_SIZE  # ignore a torn trailing record
+        if n_records == 0:
+            return None
+        records = np.memmap(base + ".idx", dtype=self.record_dtype, mode='r', shape=(n_records,))
+        n_rtts = os.path.getsize(base + ".rtt") // 4
+        rtts = np.memmap(base + ".rtt", dtype='<f4', mode='r', shape=(n_rtts,)) if n_rtts else np.zeros(0, '<f4')
+
+        with open(base + ".targets", encoding='utf-8') as f:
+            names = f.read().splitlines()
+        local_to_global = np.array([self._intern(name) for name in names], dtype=np.uint32)
+
+        # Drop records whose RTTs never made it to disk
+        complete = records['rtt_offset'] + records['n_echo'] <= n_rtts
+        if not complete.all():
+            records = records[:int(np.argmin(complete))]
+            if len(records) == 0:
+                return None
+
+        timestamps = records['timestamp']
+        return {
+            'base': base,
+            'records': records,
+            'rtts': rtts,
+            'target_map': local_to_global,
+            't_min': float(timestamps.min()),
+            't_max': float(timestamps.max()),
+            'time_sorted': bool(np.all(timestamps[1:] >= timestamps[:-1])),
+            'by_target': None
+        }
+
+    def _intern(self, name):
+        target_id = self._target_ids.get(name)
+        if target_id is None:
+            target_id = len(self.targets)
+            self.targets.append(name)
+            self._target_ids[name] = target_id
+        return target_id
+
+    def _target_index(self, segment):
+        """Lazily built per-segment index: global target id -> record positions."""
+        if segment['by_target'] is None:
+            global_ids = segment['target_map'][segment['records']['target_id']]
+            order = np.argsort(global_ids, kind='stable')
+            ids, starts, counts = np.unique(global_ids[order], return_index=True, return_counts=True)
+            segment['by_target'] = {int(t): order[s:s + c] for t, s, c in zip(ids, starts, counts)}
+        return segment['by_target']
+
+    def select(self, targets=None, start=None, end=None):
+        """
+        Find matching records without touching the RTT data
+
+        :param targets: Optional iterable of target names
+        :param start: Optional lower bound on timestamp (inclusive)
+        :param end: Optional upper bound on timestamp (exclusive)
+        :return: List of (segment, record positions array)
+        """
+        wanted = None
+        if targets is not None:
+            wanted = [self._target_ids[t] for t in targets if t in self._target_ids]
+            if not wanted:
+                return []
+
+        selections = []
+        for segment in self.segments:
+            if start is not None and segment['t_max'] < start:
+                continue
+            if end is not None and segment['t_min'] >= end:
+                continue
+
+            timestamps = segment['records']['timestamp']
+            if wanted is not None:
+                by_target = self._target_index(segment)
+                positions = [by_target[t] for t in wanted if t in by_target]
+                if not positions:
+                    continue
+                positions = np.sort(np.concatenate(positions))
+                in_range = np.ones(len(positions), dtype=bool)
+                if start is not None:
+                    in_range &= timestamps[positions] >= start
+                if end is not None:
+                    in_range &= timestamps[positions] < end
+                positions = positions[in_range]
+            elif segment['time_sorted']:
+                lo = 0 if start is None else np.searchsorted(timestamps, start, side='left')
+                hi = len(timestamps) if end is None else np.searchsorted(timestamps, end, side='left')
+                positions = np.arange(lo, hi)
+            else:
+                in_range = np.ones(len(timestamps), dtype=bool)
+                if start is not None:
+                    in_range &= timestamps >= start
+                if end is not None:
+                    in_range &= timestamps < end
+                positions = np.flatnonzero(in_range)
+
+            if len(positions):
+                selections.append((segment, positions))
+        return selections
+
+    def summary_arrays(self, targets=None, start=None, end=None):
+        """
+        Vectorized per-record summary of the matching samples
+
+        :return: Dictionary of arrays: timestamp, target_id, ip (packed, see pack_ip),
+                 avg_ping (NaN if no replies), packet_loss, n_echo, sent
+        """
+        columns = {key: [] for key in ('timestamp', 'target_id', 'ip', 'avg_ping', 'packet_loss', 'n_echo', 'sent')}
+        for segment, positions in self.select(targets, start, end):
+            records = segment['records'][positions]
+            n_echo = records['n_echo'].astype(np.int64)
+            sums = np.zeros(len(records))
+            has_rtts = n_echo > 0
+            if has_rtts.any():
+                offsets = records['rtt_offset'][has_rtts].astype(np.int64)
+                # Gather each record's RTT slice, then sum per record
+                lengths = n_echo[has_rtts]
+                gather = np.repeat(offsets - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) \
+                    + np.arange(lengths.sum())
+                sums[has_rtts] = np.add.reduceat(segment['rtts'][gather].astype(np.float64),
+                                                 np.concatenate(([0], np.cumsum(lengths)[:-1])))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                avg = np.where(has_rtts, sums / np.maximum(n_echo, 1), np.nan)
+
+            columns['timestamp'].append(records['timestamp'])
+            columns['target_id'].append(segment['target_map'][records['target_id']])
+            columns['ip'].append(records['ip'])
+            columns['avg_ping'].append(avg)
+            columns['packet_loss'].append(records['packet_loss'])
+            columns['n_echo'].append(n_echo)
+            columns['sent'].append(records['sent'])
+
+        return {key: (np.concatenate(values) if values else np.zeros(0)) for key, values in columns.items()}
+
+    def iter_samples(self, targets=None, start=None, end=None):
+        """Yield one dict per matching probe session, including per-echo RTTs."""
+        for segment, positions in self.select(targets, start, end):
+            records = segment['records']
+            for pos in positions:
+                record = records[pos]
+                offset, n_echo = int(record['rtt_offset']), int(record['n_echo'])
+                yield {
+                    "timestamp": float(record['timestamp']),
+                    "website": self.targets[segment['target_map'][record['target_id']]],
+                    "ip_address": unpack_ip(record['ip']),
+                    "ping_times": segment['rtts'][offset:offset + n_echo].tolist(),
+                    "packet_loss": float(record['packet_loss']),
+                    "sent": int(record['sent'])
+                }
+
+    def replay_into_heatmap(self, heatmap, targets=None, start=None, end=None):
+        """
+        Load logged samples into a PingHeatmap's results store and grid
+
+        Samples are placed with heatmap.locate() on the logged IP, as the live sweep
+        places them, so the replayed heatmap matches the one that was recorded.
+
+        :return: Number of samples replayed
+        """
+        summary = self.summary_arrays(targets, start, end)
+        usable = ~np.isnan(summary['avg_ping'])
+        if not usable.any():
+            return 0
+        keys = np.empty(int(usable.sum()), dtype=[('target_id', '<i8'), ('ip', 'V16')])
+        keys['target_id'] = summary['target_id'][usable]
+        keys['ip'] = summary['ip'][usable]
+
+        # Locate each (target, IP) pair once, then broadcast locations and store ids
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.ravel()
+        locations = np.array([heatmap.locate(self.targets[int(key['target_id'])], unpack_ip(key['ip'].tobytes()))[:2]
+                              for key in unique_keys], dtype=np.float64)
+        store_ids = np.array([heatmap.ping_results_list.intern(self.targets[int(key['target_id'])])
+                              for key in unique_keys], dtype=np.int32)
+        lats, lons = locations[inverse, 0], locations[inverse, 1]
+        pings = summary['avg_ping'][usable]
+
+        heatmap.ping_results_list.extend_arrays(lats, lons, pings, store_ids[inverse])
+        heatmap.add_ping_points_to_grid(lats, lons, pings)
+        return len(pings)
+
+    def connection_metrics(self, estimator, targets=None, start=None, end=None):
+        """
+        Pool logged echoes per website into metrics for calculate_user_population
+
+        :param estimator: ConcurrentUserPopulationEstimator used to build the metrics
+        :return: Dictionary of website -> metrics, like estimator.connection_metrics
+        """
+        pooled = {}
+        for sample in self.iter_samples(targets, start, end):
+            times, sent = pooled.get(sample['website'], ([], 0))
+            times.extend(sample['ping_times'])
+            pooled[sample['website']] = (times, sent + sample['sent'])
+        pooled = {website: entry for website, entry in pooled.items() if entry[0]}
+        return estimator.build_all_metrics([{"website": website, "ping_times": times}
+                                            for website, (times, _) in pooled.items()],
+                                           [sent for _, sent in pooled.values()])
@@ -0,0 +1,221 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+import instrumentation
+
+
+class TargetHistory:
+    def __init__(self):
+        """What the planner remembers about one target between sweeps."""
+        self.last_probed = None
+        self.mean_ms = None      # EWMA of the target's average RTT
+        self.var_ms2 = 0.0       # EWMA variance of the average RTT around mean_ms
+        self.loss = None         # EWMA of the lost fraction of echoes (1.0 for a failed probe)
+        self.probes = 0
+
+    def to_list(self):
+        return [self.last_probed, self.mean_ms, self.var_ms2, self.loss, self.probes]
+
+    @classmethod
+    def from_list(cls, values):
+        history = cls()
+        history.last_probed, history.mean_ms, history.var_ms2, history.loss, history.probes = values
+        return history
+
+
+class SweepPlanner:
+    def __init__(self, weights=None, max_staleness_sec=3600.0, variance_weight=1.0, loss_weight=1.0,
+                 smoothing=0.3, history_file=None):
+        """
+        Order sweep targets by how much a fresh probe is worth, and cut the list to a time budget
+
+        score = weight * staleness * (1 + variance_weight * volatility + loss_weight * loss)
+
+        staleness is the time since the last probe as a fraction of max_staleness_sec (capped
+        at 1; never probed counts as 1), volatility is the coefficient of variation of the
+        target's average RTT across sweeps (capped at 1; 1 while unknown) and loss is the
+        smoothed lost fraction of echoes. Targets that were skipped gain staleness, so under
+        a tight budget every target still comes round eventually.
+
+        :param weights: Optional {target: weight} for user-assigned importance (default 1.0)
+        :param max_staleness_sec: Age at which a target counts as fully stale
+        :param variance_weight: How much RTT volatility raises a target's priority
+        :param loss_weight: How much packet loss raises a target's priority
+        :param smoothing: EWMA factor for the per-target RTT, variance and loss history
+        :param history_file: Optional JSON file used to keep the history between runs
+        """
+        self.weights = dict(weights or {})
+        self.max_staleness_sec = max_staleness_sec
+        self.variance_weight = variance_weight
+        self.loss_weight = loss_weight
+        self.smoothing = smoothing
+        self.history_file = history_file
+        self.history = {}
+        self.deferred = []       # targets left out of the last plan()
+        self.deferred_indices = []   # their positions in the list given to plan()
+        self._lock = threading.Lock()
+
+        if history_file and os.path.exists(history_file):
+            self.load(history_file)
+
+    def score(self, target, now=None):
+        return self.scores([target], now)[0]
+
+    def scores(self, targets, now=None):
+        """Score of every target, in list order (see the class docstring for the formula)."""
+        now = time.time() if now is None else now
+        history, weights = self.history, self.weights
+        max_staleness, variance_weight, loss_weight = self.max_staleness_sec, self.variance_weight, self.loss_weight
+        unknown = 1 + variance_weight + loss_weight
+        scores = []
+        for target in targets:
+            entry = history.get(target)
+            weight = weights.get(target, 1.0)
+            if entry is None or entry.last_probed is None:
+                scores.append(weight * unknown)
+                continue
+            staleness = min(1.0, max(0.0, now - entry.last_probed) / max_staleness)
+            volatility = min(1.0, math.sqrt(entry.var_ms2) / entry.mean_ms) if entry.mean_ms else 1.0
+            urgency = 1 + variance_weight * volatility + loss_weight * (entry.loss or 0.0)
+            scores.append(weight * staleness * urgency)
+        return scores
+
+    def order(self, targets, now=None):
+        """
+        Yield targets from the highest score down
+
+        Built on a heap, so taking the first k of n targets costs O(n + k log n)
+        instead of sorting the whole list. Ties keep list order.
+        """
+        targets = list(targets)
+        for i in self._ranked(self.scores(targets, now)):
+            yield targets[i]
+
+    @staticmethod
+    def _ranked(scores):
+        """Positions of the scores from the highest down, popped off a heap."""
+        heap = [(-score, i) for i, score in enumerate(scores)]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[1]
+
+    def plan(self, targets, budget_sec=None, workers=1, cost_sec=1.0, now=None):
+        """
+        Targets worth probing within the budget, most valuable first
+
+        :param targets: Candidate targets
+        :param budget_sec: Wall-clock budget for the sweep (None: keep every target, reordered)
+        :param workers: Probes that run concurrently
+        :param cost_sec: Expected duration of one probe (e.g. echo count x ping interval)
+        :return: List of targets in probe order; the rest are in self.deferred
+        """
+        targets = list(targets)
+        return [targets[i] for i in self.plan_indices(targets, budget_sec, workers, cost_sec, now)]
+
+    def plan_indices(self, targets, budget_sec=None, workers=1, cost_sec=1.0, now=None):
+        """
+        Like plan(), but returns positions in targets
+
+        Entries are planned by position, so a target listed twice takes a slot per entry and
+        every entry ends up either in the returned list or in self.deferred_indices.
+        """
+        targets = list(targets)
+        scores = self.scores(targets, now)
+        if budget_sec is None:
+            planned = list(self._ranked(scores))
+        else:
+            slots = max(1, int(budget_sec * max(1, workers) / max(cost_sec, 1e-6)))
+            # A bounded heap keeps only the best `slots` entries: O(n log slots)
+            planned = [i for _, i in heapq.nsmallest(slots, ((-score, i) for i, score in enumerate(scores)))]
+        chosen = set(planned)
+        self.deferred_indices = [i for i in range(len(targets)) if i not in chosen]
+        self.deferred = [targets[i] for i in self.deferred_indices]
+        return planned
+
+    def observe(self, target, result, now=None):
+        """
+        Fold one probe result into the target's history
+
+        :param result: Result dictionary with 'avg_ping' or 'ping_times' (and optionally
+                       'sent' or 'packet_loss'), or None for a failed probe
+        """
+        now = time.time() if now is None else now
+        alpha = self.smoothing
+        with self._lock:
+            history = self.history.get(target)
+            if history is None:
+                history = self.history[target] = TargetHistory()
+            history.last_probed = now
+            history.probes += 1
+
+            ping_times = (result or {}).get('ping_times') or []
+            avg = (result or {}).get('avg_ping')
+            if avg is None and ping_times:
+                avg = sum(ping_times) / len(ping_times)
+            if avg is None:
+                loss = 1.0
+            elif 'packet_loss' in result:
+                loss = result['packet_loss'] / 100.0
+            elif ping_times and result.get('sent'):
+                loss = max(0.0, 1 - len(ping_times) / result['sent'])
+            else:
+                loss = 0.0
+            history.loss = loss if history.loss is None else history.loss + alpha * (loss - history.loss)
+
+            if avg is not None:
+                if history.mean_ms is None:
+                    history.mean_ms = avg
+                else:
+                    delta = avg - history.mean_ms
+                    history.mean_ms += alpha * delta
+                    history.var_ms2 = (1 - alpha) * (history.var_ms2 + alpha * delta * delta)
+
+    def track(self, probe_results, probed=None, now=None):
+        """
+        Pass (target, result) pairs through, observing each one
+
+        :param probed: Optional probed(position, target, result) -> bool; pairs it rejects (cut off
+                       by a deadline, never resolved) are passed through without being observed,
+                       so they keep their staleness instead of counting as a fresh failure
+        """
+        for position, (target, result) in enumerate(probe_results):
+            if probed is None or probed(position, target, result):
+                self.observe(target, result, now)
+            yield target, result
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        ages = [now - h.last_probed for h in self.history.values() if h.last_probed is not None]
+        return {
+            "tracked": len(self.history),
+            "deferred": len(self.deferred),
+            "max_age_sec": max(ages) if ages else None,
+            "mean_age_sec": sum(ages) / len(ages) if ages else None,
+        }
+
+    def save(self, path=None):
+        """Write the per-target history as JSON."""
+        path = path or self.history_file
+        if not path:
+            return
+        with self._lock:
+            entries = {target: history.to_list() for target, history in self.history.items()}
+        with open(path, 'w') as f:
+            json.dump(entries, f)
+
+    def load(self, path=None):
+        """Merge history from a file written by save()."""
+        path = path or self.history_file
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            instrumentation.shared.warning(f"Could not load sweep history from {path}: {e}")
+            return
+        with self._lock:
+            for target, values in entries.items():
+                self.history[target] = TargetHistory.from_list(values)
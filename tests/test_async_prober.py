@@ -0,0 +1,85 @@
+"""
+AsyncProber over TCP on the loopback interface: a listener, a closed port, and a
+port that never answers (a listener whose accept queue is full, so the kernel
+drops further SYNs).
+
+Usage: python -m pytest tests
+"""
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_prober import AsyncProber
+
+LOOPBACK = "127.0.0.1"
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+@pytest.fixture
+def unreachable_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(0)
+    port = sock.getsockname()[1]
+    # One connection nobody accepts fills the queue; later handshakes never complete
+    filler = socket.create_connection(("127.0.0.1", port), timeout=1)
+    yield port
+    filler.close()
+    sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_tcp_listener_answers_every_attempt(listener):
+    prober = AsyncProber(method='tcp', tcp_port=listener, timeout_sec=2)
+    [result] = prober.run([LOOPBACK], count=3)
+    assert result["ip_address"] == LOOPBACK
+    assert len(result["ping_times"]) == result["sent"] == 3
+    assert result["packet_loss"] == 0
+    assert prober.outages == {} and prober.dropped == set()
+
+
+def test_closed_port_counts_the_reset_as_a_reply(closed_port):
+    prober = AsyncProber(method='tcp', tcp_port=closed_port, timeout_sec=2)
+    [result] = prober.run([LOOPBACK], count=2)
+    assert len(result["ping_times"]) == 2
+
+
+def test_unreachable_port_is_an_outage(unreachable_port):
+    prober = AsyncProber(method='tcp', tcp_port=unreachable_port, timeout_sec=0.2)
+    assert prober.run([LOOPBACK], count=2) == [None]
+    assert prober.outages == {LOOPBACK: 2}
+    assert prober.dropped == set()
+
+
+def test_target_deadline_drops_the_probe(unreachable_port):
+    prober = AsyncProber(method='tcp', tcp_port=unreachable_port, timeout_sec=5)
+    assert prober.run([LOOPBACK], count=1, target_deadline=0.3) == [None]
+    assert prober.timed_out == 1 and prober.dropped == {0}
+    assert prober.outages == {}
+
+
+def test_sweep_deadline_abandons_pending_probes(unreachable_port):
+    prober = AsyncProber(method='tcp', tcp_port=unreachable_port, timeout_sec=5, max_in_flight=1)
+    assert prober.run([LOOPBACK] * 3, count=1, sweep_deadline=0.3) == [None, None, None]
+    assert prober.abandoned == 3 and prober.dropped == {0, 1, 2}
+    assert prober.outages == {}
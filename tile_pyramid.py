@@ -0,0 +1,279 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# Named lat/lon boxes (lat_min, lat_max, lon_min, lon_max) for region views
+REGIONS = {
+    "world": (-90.0, 90.0, -180.0, 180.0),
+    "australia": (-45.0, -9.0, 110.0, 156.0),
+    "europe": (34.0, 72.0, -25.0, 45.0),
+    "north_america": (14.0, 72.0, -170.0, -50.0),
+}
+
+# Same green -> yellow -> red ramp as PingHeatmap.generate_visualization
+_RAMP = np.array([(0, 255, 0), (255, 255, 0), (255, 0, 0)], dtype=np.float32)
+
+
+def colorize(values, vmin, vmax):
+    """Map a float array to RGBA uint8 on the ping ramp; NaN cells are transparent."""
+    scale = (values - vmin) / (vmax - vmin) if vmax > vmin else np.zeros_like(values)
+    pos = np.clip(np.nan_to_num(scale), 0.0, 1.0) * (len(_RAMP) - 1)
+    low = np.minimum(pos.astype(np.intp), len(_RAMP) - 2)
+    frac = (pos - low)[..., None]
+    rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = _RAMP[low] * (1 - frac) + _RAMP[low + 1] * frac
+    rgba[..., 3] = np.where(np.isnan(values), 0, 255)
+    return rgba
+
+
+class TilePyramid:
+    def __init__(self, max_zoom=4, tile_size=256, cache_tiles=256):
+        """
+        Sparse multi-resolution pyramid of minimum-ping tiles
+
+        Tiles are addressed z/x/y on an equirectangular lat/lon grid: zoom z has
+        2^(z+1) x 2^z square tiles of tile_size x tile_size float32 cells, x counting
+        east from -180 and y counting south from +90. Samples are aggregated once into
+        the max_zoom tiles that actually contain data (empty tiles are never
+        allocated); coarser tiles are built from their four children when first
+        requested and kept, with rendered images, in an LRU cache.
+
+        :param max_zoom: Finest zoom level; cells there are 180 / (2^max_zoom * tile_size) degrees
+                         (max_zoom=4, tile_size=256 gives ~0.044 degrees)
+        :param tile_size: Cells per tile side
+        :param cache_tiles: Derived tiles and rendered images kept in memory (LRU)
+        """
+        self.max_zoom = max_zoom
+        self.tile_size = tile_size
+        self.cache_tiles = cache_tiles
+
+        # (x, y) -> float32 tile at max_zoom; NaN marks cells without samples
+        self.base_tiles = {}
+        # (kind, z, x, y) -> derived tile or rendered RGBA image
+        self._cache = OrderedDict()
+        self.vmin = None
+        self.vmax = None
+        self.samples = 0
+        self.tile_hits = 0
+        self.tile_misses = 0
+
+    # --- Geometry ---
+    def tiles_across(self, zoom):
+        """(tiles in x, tiles in y) at a zoom level."""
+        return 2 ** (zoom + 1), 2 ** zoom
+
+    def cell_degrees(self, zoom):
+        return 180.0 / (2 ** zoom * self.tile_size)
+
+    def tile_bounds(self, zoom, x, y):
+        """(lat_min, lat_max, lon_min, lon_max) covered by a tile."""
+        span = 180.0 / 2 ** zoom
+        return 90.0 - (y + 1) * span, 90.0 - y * span, -180.0 + x * span, -180.0 + (x + 1) * span
+
+    def tiles_for_bounds(self, zoom, lat_min, lat_max, lon_min, lon_max):
+        """x and y ranges of the tiles overlapping a lat/lon box."""
+        span = 180.0 / 2 ** zoom
+        nx, ny = self.tiles_across(zoom)
+        x0 = int(np.clip((lon_min + 180.0) // span, 0, nx - 1))
+        x1 = int(np.clip(np.ceil((lon_max + 180.0) / span) - 1, x0, nx - 1))
+        y0 = int(np.clip((90.0 - lat_max) // span, 0, ny - 1))
+        y1 = int(np.clip(np.ceil((90.0 - lat_min) / span) - 1, y0, ny - 1))
+        return range(x0, x1 + 1), range(y0, y1 + 1)
+
+    # --- Aggregation ---
+    def add_points(self, lats, lons, pings):
+        """Fold samples into the max_zoom tiles (keeping the minimum per cell)."""
+        pings = np.asarray(pings, dtype=np.float32)
+        if not len(pings):
+            return
+        size = self.tile_size
+        cells_x, cells_y = (n * size for n in self.tiles_across(self.max_zoom))
+        cell_deg = self.cell_degrees(self.max_zoom)
+        col = np.clip(((np.asarray(lons, dtype=np.float64) + 180.0) / cell_deg).astype(np.intp), 0, cells_x - 1)
+        row = np.clip(((90.0 - np.asarray(lats, dtype=np.float64)) / cell_deg).astype(np.intp), 0, cells_y - 1)
+
+        tile_x, tile_y = col // size, row // size
+        tile_ids = tile_y * (cells_x // size) + tile_x
+        order = np.argsort(tile_ids, kind='stable')
+        bounds = np.flatnonzero(np.diff(tile_ids[order])) + 1
+        for group in np.split(order, bounds):
+            key = (int(tile_x[group[0]]), int(tile_y[group[0]]))
+            tile = self.base_tiles.get(key)
+            if tile is None:
+                tile = self.base_tiles[key] = np.full((size, size), np.nan, dtype=np.float32)
+            # fmin ignores the NaN placeholders, so an empty cell simply takes the sample
+            np.fmin.at(tile.reshape(-1), (row[group] % size) * size + col[group] % size, pings[group])
+            self._invalidate(key)
+        # The colour scale may have moved, so every rendered image is stale
+        for key in [k for k in self._cache if k[0] == 'image']:
+            del self._cache[key]
+
+        low, high = float(pings.min()), float(pings.max())
+        self.vmin = low if self.vmin is None else min(self.vmin, low)
+        self.vmax = high if self.vmax is None else max(self.vmax, high)
+        self.samples += len(pings)
+
+    def _invalidate(self, base_key):
+        """Drop cached coarser tiles built from a changed base tile."""
+        x, y = base_key
+        for zoom in range(self.max_zoom):
+            shift = self.max_zoom - zoom
+            self._cache.pop(('tile', zoom, x >> shift, y >> shift), None)
+
+    # --- Tile access ---
+    def _cache_get(self, key):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            self.tile_hits += 1
+        else:
+            self.tile_misses += 1
+        return value
+
+    def _cache_put(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_tiles:
+            self._cache.popitem(last=False)
+
+    def has_data(self, zoom, x, y):
+        """True if any base tile lies under z/x/y (cheap; builds nothing)."""
+        shift = self.max_zoom - zoom
+        return any(bx >> shift == x and by >> shift == y for bx, by in self.base_tiles)
+
+    def tile(self, zoom, x, y):
+        """
+        Minimum-ping tile at z/x/y
+
+        :return: float32 array (tile_size x tile_size) with NaN for empty cells,
+                 or None if no sample falls inside the tile
+        """
+        if not 0 <= zoom <= self.max_zoom:
+            raise ValueError(f"Zoom {zoom} outside 0..{self.max_zoom}.")
+        if zoom == self.max_zoom:
+            return self.base_tiles.get((x, y))
+
+        key = ('tile', zoom, x, y)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        if not self.has_data(zoom, x, y):
+            return None
+
+        # Each child covers one quadrant at double resolution; reduce 2x2 blocks by min
+        size, half = self.tile_size, self.tile_size // 2
+        tile = np.full((size, size), np.nan, dtype=np.float32)
+        for dy in (0, 1):
+            for dx in (0, 1):
+                child = self.tile(zoom + 1, 2 * x + dx, 2 * y + dy)
+                if child is None:
+                    continue
+                reduced = np.fmin.reduce(child.reshape(half, 2, half, 2), axis=(1, 3))
+                tile[dy * half:(dy + 1) * half, dx * half:(dx + 1) * half] = reduced
+        self._cache_put(key, tile)
+        return tile
+
+    def render_tile(self, zoom, x, y):
+        """RGBA uint8 image of a tile on the shared colour scale (None if empty)."""
+        key = ('image', zoom, x, y)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        tile = self.tile(zoom, x, y)
+        if tile is None:
+            return None
+        image = colorize(tile, self.vmin, self.vmax)
+        self._cache_put(key, image)
+        return image
+
+    def export_tile(self, zoom, x, y, directory):
+        """Write directory/z/x/y.png for a non-empty tile; return the path or None."""
+        image = self.render_tile(zoom, x, y)
+        if image is None:
+            return None
+        import matplotlib.image  # only needed for PNG encoding
+        path = os.path.join(directory, str(zoom), str(x), f"{y}.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        matplotlib.image.imsave(path, image)
+        return path
+
+    def export_tiles(self, zoom, directory, bounds=None):
+        """
+        Export every non-empty tile of a zoom level (optionally within a lat/lon box)
+
+        :param bounds: (lat_min, lat_max, lon_min, lon_max) or a REGIONS name
+        :return: List of written paths
+        """
+        bounds = self.resolve_bounds(bounds)
+        xs, ys = self.tiles_for_bounds(zoom, *bounds)
+        paths = [self.export_tile(zoom, x, y, directory) for x in xs for y in ys]
+        return [path for path in paths if path]
+
+    # --- Region mosaics ---
+    def resolve_bounds(self, bounds):
+        if bounds is None:
+            return REGIONS["world"]
+        if isinstance(bounds, str):
+            try:
+                return REGIONS[bounds]
+            except KeyError:
+                raise ValueError(f"Unknown region '{bounds}'. Choose one of {sorted(REGIONS)}.")
+        return tuple(bounds)
+
+    def zoom_for_bounds(self, bounds, max_cells=2048):
+        """Finest zoom whose mosaic of the box stays within max_cells cells across."""
+        lat_min, lat_max, lon_min, lon_max = self.resolve_bounds(bounds)
+        extent = max(lat_max - lat_min, lon_max - lon_min)
+        for zoom in range(self.max_zoom, -1, -1):
+            if extent / self.cell_degrees(zoom) <= max_cells:
+                return zoom
+        return 0
+
+    def region(self, bounds, zoom=None):
+        """
+        Assemble the tiles covering a lat/lon box into one grid
+
+        Only tiles overlapping the box are built; empty ones stay NaN.
+
+        :param bounds: (lat_min, lat_max, lon_min, lon_max) or a REGIONS name
+        :param zoom: Zoom level (default: zoom_for_bounds)
+        :return: (grid with row 0 at the north edge, lat cell edges, lon cell edges)
+        """
+        lat_min, lat_max, lon_min, lon_max = bounds = self.resolve_bounds(bounds)
+        zoom = self.zoom_for_bounds(bounds) if zoom is None else zoom
+        xs, ys = self.tiles_for_bounds(zoom, *bounds)
+        size = self.tile_size
+        mosaic = np.full((len(ys) * size, len(xs) * size), np.nan, dtype=np.float32)
+        for j, y in enumerate(ys):
+            for i, x in enumerate(xs):
+                tile = self.tile(zoom, x, y)
+                if tile is not None:
+                    mosaic[j * size:(j + 1) * size, i * size:(i + 1) * size] = tile
+
+        # Crop the tile-aligned mosaic to the requested box
+        cell_deg = self.cell_degrees(zoom)
+        _, top, left, _ = self.tile_bounds(zoom, xs[0], ys[0])
+        r0 = max(0, int((top - lat_max) // cell_deg))
+        r1 = min(mosaic.shape[0], int(np.ceil((top - lat_min) / cell_deg)))
+        c0 = max(0, int((lon_min - left) // cell_deg))
+        c1 = min(mosaic.shape[1], int(np.ceil((lon_max - left) / cell_deg)))
+        lat_edges = top - np.arange(r0, r1 + 1) * cell_deg
+        lon_edges = left + np.arange(c0, c1 + 1) * cell_deg
+        return mosaic[r0:r1, c0:c1], lat_edges, lon_edges
+
+    def stats(self):
+        base_bytes = sum(tile.nbytes for tile in self.base_tiles.values())
+        nx, ny = self.tiles_across(self.max_zoom)
+        dense_bytes = nx * ny * self.tile_size ** 2 * 4
+        return {
+            "samples": self.samples,
+            "base_tiles": len(self.base_tiles),
+            "base_tiles_possible": nx * ny,
+            "base_bytes": base_bytes,
+            "dense_bytes": dense_bytes,
+            "cached": len(self._cache),
+            "cache_hits": self.tile_hits,
+            "cache_misses": self.tile_misses,
+        }
+